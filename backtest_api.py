@@ -0,0 +1,196 @@
+import math
+import asyncio
+from typing import Any, Callable, Dict, Optional
+from trader import GridTrader
+from kline_store import KlineSeries, open_kline_file
+from mock_exchange_client import MockExchangeClient
+from bar_skip import BarSkipper
+from feature_store import FeatureStore, dataset_hash
+from result_cache import BacktestResultCache, backtest_fingerprint
+from config import TradingConfig
+from parameter_sweep import EXTRA_SWEEP_KEYS, build_config
+
+
+# 回测循环每推进多少步检查一次 should_stop
+STOP_CHECK_STEPS = 1000
+
+
+class BacktestCancelled(Exception):
+    """回测被 should_stop 中止"""
+
+
+# 不允许通过配置覆盖修改的属性：交易对由数据集决定，库接口回测不读写交易历史
+PROTECTED_CONFIG_KEYS = ('SYMBOL', 'PERSIST_TRADE_HISTORY')
+# 参数扫描扩展键的取值类型
+EXTRA_CONFIG_TYPES = {
+    'FLIP_THRESHOLD': float,
+    'VOLATILITY_RANGES': list,
+    'S1_LOOKBACK': int,
+    'S1_SELL_TARGET_PCT': float,
+    'S1_BUY_TARGET_PCT': float,
+}
+
+
+def tunable_config_types() -> Dict[str, type]:
+    """可覆盖的配置键及取值类型：TradingConfig 中默认值为数值/布尔的大写属性（受保护的除外）及扩展键"""
+    types = {key: type(value) for key, value in vars(TradingConfig).items()
+             if key.isupper() and key not in PROTECTED_CONFIG_KEYS and isinstance(value, (bool, int, float))}
+    types.update({key: EXTRA_CONFIG_TYPES[key] for key in EXTRA_SWEEP_KEYS})
+    return types
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def check_config_value(key: str, value: Any, expected: type):
+    """按默认值类型检查配置覆盖的取值，不符合时抛出 ValueError"""
+    if expected is bool:
+        valid = isinstance(value, bool)
+    elif expected is int:
+        valid = isinstance(value, int) and not isinstance(value, bool)
+    elif expected is float:
+        valid = _is_number(value)
+    else:
+        # VOLATILITY_RANGES: [{'range': [下限, 上限], 'grid': 网格大小}, ...]
+        valid = isinstance(value, list) and bool(value) and all(
+            isinstance(item, dict) and isinstance(item.get('range'), list) and len(item['range']) == 2
+            and all(_is_number(bound) for bound in item['range']) and _is_number(item.get('grid'))
+            for item in value)
+    if not valid:
+        raise ValueError(f"配置参数 {key} 的取值无效: {value!r}（应为 {expected.__name__}）")
+
+
+def check_config_overrides(config_overrides: Dict[str, Any]):
+    """配置覆盖只允许可调参数（见 tunable_config_types），且取值类型与默认值一致，否则抛出 ValueError"""
+    types = tunable_config_types()
+    for key, value in config_overrides.items():
+        if key not in types:
+            raise ValueError(f"未知或不允许覆盖的配置参数: {key}")
+        check_config_value(key, value, types[key])
+
+
+def check_initial_balance(initial_balance: Dict[str, Any]):
+    """初始余额需为 {资产: 非负有限数值}，否则抛出 ValueError"""
+    if not isinstance(initial_balance, dict):
+        raise ValueError("initial_balance 需为JSON对象")
+    for asset, amount in initial_balance.items():
+        if not _is_number(amount) or amount < 0:
+            raise ValueError(f"初始余额 {asset} 的取值无效: {amount!r}（应为非负数值）")
+
+
+class BacktestDataset:
+    """
+    预加载的回测数据集：K线文件只读取一次，之后可在同一进程内被任意多次 run_backtest 复用。
+    JSON文件读为行列表，.npy 文件以内存映射方式打开；回测过程不会修改数据。
+    波动率、S1高低点等预计算特征（features）首次使用时按文件内容哈希持久化，之后的回测直接读取。
+    """
+
+    def __init__(self, kline_path: str, symbol: str = 'BNB/USDT'):
+        self.kline_path = kline_path
+        self.symbol = symbol
+        self.kline_data = open_kline_file(kline_path)
+        self._features = None
+
+    @property
+    def dataset_key(self) -> str:
+        """K线文件内容哈希（结果缓存和特征缓存的数据集键）"""
+        return dataset_hash(self.kline_path)
+
+    @property
+    def features(self) -> FeatureStore:
+        if self._features is None:
+            self._features = FeatureStore.for_file(self.kline_path, self.kline_data)
+        return self._features
+
+    def __len__(self) -> int:
+        return len(self.kline_data)
+
+    @property
+    def start_timestamp(self) -> Optional[int]:
+        return int(self.kline_data[0][0]) if len(self.kline_data) else None
+
+    @property
+    def end_timestamp(self) -> Optional[int]:
+        return int(self.kline_data[len(self.kline_data) - 1][0]) if len(self.kline_data) else None
+
+    def __repr__(self) -> str:
+        kind = 'npy' if isinstance(self.kline_data, KlineSeries) else 'json'
+        return f"BacktestDataset({self.symbol}, {len(self)} bars, {kind})"
+
+
+async def run_backtest_async(dataset: BacktestDataset, config_overrides: Optional[Dict[str, Any]] = None,
+                             initial_balance: Optional[Dict[str, float]] = None, skip_bars: bool = True,
+                             cache: Optional[BacktestResultCache] = None,
+                             should_stop: Optional[Callable[[], bool]] = None, **client_kwargs) -> Dict[str, Any]:
+    """
+    run_backtest 的协程版本（在已有事件循环中使用，如 Jupyter）。
+    每次调用新建 TradingConfig / MockExchangeClient / GridTrader，交易历史不写入 data 目录，
+    不修改任何全局配置。client_kwargs 透传给 MockExchangeClient（fee_rate、intrabar、resting_orders 等）。
+    skip_bars 为 True 时（模式支持的情况下）用 BarSkipper 跳过策略不会动作的K线，结果不变。
+    非K线内模式下默认使用数据集的预计算特征（传入 features=None 可关闭）。
+    传入 cache 时按 (数据集内容, 生效配置, 初始余额和撮合选项, 代码版本) 的指纹缓存结果，相同请求直接返回缓存。
+    should_stop 每 STOP_CHECK_STEPS 步调用一次，返回 True 时抛出 BacktestCancelled。
+    """
+    config_overrides = dict(config_overrides or {})
+    check_config_overrides(config_overrides)
+    config = build_config(config_overrides)
+    config.SYMBOL = dataset.symbol
+    config.PERSIST_TRADE_HISTORY = False
+    if cache is not None:
+        options = {k: v for k, v in client_kwargs.items() if k != 'features'}
+        cache_key = backtest_fingerprint(dataset.dataset_key, config, symbol=dataset.symbol,
+                                         initial_balance=initial_balance, client=options)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+    if not client_kwargs.get('intrabar') and 'features' not in client_kwargs:
+        client_kwargs['features'] = dataset.features
+    exchange = MockExchangeClient(dataset.kline_path, initial_balance=initial_balance, symbol=dataset.symbol,
+                                  kline_data=dataset.kline_data, **client_kwargs)
+    trader = GridTrader(exchange, config)
+    skipper = BarSkipper(exchange, trader) if skip_bars and BarSkipper.supported(exchange) else None
+    await trader.initialize()
+    steps = 0
+    while exchange.has_next():
+        steps += 1
+        if should_stop is not None and steps % STOP_CHECK_STEPS == 0 and should_stop():
+            await exchange.close()
+            raise BacktestCancelled("回测已取消")
+        if skipper is not None:
+            if not await skipper.skip():
+                break
+            await skipper.step()
+        else:
+            await trader.step_once()
+        await exchange.next()
+    metrics = exchange.performance_metrics()
+    recorder = exchange.equity_recorder
+    await exchange.close()
+    result = {
+        'params': config_overrides,
+        'trades': exchange.trades,
+        'timestamps': recorder.timestamps,
+        'equity_curve': recorder.equity,
+        'metrics': metrics,
+        'initial_equity': metrics['initial_equity'],
+        'final_equity': metrics['final_equity'],
+        'final_balance': {'spot': exchange.ledger.spot_dict(), 'locked': exchange.ledger.locked_dict(),
+                          'savings': exchange.ledger.savings_dict()},
+    }
+    if cache is not None:
+        cache.put(cache_key, result)
+    return result
+
+
+def run_backtest(dataset: BacktestDataset, config_overrides: Optional[Dict[str, Any]] = None,
+                 initial_balance: Optional[Dict[str, float]] = None, skip_bars: bool = True,
+                 cache: Optional[BacktestResultCache] = None,
+                 should_stop: Optional[Callable[[], bool]] = None, **client_kwargs) -> Dict[str, Any]:
+    """
+    进程内运行一次逐K线回测，返回结构化结果：
+    {'params', 'trades', 'timestamps', 'equity_curve', 'metrics', 'initial_equity', 'final_equity', 'final_balance'}。
+    config_overrides 的键与参数扫描网格一致（TradingConfig 属性及 FLIP_THRESHOLD、VOLATILITY_RANGES、S1_* 等）。
+    """
+    return asyncio.run(run_backtest_async(dataset, config_overrides, initial_balance, skip_bars, cache,
+                                          should_stop, **client_kwargs))
@@ -0,0 +1,72 @@
+import os
+import gzip
+import pickle
+import numpy as np
+from datetime import datetime
+from typing import Any, Dict
+
+CHECKPOINT_VERSION = 1
+
+
+def _is_plain(value) -> bool:
+    """是否为可直接保存的纯数据（标量、时间、容器），对象引用（交易所、配置、日志等）不保存"""
+    if value is None or isinstance(value, (bool, int, float, str, datetime, np.generic)):
+        return True
+    if isinstance(value, (list, tuple, set)):
+        return all(_is_plain(v) for v in value)
+    if isinstance(value, dict):
+        return all(_is_plain(k) and _is_plain(v) for k, v in value.items())
+    return False
+
+
+def _components(trader) -> Dict[str, Any]:
+    return {
+        'trader': trader,
+        'grid_core': trader.grid_core,
+        'position_controller_s1': trader.position_controller_s1,
+        's1_core': trader.position_controller_s1.s1_core,
+        'risk_manager': trader.risk_manager,
+        'order_tracker': trader.order_tracker,
+        'monitor': trader.monitor,
+        'throttler': trader.throttler,
+    }
+
+
+def save_checkpoint(checkpoint_path: str, exchange, trader):
+    """
+    保存回测快照：MockExchangeClient 的回放位置/账户/订单/成交，以及 GridTrader、S1、风控、
+    OrderTracker 等组件的全部纯数据属性（基准价、网格、缓存、S1高低点、成交历史等）。
+    以 gzip 压缩的 pickle 先写临时文件再替换，中断时不会损坏已有快照。
+    """
+    state = {
+        'version': CHECKPOINT_VERSION,
+        'symbol': exchange.symbol,
+        'exchange': exchange.get_state(),
+        'components': {name: {k: v for k, v in vars(obj).items() if _is_plain(v)}
+                       for name, obj in _components(trader).items()},
+    }
+    tmp_path = checkpoint_path + '.tmp'
+    with gzip.open(tmp_path, 'wb', compresslevel=6) as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, checkpoint_path)
+
+
+def load_checkpoint(checkpoint_path: str, exchange, trader) -> Dict[str, Any]:
+    """
+    将快照恢复到新建的 exchange/trader 上，之后从快照位置继续回放。
+    K线文件可以是快照时的文件追加了新K线后的版本，此时无需重放历史即可增量继续回测。
+    """
+    if not os.path.exists(checkpoint_path):
+        raise FileNotFoundError(f"检查点文件不存在: {checkpoint_path}")
+    with gzip.open(checkpoint_path, 'rb') as f:
+        state = pickle.load(f)
+    if state.get('version') != CHECKPOINT_VERSION:
+        raise ValueError(f"不支持的检查点版本: {state.get('version')}")
+    if state['symbol'] != exchange.symbol:
+        raise ValueError(f"检查点交易对 {state['symbol']} 与当前回测 {exchange.symbol} 不一致")
+    exchange.set_state(state['exchange'])
+    components = _components(trader)
+    for name, attributes in state['components'].items():
+        for key, value in attributes.items():
+            setattr(components[name], key, value)
+    return state
@@ -0,0 +1,261 @@
+import os
+import re
+import uuid
+import shutil
+import asyncio
+import logging
+import tempfile
+import multiprocessing
+import numpy as np
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from backtest_api import BacktestCancelled, BacktestDataset, check_config_overrides, check_config_value, check_initial_balance, run_backtest
+from result_cache import BacktestResultCache
+from config import BACKTEST_JOB_MAX_QUEUED, BACKTEST_JOB_WORKERS, BACKTEST_KLINE_DIR
+
+# 提交任务时允许透传给 MockExchangeClient 的撮合选项及取值类型
+JOB_CLIENT_OPTIONS = {
+    'fee_rate': float,
+    'slippage': float,
+    'intrabar': bool,
+    'intrabar_ticks': int,
+    'resting_orders': bool,
+    'fill_volume_ratio': float,
+}
+SYMBOL_PATTERN = re.compile(r'^[A-Z0-9]{2,20}/[A-Z0-9]{2,20}$')
+KLINE_EXTENSIONS = ('.json', '.npy')
+
+# 工作进程内按 (路径, 交易对) 复用已加载的数据集，文件变化后重新加载
+_datasets: Dict[tuple, tuple] = {}
+
+
+class JobQueueFull(Exception):
+    """排队任务已达上限"""
+
+
+def _load_dataset(kline_path: str, symbol: str) -> BacktestDataset:
+    stat = os.stat(kline_path)
+    version = (stat.st_size, stat.st_mtime_ns)
+    cached = _datasets.get((kline_path, symbol))
+    if cached is None or cached[0] != version:
+        cached = (version, BacktestDataset(kline_path, symbol=symbol))
+        _datasets[(kline_path, symbol)] = cached
+    return cached[1]
+
+
+def _run_job(kline_path: str, symbol: str, params: Dict[str, Any], initial_balance: Optional[Dict[str, float]],
+             options: Dict[str, Any], cancel_path: str, cache_dir: Optional[str]) -> Dict[str, Any]:
+    """工作进程中执行一次回测；cancel_path 文件出现时中止"""
+    dataset = _load_dataset(kline_path, symbol)
+    return run_backtest(dataset, params, initial_balance, cache=BacktestResultCache(cache_dir),
+                        should_stop=lambda: os.path.exists(cancel_path), **options)
+
+
+def _plain(value):
+    """NumPy 标量转换为 Python 数值，便于JSON序列化"""
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _now() -> str:
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+class BacktestJobManager:
+    """
+    Web回测任务队列：任务在事件循环中排队，同时最多 max_workers 个在独立的进程池中运行，
+    交易主循环不会被回测阻塞。排队任务超过 max_queued 时拒绝新任务。
+    排队中的任务取消后直接移出队列；运行中的任务通过取消标记文件通知工作进程，在下一次检查时中止。
+    结果经 BacktestResultCache 缓存，相同请求再次提交时直接返回。最多保留 MAX_FINISHED 个已结束任务。
+    """
+
+    MAX_FINISHED = 50
+    FINISHED_STATES = ('done', 'failed', 'cancelled')
+
+    def __init__(self, max_workers: int = BACKTEST_JOB_WORKERS, max_queued: int = BACKTEST_JOB_MAX_QUEUED,
+                 kline_dir: str = BACKTEST_KLINE_DIR, cache_dir: Optional[str] = None):
+        self.max_workers = max(1, max_workers)
+        self.max_queued = max_queued
+        self.kline_dir = os.path.realpath(kline_dir)
+        self.cache_dir = cache_dir
+        self.jobs: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._cancel_dir: Optional[str] = None
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    # ---------------- 提交 ----------------
+
+    def resolve_kline(self, name: str) -> str:
+        """把请求中的K线文件名解析为 kline_dir 下的路径，不允许访问该目录以外的文件"""
+        if not isinstance(name, str) or not name:
+            raise ValueError("缺少K线文件 kline")
+        path = os.path.realpath(os.path.join(self.kline_dir, name))
+        if not path.startswith(self.kline_dir + os.sep) or not path.endswith(KLINE_EXTENSIONS):
+            raise ValueError(f"不允许的K线文件: {name}")
+        if not os.path.isfile(path):
+            raise ValueError(f"K线文件不存在: {name}")
+        return path
+
+    def submit(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        提交回测任务：{'kline': K线文件名, 'symbol': 交易对, 'params': 配置覆盖,
+        'initial_balance': 初始余额, 'options': 撮合选项}，返回任务状态。参数无效时抛出 ValueError。
+        """
+        if not isinstance(request, dict):
+            raise ValueError("请求体需为JSON对象")
+        kline_path = self.resolve_kline(request.get('kline'))
+        params = request.get('params') or {}
+        options = request.get('options') or {}
+        initial_balance = request.get('initial_balance')
+        if not isinstance(params, dict) or not isinstance(options, dict):
+            raise ValueError("params 和 options 需为JSON对象")
+        check_config_overrides(params)
+        unknown = set(options) - set(JOB_CLIENT_OPTIONS)
+        if unknown:
+            raise ValueError(f"不支持的撮合选项: {', '.join(sorted(unknown))}")
+        for key, value in options.items():
+            check_config_value(key, value, JOB_CLIENT_OPTIONS[key])
+        symbol = request.get('symbol') or 'BNB/USDT'
+        if not isinstance(symbol, str) or not SYMBOL_PATTERN.match(symbol):
+            raise ValueError(f"交易对格式无效: {symbol!r}（应为 BASE/QUOTE，如 BNB/USDT）")
+        if initial_balance is not None:
+            check_initial_balance(initial_balance)
+            initial_balance = {str(asset): float(amount) for asset, amount in initial_balance.items()}
+        queued = sum(1 for job in self.jobs.values() if job['status'] == 'queued')
+        if queued >= self.max_queued:
+            raise JobQueueFull(f"排队任务已达上限 {self.max_queued}")
+
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers)
+        job_id = uuid.uuid4().hex[:12]
+        job = {
+            'job_id': job_id,
+            'status': 'queued',
+            'kline': request['kline'],
+            'kline_path': kline_path,
+            'symbol': symbol,
+            'params': params,
+            'initial_balance': initial_balance,
+            'options': options,
+            'submitted_at': _now(),
+            'started_at': None,
+            'finished_at': None,
+            'error': None,
+            'result': None,
+        }
+        self.jobs[job_id] = job
+        self._tasks[job_id] = asyncio.get_running_loop().create_task(self._run(job))
+        self._prune()
+        self.logger.info(f"回测任务已提交: {job_id} {job['kline']} {params}")
+        return self.status(job_id)
+
+    # ---------------- 执行 ----------------
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # 交易进程内有运行中的事件循环和线程，工作进程用 spawn 启动而不是 fork
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+        return self._executor
+
+    def _cancel_path(self, job_id: str) -> str:
+        if self._cancel_dir is None:
+            self._cancel_dir = tempfile.mkdtemp(prefix='backtest_jobs_')
+        return os.path.join(self._cancel_dir, f"{job_id}.cancel")
+
+    async def _run(self, job: Dict[str, Any]):
+        job_id = job['job_id']
+        cancel_path = self._cancel_path(job_id)
+        try:
+            async with self._slots:
+                if job['status'] != 'queued':
+                    return
+                job['status'] = 'running'
+                job['started_at'] = _now()
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(
+                    self._get_executor(), _run_job, job['kline_path'], job['symbol'], job['params'],
+                    job['initial_balance'], job['options'], cancel_path, self.cache_dir)
+            job['result'] = result
+            job['status'] = 'done'
+        except (BacktestCancelled, asyncio.CancelledError):
+            job['status'] = 'cancelled'
+        except Exception as e:
+            self.logger.error(f"回测任务失败: {job_id} {e}", exc_info=True)
+            job['status'] = 'failed'
+            job['error'] = str(e)
+        finally:
+            job['finished_at'] = _now()
+            self._tasks.pop(job_id, None)
+            if os.path.exists(cancel_path):
+                os.remove(cancel_path)
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """取消任务，返回任务状态；任务不存在时返回 None"""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        if job['status'] == 'queued':
+            job['status'] = 'cancelled'
+            task = self._tasks.get(job_id)
+            if task is not None:
+                task.cancel()
+        elif job['status'] == 'running':
+            job['status'] = 'cancelling'
+            open(self._cancel_path(job_id), 'w').close()
+        return self.status(job_id)
+
+    async def shutdown(self):
+        """取消全部未结束的任务并关闭进程池"""
+        for job_id, job in list(self.jobs.items()):
+            if job['status'] in ('queued', 'running'):
+                self.cancel(job_id)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self._cancel_dir is not None:
+            shutil.rmtree(self._cancel_dir, ignore_errors=True)
+            self._cancel_dir = None
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job['status'] in self.FINISHED_STATES]
+        for job_id in finished[:max(0, len(finished) - self.MAX_FINISHED)]:
+            del self.jobs[job_id]
+
+    # ---------------- 查询 ----------------
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """任务状态（不含完整结果），完成的任务附带绩效指标和成交数"""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        status = {key: value for key, value in job.items() if key not in ('result', 'kline_path')}
+        result = job['result']
+        if result is not None:
+            status['metrics'] = result['metrics']
+            status['trade_count'] = len(result['trades'])
+        return status
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        return [self.status(job_id) for job_id in self.jobs]
+
+    def result(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """已完成任务的完整结果（成交、资金曲线、绩效指标、期末余额），未完成时返回 None"""
+        job = self.jobs.get(job_id)
+        if job is None or job['result'] is None:
+            return None
+        result = job['result']
+        return {
+            'job_id': job_id,
+            'params': result['params'],
+            'metrics': result['metrics'],
+            'initial_equity': result['initial_equity'],
+            'final_equity': result['final_equity'],
+            'final_balance': result['final_balance'],
+            'trades': [{key: _plain(value) for key, value in trade.items()} for trade in result['trades']],
+            'timestamps': np.asarray(result['timestamps']).tolist(),
+            'equity_curve': np.asarray(result['equity_curve']).tolist(),
+        }
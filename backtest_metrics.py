@@ -0,0 +1,168 @@
+import csv
+import json
+import math
+import numpy as np
+from typing import Any, Dict, List, Optional
+
+YEAR_MS = 365 * 86400 * 1000
+
+
+class EquityRecorder:
+    """
+    逐K线资金曲线记录器：时间戳和总资产写入预分配的NumPy缓冲区，
+    同一根K线重复记录时覆盖最后一条。
+    """
+
+    def __init__(self, capacity: int = 1024):
+        capacity = max(1, int(capacity))
+        self._timestamps = np.empty(capacity, dtype=np.int64)
+        self._equity = np.empty(capacity, dtype=np.float64)
+        self._bars = np.empty(capacity, dtype=np.int64)
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def record(self, bar_index: int, timestamp, equity: float):
+        if self.size and self._bars[self.size - 1] == bar_index:
+            i = self.size - 1
+        else:
+            if self.size == len(self._equity):
+                # 容量不足时按2倍扩容
+                self._timestamps = np.resize(self._timestamps, 2 * self.size)
+                self._equity = np.resize(self._equity, 2 * self.size)
+                self._bars = np.resize(self._bars, 2 * self.size)
+            i = self.size
+            self.size += 1
+        self._timestamps[i] = timestamp
+        self._equity[i] = equity
+        self._bars[i] = bar_index
+
+    def record_many(self, bar_indices, timestamps, equity):
+        """批量记录连续多根K线（bar_indices 递增），首根与最后一条记录为同一根K线时覆盖"""
+        bar_indices = np.asarray(bar_indices, dtype=np.int64)
+        count = len(bar_indices)
+        if not count:
+            return
+        if self.size and self._bars[self.size - 1] == bar_indices[0]:
+            self.size -= 1
+        needed = self.size + count
+        if needed > len(self._equity):
+            capacity = max(needed, 2 * len(self._equity))
+            self._timestamps = np.resize(self._timestamps, capacity)
+            self._equity = np.resize(self._equity, capacity)
+            self._bars = np.resize(self._bars, capacity)
+        self._timestamps[self.size:needed] = timestamps
+        self._equity[self.size:needed] = equity
+        self._bars[self.size:needed] = bar_indices
+        self.size = needed
+
+    def get_state(self) -> Dict[str, np.ndarray]:
+        return {'timestamps': self.timestamps.copy(), 'equity': self.equity.copy(), 'bars': self._bars[:self.size].copy()}
+
+    @classmethod
+    def from_state(cls, state: Dict[str, np.ndarray], capacity: int = 1024) -> 'EquityRecorder':
+        size = len(state['equity'])
+        recorder = cls(max(capacity, size))
+        recorder._timestamps[:size] = state['timestamps']
+        recorder._equity[:size] = state['equity']
+        recorder._bars[:size] = state['bars']
+        recorder.size = size
+        return recorder
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        return self._timestamps[:self.size]
+
+    @property
+    def equity(self) -> np.ndarray:
+        return self._equity[:self.size]
+
+
+def compute_metrics(timestamps, equity, trades: Optional[List[Dict[str, Any]]] = None,
+                    initial_equity: Optional[float] = None) -> Dict[str, Any]:
+    """
+    由逐K线资金曲线（时间戳毫秒）计算回测绩效指标：
+    总收益率、年化收益率(CAGR)、夏普/索提诺比率（按K线周期年化）、最大回撤（非正比例）及持续时间、
+    换手率（成交额/平均资产）和手续费拖累（手续费/初始资产）。
+    """
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    equity = np.asarray(equity, dtype=np.float64)
+    trades = trades or []
+    costs = np.fromiter((float(t['cost']) for t in trades), dtype=np.float64, count=len(trades))
+    fees = np.fromiter((float(t['fee']) for t in trades), dtype=np.float64, count=len(trades))
+    metrics = {
+        'bars': int(len(equity)),
+        'initial_equity': float(initial_equity if initial_equity is not None else (equity[0] if len(equity) else 0.0)),
+        'final_equity': float(equity[-1]) if len(equity) else 0.0,
+        'total_return': 0.0,
+        'cagr': 0.0,
+        'sharpe': 0.0,
+        'sortino': 0.0,
+        'max_drawdown': 0.0,
+        'max_drawdown_bars': 0,
+        'max_drawdown_days': 0.0,
+        'turnover': 0.0,
+        'fee_drag': 0.0,
+        'trade_count': len(trades),
+        'total_fees': float(fees.sum()),
+    }
+    initial = metrics['initial_equity']
+    if not len(equity) or initial <= 0:
+        return metrics
+    final = metrics['final_equity']
+    metrics['total_return'] = final / initial - 1
+    years = (timestamps[-1] - timestamps[0]) / YEAR_MS
+    if years > 0 and final > 0:
+        metrics['cagr'] = (final / initial) ** (1 / years) - 1
+    # 逐K线收益率，按K线周期年化
+    returns = np.diff(np.r_[initial, equity]) / np.r_[initial, equity[:-1]]
+    if len(timestamps) > 1:
+        periods_per_year = YEAR_MS / float(np.median(np.diff(timestamps)))
+        mean = returns.mean()
+        std = returns.std(ddof=1) if len(returns) > 1 else 0.0
+        downside = math.sqrt(float(np.mean(np.minimum(returns, 0.0) ** 2)))
+        metrics['sharpe'] = float(mean / std * math.sqrt(periods_per_year)) if std > 0 else 0.0
+        metrics['sortino'] = float(mean / downside * math.sqrt(periods_per_year)) if downside > 0 else 0.0
+    # 最大回撤及持续时间（从前高到恢复前的最长水下区间）
+    peak = np.maximum.accumulate(np.r_[initial, equity])[1:]
+    drawdown = equity / peak - 1
+    metrics['max_drawdown'] = float(min(drawdown.min(), 0.0))
+    positions = np.arange(len(equity))
+    last_peak = np.maximum.accumulate(np.where(equity >= peak, positions, 0))
+    underwater_bars = positions - last_peak
+    underwater_ms = timestamps - timestamps[last_peak]
+    metrics['max_drawdown_bars'] = int(underwater_bars.max())
+    metrics['max_drawdown_days'] = float(underwater_ms.max() / 86400000)
+    metrics['turnover'] = float(costs.sum() / equity.mean()) if equity.mean() > 0 else 0.0
+    metrics['fee_drag'] = float(fees.sum() / initial)
+    return metrics
+
+
+def write_metrics_json(metrics: Dict[str, Any], file_path: str):
+    with open(file_path, 'w', encoding='utf-8') as f:
+        json.dump(metrics, f, ensure_ascii=False, indent=2)
+
+
+TRADE_CSV_FIELDS = ['timestamp', 'side', 'price', 'amount', 'cost', 'fee', 'order_id', 'profit']
+
+
+def write_trades_csv(trades: List[Dict[str, Any]], file_path: str) -> bool:
+    """成交记录写入CSV，没有成交时不写文件并返回 False"""
+    if not trades:
+        return False
+    with open(file_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=TRADE_CSV_FIELDS)
+        writer.writeheader()
+        for trade in trades:
+            writer.writerow(trade)
+    return True
+
+
+def write_equity_csv(timestamps, equity, file_path: str) -> bool:
+    """逐K线资金曲线写入CSV: timestamp, equity"""
+    with open(file_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['timestamp', 'equity'])
+        writer.writerows(zip(np.asarray(timestamps).tolist(), np.asarray(equity).tolist()))
+    return True
@@ -0,0 +1,172 @@
+import os
+import csv
+import json
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+from backtest_metrics import TRADE_CSV_FIELDS
+
+# 成交记录中按数值解析的列
+TRADE_NUMERIC_FIELDS = ('price', 'amount', 'cost', 'fee', 'profit')
+DOWNSAMPLE_METHODS = ('lttb', 'minmax')
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, points: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets 降采样：保留首尾点，其余点均分为 points - 2 个桶，
+    每个桶选出与上一个选中点、下一个桶均值点构成三角形面积最大的点。返回选中点的下标。
+    """
+    n = len(y)
+    if points >= n:
+        return np.arange(n)
+    if points < 3:
+        return np.array([0, n - 1], dtype=np.int64)
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    # 每个桶的均值点（最后一个桶之后为末点）
+    next_x = np.append(np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / np.diff(edges), x[-1])
+    next_y = np.append(np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / np.diff(edges), y[-1])
+    selected = np.empty(points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for b in range(points - 2):
+        start, end = edges[b], edges[b + 1]
+        ax, ay = x[previous], y[previous]
+        cx, cy = next_x[b + 1], next_y[b + 1]
+        area = np.abs((ax - cx) * (y[start:end] - ay) - (ax - x[start:end]) * (cy - ay))
+        previous = start + int(np.argmax(area))
+        selected[b + 1] = previous
+    return selected
+
+
+def minmax_indices(y: np.ndarray, points: int) -> np.ndarray:
+    """最小/最大值降采样：均分为 points // 2 个桶，每个桶保留最低点和最高点（按原顺序），并保留首尾点"""
+    n = len(y)
+    if points >= n:
+        return np.arange(n)
+    buckets = max(1, points // 2 - 1)
+    edges = np.linspace(0, n, buckets + 1).astype(np.int64)
+    selected = [0, n - 1]
+    for start, end in zip(edges[:-1], edges[1:]):
+        if end > start:
+            window = y[start:end]
+            selected.append(start + int(np.argmin(window)))
+            selected.append(start + int(np.argmax(window)))
+    return np.unique(selected)
+
+
+class BacktestResultView:
+    """
+    回测结果文件（成交CSV、资金曲线CSV、绩效JSON）的查询视图：文件按修改时间和大小缓存解析结果，
+    文件未变化时直接使用内存中的数组；查询按时间范围截取，资金曲线降采样到目标点数，成交记录分页返回，
+    响应大小与回测长度无关。
+    """
+
+    MAX_POINTS = 5000
+    MAX_PAGE_SIZE = 1000
+
+    def __init__(self, trades_path: str = 'backtest_trades.csv', equity_path: str = 'backtest_equity_curve.csv',
+                 metrics_path: str = 'backtest_metrics.json'):
+        self.trades_path = trades_path
+        self.equity_path = equity_path
+        self.metrics_path = metrics_path
+        self._cache: Dict[str, Tuple[Optional[Tuple[int, int]], Any]] = {}
+
+    # ---------------- 读取 ----------------
+
+    def _load(self, path: str, parse):
+        """按 (修改时间, 大小) 缓存文件解析结果，文件不存在时返回 None"""
+        try:
+            stat = os.stat(path)
+            version = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            version = None
+        cached = self._cache.get(path)
+        if cached is None or cached[0] != version:
+            cached = (version, parse(path) if version is not None else None)
+            self._cache[path] = cached
+        return cached[1]
+
+    @staticmethod
+    def _parse_equity(path: str) -> Tuple[np.ndarray, np.ndarray]:
+        data = np.loadtxt(path, delimiter=',', skiprows=1, ndmin=2)
+        if data.size == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        return data[:, 0].astype(np.int64), data[:, 1].copy()
+
+    @staticmethod
+    def _parse_trades(path: str) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+        trades = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                trade = {field: row.get(field) for field in TRADE_CSV_FIELDS}
+                trade['timestamp'] = int(float(trade['timestamp']))
+                for field in TRADE_NUMERIC_FIELDS:
+                    trade[field] = float(trade[field]) if trade[field] not in (None, '') else None
+                trades.append(trade)
+        return np.array([t['timestamp'] for t in trades], dtype=np.int64), trades
+
+    @staticmethod
+    def _parse_metrics(path: str) -> Dict[str, Any]:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    # ---------------- 查询 ----------------
+
+    def query(self, start: Optional[int] = None, end: Optional[int] = None, points: int = 500,
+              method: str = 'lttb', page: int = 1, page_size: int = 100, order: str = 'asc') -> Dict[str, Any]:
+        """
+        按时间范围 [start, end]（毫秒时间戳，含端点）查询：资金曲线降采样到最多 points 个点，
+        成交记录按 order（asc/desc）排序后返回第 page 页（每页 page_size 条）。参数无效时抛出 ValueError。
+        """
+        if method not in DOWNSAMPLE_METHODS:
+            raise ValueError(f"不支持的降采样方法: {method}")
+        if order not in ('asc', 'desc'):
+            raise ValueError(f"不支持的排序: {order}")
+        if points < 2 or page < 1 or page_size < 1:
+            raise ValueError("points 需不小于2，page、page_size 需为正数")
+        points = min(points, self.MAX_POINTS)
+        page_size = min(page_size, self.MAX_PAGE_SIZE)
+
+        equity_curve = []
+        equity_total = 0
+        equity = self._load(self.equity_path, self._parse_equity)
+        if equity is not None:
+            lo, hi = self._bounds(equity[0], start, end)
+            timestamps, values = equity[0][lo:hi], equity[1][lo:hi]
+            equity_total = len(values)
+            if method == 'lttb':
+                index = lttb_indices(timestamps.astype(np.float64), values, points)
+            else:
+                index = minmax_indices(values, points)
+            equity_curve = [{'timestamp': t, 'equity': v}
+                            for t, v in zip(timestamps[index].tolist(), values[index].tolist())]
+
+        page_trades = []
+        trade_total = 0
+        trades = self._load(self.trades_path, self._parse_trades)
+        if trades is not None:
+            lo, hi = self._bounds(trades[0], start, end)
+            trade_total = hi - lo
+            if order == 'asc':
+                first = lo + (page - 1) * page_size
+                page_trades = trades[1][first:min(first + page_size, hi)]
+            else:
+                last = hi - (page - 1) * page_size
+                page_trades = trades[1][max(last - page_size, lo):max(last, lo)][::-1]
+
+        metrics = self._load(self.metrics_path, self._parse_metrics)
+        return {
+            'equity_curve': equity_curve,
+            'equity_points': equity_total,
+            'downsampled': len(equity_curve) < equity_total,
+            'trades': page_trades,
+            'trade_page': {'page': page, 'page_size': page_size, 'total': trade_total,
+                           'pages': (trade_total + page_size - 1) // page_size, 'order': order},
+            'metrics': metrics or {},
+        }
+
+    @staticmethod
+    def _bounds(timestamps: np.ndarray, start: Optional[int], end: Optional[int]) -> Tuple[int, int]:
+        lo = int(np.searchsorted(timestamps, start, side='left')) if start is not None else 0
+        hi = int(np.searchsorted(timestamps, end, side='right')) if end is not None else len(timestamps)
+        return lo, max(lo, hi)
+
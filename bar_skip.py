@@ -0,0 +1,123 @@
+import numpy as np
+from kline_store import KlineSeries
+
+
+class BarSkipper:
+    """
+    逐根回测的跳K线加速：价格在网格上下轨之间、未触及S1高低点、且没有定时逻辑到期时，
+    step_once 不会产生任何动作（轨道内 highest/lowest 不会被使用），可直接快进。
+    按当前 base_price/grid_size、S1高低点和定时逻辑状态，在剩余K线上向量化查找
+    下一根策略可能动作的K线，用 MockExchangeClient.fast_forward 跳到该K线再执行策略，结果与逐根回测一致。
+    非K线内模式下策略读取的价格为收盘价，因此按收盘价判断。
+    不支持K线内价格路径、挂单撮合和流式读取模式（见 supported）。
+    """
+
+    def __init__(self, exchange, trader, margin: float = 0.0, chunk: int = 16):
+        self.exchange = exchange
+        self.trader = trader
+        self.margin = margin
+        self.chunk = chunk
+        data = exchange.kline_data
+        if isinstance(data, KlineSeries):
+            timestamps, closes = data.column('timestamp'), data.column('close').astype(np.float64)
+        else:
+            timestamps = np.fromiter((k[0] for k in data), dtype=np.int64, count=len(data))
+            closes = np.fromiter((k[4] for k in data), dtype=np.float64, count=len(data))
+        self.timestamps = timestamps
+        self.times = timestamps / 1000
+        self.closes = closes
+        self._s1_retry_at = None
+        self.steps = 0
+
+    @staticmethod
+    def supported(exchange) -> bool:
+        return not (exchange.intrabar or exchange.stream or exchange.resting_orders)
+
+    def price_levels(self):
+        """当前可能触发交易的价格边界 (下界, 上界)：网格上下轨与S1高低点中较紧的一侧，按 margin 放宽"""
+        trader = self.trader
+        low, high = trader._get_lower_band(), trader._get_upper_band()
+        s1 = trader.position_controller_s1
+        if s1.s1_daily_high is not None and s1.s1_daily_low is not None:
+            # S1在价格高于日线高点/低于日线低点时调仓
+            low, high = max(low, s1.s1_daily_low), min(high, s1.s1_daily_high)
+        return low * (1 + self.margin), high * (1 - self.margin)
+
+    def _risk_price_range(self):
+        """风控检查（multi_layer_check）通过时的价格区间：仓位比例 B*p/(B*p+Q) 随价格单调递增"""
+        config = self.trader.config
+        quote, base = self.exchange.total_balances()
+        if base <= 0 or quote <= 0:
+            return 0.0, np.inf
+        low = config.MIN_POSITION_RATIO * quote / (base * (1 - config.MIN_POSITION_RATIO))
+        high = config.MAX_POSITION_RATIO * quote / (base * (1 - config.MAX_POSITION_RATIO)) \
+            if config.MAX_POSITION_RATIO < 1 else np.inf
+        # 放宽一点避免浮点误差漏掉边界上的K线
+        return low * (1 - 1e-9), high * (1 + 1e-9)
+
+    def next_scheduled(self, start: int, stop: int) -> int:
+        """
+        [start, stop) 内定时逻辑执行的第一根K线：S1高低点到期更新，或网格调整到期且风控检查通过
+        （风控不通过时不会调整）。到期判断与 step_once 使用相同的浮点运算；没有时返回 stop。
+        """
+        trader = self.trader
+        s1 = trader.position_controller_s1
+        times = self.times
+        last_adjust, adjust_interval = trader.last_grid_adjust_time, trader.config.GRID_PARAMS.get('adjust_interval', 24) * 3600
+        last_s1, s1_interval = s1.s1_last_data_update_ts, s1.daily_update_interval
+        s1_from = max(start, int(np.searchsorted(times, last_s1 + s1_interval)) - 1)
+        if self._s1_retry_at is not None:
+            s1_from = max(s1_from, int(np.searchsorted(times, self._s1_retry_at)) - 1)
+        due = self._first(times, s1_from, stop, lambda t: t - last_s1 >= s1_interval)
+        adjust_from = max(start, int(np.searchsorted(times, last_adjust + adjust_interval)) - 1)
+        adjust_from = self._first(times, adjust_from, due, lambda t: t - last_adjust > adjust_interval)
+        if adjust_from < due:
+            low, high = self._risk_price_range()
+            due = self._first(self.closes, adjust_from, due, lambda closes: (closes >= low) & (closes <= high))
+        return due
+
+    def next_signal(self, start: int, stop: int) -> int:
+        """[start, stop) 内收盘价触及网格上下轨或S1高低点的第一根K线，没有时返回 stop"""
+        low, high = self.price_levels()
+        return self._first(self.closes, start, stop, lambda closes: (closes <= low) | (closes >= high))
+
+    def next_active(self, start: int, stop: int) -> int:
+        """[start, stop) 内策略可能动作的第一根K线，没有时返回 stop"""
+        if start >= stop:
+            return stop
+        # 价格在轨道外时（最常见的动作原因）直接返回，避免每根K线都做向量化查找
+        low, high = self.price_levels()
+        price = self.closes[start]
+        if price <= low or price >= high:
+            return start
+        due = self.next_scheduled(start, stop)
+        return self.next_signal(start + 1, due) if due > start + 1 else due
+
+    def _first(self, values: np.ndarray, start: int, stop: int, condition) -> int:
+        """分块向量化查找 values[start:stop] 中第一个满足条件的位置（块长度倍增，近处命中时不扫描全部剩余K线）"""
+        size = self.chunk
+        while start < stop:
+            end = min(start + size, stop)
+            hits = np.flatnonzero(condition(values[start:end]))
+            if len(hits):
+                return start + int(hits[0])
+            start, size = end, size * 2
+        return stop
+
+    async def skip(self) -> bool:
+        """快进到下一根策略可能动作的K线（最多到最后一根K线），返回是否还能继续推进"""
+        exchange = self.exchange
+        last = len(self.closes) - 1
+        target = self.next_active(exchange.kline_index, last)
+        if target > exchange.kline_index:
+            await exchange.fast_forward(target)
+        return exchange.has_next()
+
+    async def step(self):
+        """执行一次策略；S1高低点更新失败（日线不足）时，日线数量要到下一个自然日才会变化，在此之前不必重试"""
+        trader = self.trader
+        s1 = trader.position_controller_s1
+        await trader.step_once()
+        self.steps += 1
+        now = trader.clock.time()
+        self._s1_retry_at = (now // 86400 + 1) * 86400 if now - s1.s1_last_data_update_ts >= s1.daily_update_interval else None
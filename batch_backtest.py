@@ -0,0 +1,363 @@
+import json
+import math
+import numpy as np
+from typing import Any, Dict, List
+from config import SAFETY_MARGIN
+from strategy_core import GridCore, S1Core
+from vectorized_backtest import VectorizedBacktester
+
+
+class BatchBacktester:
+    """
+    在一个进程内同时回测K组参数的批量引擎。
+    账户余额、基准价、最高/最低价、网格大小、缓存等状态保存为长度K的数组，
+    每根K线用NumPy对全部配置一次性完成信号、余额检查、风控、S1和网格调整判断；
+    下单、S1调整和初始化等少量动作交由 VectorizedBacktester 的逐根实现执行，
+    因此每个配置的成交记录和权益与单独回测逐位一致。
+    波动率→网格映射直接调用 GridCore；信号和S1判断为 GridCore / S1Core 规则的逐元素向量化版本
+    （_sell_signal、_buy_signal、_s1_decide），按配置逐个调用 Python 对象会失去批量计算的意义。
+
+    支持按配置区分的参数：INITIAL_GRID、FLIP_THRESHOLD、MIN/MAX_POSITION_RATIO、
+    S1_LOOKBACK、S1_SELL_TARGET_PCT、S1_BUY_TARGET_PCT、GRID_PARAMS（网格上下限、
+    调整间隔、波动率分档）、BASE_AMOUNT、MIN_TRADE_AMOUNT、INITIAL_BASE_PRICE。
+    VOLATILITY_WINDOW 需所有配置一致。
+    """
+
+    def __init__(self, klines, configs, initial_balance: Dict[str, float] = None, fee_rate: float = 0.001,
+                 slippage: float = 0.0, record_equity: bool = True, features=None):
+        self.configs = list(configs)
+        if not self.configs:
+            raise ValueError("批量回测至少需要一组配置")
+        if len({c.VOLATILITY_WINDOW for c in self.configs}) > 1:
+            raise ValueError("批量回测要求所有配置的 VOLATILITY_WINDOW 一致")
+        # 标量引擎：负责初始化、下单和S1调整等动作，并提供K线数组和波动率计算
+        self.engine = VectorizedBacktester(klines, self.configs[0], initial_balance=initial_balance,
+                                           fee_rate=fee_rate, slippage=slippage, features=features)
+        self.record_equity = record_equity
+        self.k = len(self.configs)
+
+        # 按配置绑定到标量引擎的参数和策略规则（GridCore / S1Core 的状态由 _load 载入）
+        self._bindings = [{
+            'config': c,
+            'grid_core': GridCore(c),
+            's1_core': S1Core(c),
+            'adjust_interval_seconds': c.GRID_PARAMS.get('adjust_interval', 24) * 3600,
+        } for c in self.configs]
+        self.s1_lookback = np.array([b['s1_core'].lookback for b in self._bindings], dtype=np.int64)
+        self.s1_sell_target = np.array([b['s1_core'].sell_target_pct for b in self._bindings], dtype=np.float64)
+        self.s1_buy_target = np.array([b['s1_core'].buy_target_pct for b in self._bindings], dtype=np.float64)
+        self.adjust_interval = np.array([b['adjust_interval_seconds'] for b in self._bindings], dtype=np.float64)
+        self.min_ratio = np.array([c.MIN_POSITION_RATIO for c in self.configs], dtype=np.float64)
+        self.max_ratio = np.array([c.MAX_POSITION_RATIO for c in self.configs], dtype=np.float64)
+        self.min_trade_amount = np.array([c.MIN_TRADE_AMOUNT for c in self.configs], dtype=np.float64)
+        self.base_amount = np.array([c.BASE_AMOUNT for c in self.configs], dtype=np.float64)
+
+        # 波动率→网格的映射按 (分档表, 上下限, 默认网格) 去重
+        table_ids = {}
+        self._grid_tables = []
+        grid_table = []
+        for c in self.configs:
+            key = json.dumps([c.GRID_PARAMS['volatility_threshold']['ranges'], c.GRID_PARAMS['min'],
+                              c.GRID_PARAMS['max'], c.INITIAL_GRID], sort_keys=True)
+            if key not in table_ids:
+                table_ids[key] = len(self._grid_tables)
+                self._grid_tables.append(GridCore(c))
+            grid_table.append(table_ids[key])
+        self.grid_table = np.array(grid_table, dtype=np.int64)
+
+    # ---------------- 状态数组与标量引擎同步 ----------------
+
+    def _reset_state(self):
+        k = self.k
+        self.usdt = np.zeros(k)
+        self.bnb = np.zeros(k)
+        self.fund_usdt = np.zeros(k)
+        self.fund_bnb = np.zeros(k)
+        self.order_id_counter = np.ones(k, dtype=np.int64)
+        self.base_price = np.zeros(k)
+        self.grid_size = np.zeros(k)
+        self.threshold = np.zeros(k)
+        self.highest = np.full(k, np.nan)
+        self.lowest = np.full(k, np.nan)
+        self.last_grid_adjust_time = np.zeros(k)
+        self.assets_cache_time = np.full(k, -np.inf)
+        self.assets_cache_value = np.zeros(k)
+        self.order_amount_cache_time = np.full(k, -np.inf)
+        self.order_amount_cache_value = np.zeros(k)
+        self.s1_daily_high = np.full(k, np.nan)
+        self.s1_daily_low = np.full(k, np.nan)
+        self.s1_last_data_update_ts = np.zeros(k)
+        self.trades: List[List[Dict[str, Any]]] = [[] for _ in range(k)]
+        self.equity_peak = np.full(k, -np.inf)
+        self.max_drawdown = np.zeros(k)
+        n = len(self.engine._close_list)
+        self.equity_curve = np.empty((k, n)) if self.record_equity else None
+        self._volatility_index = -1
+        self._bar_cache = None
+        self.actions = 0
+
+    def _bind(self, k):
+        for name, value in self._bindings[k].items():
+            setattr(self.engine, name, value)
+
+    def _load(self, k, i):
+        """将第k组配置的状态载入标量引擎"""
+        e = self.engine
+        self._bind(k)
+        e.index = i
+        e.current_price = e._close_list[i]
+        e.initialized = True
+        e.usdt = float(self.usdt[k])
+        e.bnb = float(self.bnb[k])
+        e.fund_usdt = float(self.fund_usdt[k])
+        e.fund_bnb = float(self.fund_bnb[k])
+        e.order_id_counter = int(self.order_id_counter[k])
+        e.trades = self.trades[k]
+        e.base_price = float(self.base_price[k])
+        e.grid_size = float(self.grid_size[k])
+        e.highest = None if math.isnan(self.highest[k]) else float(self.highest[k])
+        e.lowest = None if math.isnan(self.lowest[k]) else float(self.lowest[k])
+        e.last_grid_adjust_time = float(self.last_grid_adjust_time[k])
+        e._assets_cache = None if math.isinf(self.assets_cache_time[k]) else (float(self.assets_cache_time[k]), float(self.assets_cache_value[k]))
+        e._order_amount_cache = None if math.isinf(self.order_amount_cache_time[k]) else (float(self.order_amount_cache_time[k]), float(self.order_amount_cache_value[k]))
+        e.s1_daily_high = None if math.isnan(self.s1_daily_high[k]) else float(self.s1_daily_high[k])
+        e.s1_daily_low = None if math.isnan(self.s1_daily_low[k]) else float(self.s1_daily_low[k])
+        e.s1_last_data_update_ts = float(self.s1_last_data_update_ts[k])
+
+    def _store(self, k):
+        """将标量引擎的状态写回第k组配置"""
+        e = self.engine
+        self.usdt[k] = e.usdt
+        self.bnb[k] = e.bnb
+        self.fund_usdt[k] = e.fund_usdt
+        self.fund_bnb[k] = e.fund_bnb
+        self.order_id_counter[k] = e.order_id_counter
+        self.base_price[k] = e.base_price
+        if e.grid_size != self.grid_size[k]:
+            self.grid_size[k] = e.grid_size
+            self.threshold[k] = e.grid_core.threshold()
+        self.highest[k] = np.nan if e.highest is None else e.highest
+        self.lowest[k] = np.nan if e.lowest is None else e.lowest
+        self.last_grid_adjust_time[k] = e.last_grid_adjust_time
+        self.assets_cache_time[k], self.assets_cache_value[k] = e._assets_cache if e._assets_cache is not None else (-np.inf, 0.0)
+        self.order_amount_cache_time[k], self.order_amount_cache_value[k] = e._order_amount_cache if e._order_amount_cache is not None else (-np.inf, 0.0)
+        self.s1_daily_high[k] = np.nan if e.s1_daily_high is None else e.s1_daily_high
+        self.s1_daily_low[k] = np.nan if e.s1_daily_low is None else e.s1_daily_low
+        self.s1_last_data_update_ts[k] = e.s1_last_data_update_ts
+
+    # ---------------- 向量化的账户与缓存计算 ----------------
+
+    def _get_total_assets(self, idx, now, price):
+        stale = idx[~(now - self.assets_cache_time[idx] < VectorizedBacktester.ASSETS_CACHE_TTL)]
+        if len(stale):
+            spot_value = self.usdt[stale] + (self.bnb[stale] * price)
+            fund_value = self.fund_usdt[stale] + (self.fund_bnb[stale] * price)
+            self.assets_cache_value[stale] = spot_value + fund_value
+            self.assets_cache_time[stale] = now
+        return self.assets_cache_value[idx]
+
+    def _calculate_order_amount(self, idx, now, price):
+        stale = idx[~(now - self.order_amount_cache_time[idx] < VectorizedBacktester.ORDER_AMOUNT_CACHE_TTL)]
+        if len(stale):
+            self.order_amount_cache_value[stale] = self._get_total_assets(stale, now, price) * 0.1
+            self.order_amount_cache_time[stale] = now
+        return self.order_amount_cache_value[idx]
+
+    def _check_balance(self, idx, now, price, side):
+        """对应 _check_buy_balance/_check_sell_balance，余额不足时尝试从理财赎回"""
+        amount_usdt = self._calculate_order_amount(idx, now, price)
+        if side == 'buy':
+            spot, fund, needed = self.usdt, self.fund_usdt, amount_usdt
+        else:
+            spot, fund, needed = self.bnb, self.fund_bnb, amount_usdt / price
+        spot_balance = spot[idx]
+        ok = spot_balance >= needed
+        redeem = ~ok & ~(spot_balance + fund[idx] < needed)
+        needed_amount = (needed - spot_balance) * 1.05
+        redeem &= ~(fund[idx] < needed_amount)
+        if redeem.any():
+            r = idx[redeem]
+            fund[r] -= needed_amount[redeem]
+            spot[r] += needed_amount[redeem]
+            ok |= redeem & (spot[idx] >= needed)
+        return ok
+
+    def _bar_volatility(self, i):
+        """返回第i根K线的波动率及各分档表对应的目标网格（按K线缓存）"""
+        if self._volatility_index != i:
+            volatility = self.engine._calculate_volatility(i)
+            values = [core.grid_for_volatility(volatility) for core in self._grid_tables]
+            self._bar_cache = (volatility, np.array(values, dtype=np.float64))
+            self._volatility_index = i
+        return self._bar_cache
+
+    # ---------------- 主循环 ----------------
+
+    def _update_daily_s1_levels(self, i, now):
+        due = (now - self.s1_last_data_update_ts) >= self.engine.daily_update_interval
+        if not due.any():
+            return
+        e = self.engine
+        e.index = i
+        for lookback in np.unique(self.s1_lookback[due]).tolist():
+            levels = e._s1_levels(lookback)
+            if levels is None:
+                continue
+            sel = due & (self.s1_lookback == lookback)
+            self.s1_daily_high[sel], self.s1_daily_low[sel] = levels
+            self.s1_last_data_update_ts[sel] = now
+
+    def _act(self, k, i, action, *args):
+        self._load(k, i)
+        getattr(self.engine, action)(*args)
+        self._store(k)
+        self.actions += 1
+
+    def step(self, i):
+        """对全部配置执行第i根K线的 GridTrader.step_once"""
+        e = self.engine
+        now = e._time_list[i]
+        price = e._close_list[i]
+        self._update_daily_s1_levels(i, now)
+        if not price:
+            return
+        everyone = np.arange(self.k)
+
+        # 卖出信号触发后检查余额，卖出的配置不再检查买入信号
+        sell_go = np.zeros(self.k, dtype=bool)
+        triggered = self._sell_signal(everyone, price)
+        if len(triggered):
+            sell_go[triggered[self._check_balance(triggered, now, price, 'sell')]] = True
+        buy_go = np.zeros(self.k, dtype=bool)
+        triggered = self._buy_signal(everyone[~sell_go], price)
+        if len(triggered):
+            buy_go[triggered[self._check_balance(triggered, now, price, 'buy')]] = True
+
+        for k in np.flatnonzero(sell_go).tolist():
+            self._act(k, i, '_execute_order', 'sell')
+        for k in np.flatnonzero(buy_go).tolist():
+            self._act(k, i, '_execute_order', 'buy')
+
+        # 未下单的配置：风控检查 → S1 → 网格调整
+        position_value = (self.bnb + self.fund_bnb) * price
+        total_assets = position_value + (self.usdt + self.fund_usdt)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            position_ratio = np.where(total_assets == 0, 0.0, position_value / total_assets)
+        passed = ~(sell_go | buy_go) & ~((position_ratio < self.min_ratio) | (position_ratio > self.max_ratio))
+        self._s1_check_and_execute(i, now, price, everyone[passed & ~np.isnan(self.s1_daily_high) & ~np.isnan(self.s1_daily_low)],
+                                   position_ratio, position_value)
+        adjust = everyone[passed & (now - self.last_grid_adjust_time > self.adjust_interval)]
+        if len(adjust):
+            new_grid = self._bar_volatility(i)[1][self.grid_table[adjust]]
+            changed = adjust[new_grid != self.grid_size[adjust]]
+            self.last_grid_adjust_time[adjust] = now
+            if len(changed):
+                self.grid_size[adjust] = new_grid
+                for k in changed.tolist():
+                    self.threshold[k] = self._bindings[k]['grid_core'].flip_threshold(float(self.grid_size[k]))
+
+    def _sell_signal(self, idx, price):
+        """GridCore.sell_signal 的向量化版本：idx 中价格在上轨及以上的配置刷新最高价，返回从最高价回调达到阈值的配置"""
+        above = idx[price >= self.base_price[idx] * (1 + self.grid_size[idx] / 100)]
+        if not len(above):
+            return above
+        highest = self.highest[above]
+        highest = np.where(np.isnan(highest) | (price > highest), price, highest)
+        self.highest[above] = highest
+        return above[(highest != 0) & (price <= highest * (1 - self.threshold[above]))]
+
+    def _buy_signal(self, idx, price):
+        """GridCore.buy_signal 的向量化版本：idx 中价格在下轨及以下的配置刷新最低价，返回从最低价反弹达到阈值的配置"""
+        below = idx[price <= self.base_price[idx] * (1 - self.grid_size[idx] / 100)]
+        if not len(below):
+            return below
+        lowest = self.lowest[below]
+        lowest = np.where(np.isnan(lowest) | (price < lowest), price, lowest)
+        self.lowest[below] = lowest
+        return below[(lowest != 0) & (price >= lowest * (1 + self.threshold[below]))]
+
+    def _s1_decide(self, idx, price, position_pct, position_value, total_assets):
+        """S1Core.decide 的向量化版本：返回 (是否卖出, 调仓数量, 是否调仓)，账户快照为 idx 对应配置的数组"""
+        sell_target, buy_target = self.s1_sell_target[idx], self.s1_buy_target[idx]
+        sell = (price > self.s1_daily_high[idx]) & (position_pct > sell_target)
+        sell_value_needed = position_value - total_assets * sell_target
+        sell_amount = np.minimum(sell_value_needed / price, self.bnb[idx] * SAFETY_MARGIN)
+        buy = ~sell & (price < self.s1_daily_low[idx]) & (position_pct < buy_target)
+        buy_value_needed = total_assets * buy_target - position_value
+        buy_amount = buy_value_needed / price
+        sell &= sell_value_needed > 0
+        buy &= buy_value_needed > 0
+        amount = np.where(sell, sell_amount, buy_amount)
+        return sell, amount, (sell | buy) & (amount > 1e-9)
+
+    def _s1_check_and_execute(self, i, now, price, idx, position_ratio, position_value):
+        if not len(idx):
+            return
+        total_assets = self._get_total_assets(idx, now, price)
+        sell, amount, act = self._s1_decide(idx, price, position_ratio[idx], position_value[idx], total_assets)
+        buy = act & ~sell
+        act &= total_assets > 0
+        if not act.any():
+            return
+        # 排除按3位小数取整后必然不满足最小下单量的调整（与 _s1_candidates 一致的保守判断）
+        tol = 1e-9
+        act &= (amount >= 0.0005 - tol) & ((amount + 0.0005) * price >= 10 - tol)
+        volatility = self._bar_volatility(i)[0]
+        if volatility == volatility:
+            # 现货不足且理财无法补足首笔预划转时，S1买入不会改变任何状态
+            usdt, fund_usdt = self.usdt[idx], self.fund_usdt[idx]
+            spot_total = usdt + self.bnb[idx] * price
+            trade_amount = np.maximum(np.minimum(0.0, self.base_amount[idx]), self.min_trade_amount[idx])
+            first_transfer = np.minimum(np.minimum(trade_amount * 1.05, self.max_ratio[idx] * spot_total) * 1.2,
+                                        VectorizedBacktester.MAX_SINGLE_TRANSFER)
+            cannot_afford = usdt * SAFETY_MARGIN < (amount - 0.0005) * price - tol
+            transfer_fails = fund_usdt < first_transfer * (1 - tol) - tol
+            act &= ~(buy & cannot_afford & transfer_fails)
+        for j in np.flatnonzero(act).tolist():
+            self._act(int(idx[j]), i, '_execute_s1_adjustment', 'SELL' if sell[j] else 'BUY', float(amount[j]))
+
+    def _record_equity(self, i):
+        equity = (self.usdt + self.fund_usdt) + (self.bnb + self.fund_bnb) * self.engine._close_list[i]
+        np.maximum(self.equity_peak, equity, out=self.equity_peak)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            drawdown = np.where(self.equity_peak > 0, equity / self.equity_peak - 1, 0.0)
+        np.minimum(self.max_drawdown, drawdown, out=self.max_drawdown)
+        if self.equity_curve is not None:
+            self.equity_curve[:, i] = equity
+        return equity
+
+    def run(self) -> Dict[str, Any]:
+        """运行批量回测（与 VectorizedBacktester.run 一致：处理前N-1根K线，按最后一根收盘价结算）"""
+        self._reset_state()
+        e = self.engine
+        n = len(e._close_list)
+        if n == 0:
+            return self.result(np.zeros(self.k))
+        if n > 1:
+            # 第一根K线含初始化和划转，逐个配置处理
+            for k in range(self.k):
+                self._bind(k)
+                e._reset_state()
+                e.trades = self.trades[k]
+                e.step(0)
+                self._store(k)
+                self.threshold[k] = e.grid_core.threshold()
+            self._record_equity(0)
+            for i in range(1, n - 1):
+                self.step(i)
+                self._record_equity(i)
+        return self.result(self._record_equity(n - 1))
+
+    def result(self, final_equity) -> Dict[str, Any]:
+        e = self.engine
+        first_price = e._close_list[0] if e._close_list else 0
+        initial_equity = float(e.initial_balance.get('USDT', 0.0)) + float(e.initial_balance.get('BNB', 0.0)) * first_price
+        return {
+            'final_equity': final_equity,
+            'initial_equity': initial_equity,
+            'max_drawdown': self.max_drawdown.copy(),
+            'trade_count': np.array([len(t) for t in self.trades], dtype=np.int64),
+            'trades': self.trades,
+            'equity_curve': self.equity_curve,
+            'bars': len(e._close_list),
+        }
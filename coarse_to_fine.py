@@ -0,0 +1,84 @@
+import numpy as np
+from typing import Any, Dict, Optional
+from config import TradingConfig
+from trader import GridTrader
+from kline_store import timeframe_to_ms
+from mock_exchange_client import MockExchangeClient
+from bar_skip import BarSkipper
+
+
+class CoarseToFineBacktester:
+    """
+    粗筛 + 精细回放的混合回测（用于1分钟等细粒度K线）：
+    K线按 screen_timeframe（默认1小时）分段，预先向量化计算每段内收盘价的最高/最低值。
+    回放到每段时按策略当前状态筛查：段内价格进入网格上下轨（_get_upper_band/_get_lower_band）
+    或S1日线高低点 margin 比例范围内时，逐根回放该段的细粒度K线；否则该段为平静期，
+    直接快进，只在网格调整（且风控通过）、S1高低点更新等定时逻辑到期的K线上执行策略，执行后按新的轨道重新筛查。
+    平静期内策略不会产生交易，因此结果与完整逐根回测一致；margin 为筛查额外预留的余量，
+    误差见 README 说明。
+    """
+
+    def __init__(self, kline_path: str, config: Optional[TradingConfig] = None,
+                 initial_balance: Optional[Dict[str, float]] = None, screen_timeframe: str = '1h',
+                 margin: float = 0.002, **client_kwargs):
+        if client_kwargs.get('intrabar') or client_kwargs.get('stream') or client_kwargs.get('resting_orders'):
+            raise ValueError("粗筛回测不支持K线内价格路径、挂单撮合和流式读取模式")
+        self.exchange = MockExchangeClient(kline_path, initial_balance=initial_balance, **client_kwargs)
+        self.trader = GridTrader(self.exchange, config or TradingConfig())
+        self.skipper = BarSkipper(self.exchange, self.trader, margin=margin)
+        timestamps, closes = self.skipper.timestamps, self.skipper.closes
+        # 分段：每段为同一 screen_timeframe 周期内的细粒度K线 [starts[w], ends[w])
+        keys = timestamps // timeframe_to_ms(screen_timeframe)
+        self.starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.empty(0, dtype=np.int64)
+        self.ends = np.r_[self.starts[1:], len(keys)].astype(np.int64)
+        self.window_high = np.maximum.reduceat(closes, self.starts) if len(keys) else np.empty(0)
+        self.window_low = np.minimum.reduceat(closes, self.starts) if len(keys) else np.empty(0)
+        self.fine_windows = 0
+
+    def _is_active(self, w: int) -> bool:
+        """按当前网格轨道和S1高低点判断第w段内价格是否可能触发交易"""
+        low, high = self.skipper.price_levels()
+        return self.window_high[w] >= high or self.window_low[w] <= low
+
+    async def _step(self):
+        await self.skipper.step()
+        await self.exchange.next()
+
+    async def run(self) -> Dict[str, Any]:
+        """回放全部K线（与极速回测一致：最后一根K线只结算不执行策略），返回成交、资金曲线和绩效指标"""
+        exchange, trader = self.exchange, self.trader
+        await trader.initialize()
+        last = exchange.total_ticks - 1
+        for w in range(len(self.starts)):
+            pos, stop = int(self.starts[w]), min(int(self.ends[w]), last)
+            if w == 0 or self._is_active(w):
+                self.fine_windows += 1
+                for _ in range(pos, stop):
+                    await self._step()
+                continue
+            # 平静期：快进到定时逻辑到期的K线执行策略，轨道变化后重新筛查
+            while pos < stop:
+                due = self.skipper.next_scheduled(pos, stop)
+                if due >= stop:
+                    await exchange.fast_forward(stop)
+                    break
+                await exchange.fast_forward(due)
+                await self._step()
+                pos = due + 1
+                if self._is_active(w):
+                    self.fine_windows += 1
+                    for _ in range(pos, stop):
+                        await self._step()
+                    break
+        metrics = exchange.performance_metrics()
+        recorder = exchange.equity_recorder
+        await exchange.close()
+        return {
+            'trades': exchange.trades,
+            'timestamps': recorder.timestamps,
+            'equity_curve': recorder.equity,
+            'metrics': metrics,
+            'windows': len(self.starts),
+            'fine_windows': self.fine_windows,
+            'steps': self.skipper.steps,
+        }
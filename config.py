@@ -5,6 +5,7 @@ import logging
 load_dotenv()
 
 SYMBOL = 'BNB/USDT'
+AMOUNT_PRECISION = 3  # 下单数量精度（小数位）
 INITIAL_GRID = 2.0
 FLIP_THRESHOLD = lambda grid_size: (grid_size / 5) / 100  # 网格大小的1/5的1%
 POSITION_SCALE_FACTOR = 0.2  # 仓位调整系数（20%）
@@ -42,6 +43,11 @@ except ValueError:
     INITIAL_PRINCIPAL = 0
     logging.warning("无效的INITIAL_PRINCIPAL配置，已重置为0")
 
+# Web回测任务服务：并行回测进程数、排队任务上限、可提交的K线文件所在目录
+BACKTEST_JOB_WORKERS = int(os.getenv('BACKTEST_JOB_WORKERS', 2))
+BACKTEST_JOB_MAX_QUEUED = int(os.getenv('BACKTEST_JOB_MAX_QUEUED', 16))
+BACKTEST_KLINE_DIR = os.getenv('BACKTEST_KLINE_DIR', os.path.dirname(os.path.abspath(__file__)))
+
 class TradingConfig:
     RISK_PARAMS = {
         'max_drawdown': MAX_DRAWDOWN,
@@ -66,6 +72,8 @@ class TradingConfig:
         }
     }
     SYMBOL = SYMBOL
+    AMOUNT_PRECISION = AMOUNT_PRECISION
+    PERSIST_TRADE_HISTORY = True  # 交易历史是否读写 data/trade_history.json
     INITIAL_BASE_PRICE = INITIAL_BASE_PRICE
     RISK_CHECK_INTERVAL = RISK_CHECK_INTERVAL
     MAX_RETRIES = MAX_RETRIES
@@ -117,6 +125,7 @@ class TradingConfig:
             }
         }
         self.SYMBOL = SYMBOL
+        self.AMOUNT_PRECISION = AMOUNT_PRECISION
         self.INITIAL_BASE_PRICE = INITIAL_BASE_PRICE
         self.RISK_CHECK_INTERVAL = RISK_CHECK_INTERVAL
         self.MAX_RETRIES = MAX_RETRIES
@@ -0,0 +1,218 @@
+import os
+import hashlib
+import logging
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from typing import Callable, Dict, Iterable, Optional, Tuple
+from kline_store import KlineSeries, detect_base_timeframe, open_kline_file, timeframe_to_ms
+
+# 特征计算口径变化时递增，旧的持久化文件随之失效
+FEATURE_VERSION = 1
+# 持久化特征所在目录（与K线文件同目录）
+FEATURE_DIR_NAME = '.features'
+
+_dataset_hashes: Dict[Tuple[str, int, int], str] = {}
+
+
+def dataset_hash(kline_path: str) -> str:
+    """K线文件内容的 SHA-256（前16位十六进制），按 (路径, 大小, 修改时间) 在进程内缓存"""
+    stat = os.stat(kline_path)
+    key = (os.path.abspath(kline_path), stat.st_size, stat.st_mtime_ns)
+    if key not in _dataset_hashes:
+        digest = hashlib.sha256()
+        with open(kline_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        _dataset_hashes[key] = digest.hexdigest()[:16]
+    return _dataset_hashes[key]
+
+
+def _kline_columns(kline_data):
+    """返回 (timestamps, highs, lows, closes) 列数组"""
+    if isinstance(kline_data, KlineSeries):
+        return tuple(kline_data.column(name) for name in ('timestamp', 'high', 'low', 'close'))
+    data = np.asarray(kline_data, dtype=np.float64)
+    if data.ndim != 2 or data.shape[1] < 5:
+        raise ValueError("K线数组需为 (N, 5) 形状: timestamp, open, high, low, close")
+    return data[:, 0], data[:, 2], data[:, 3], data[:, 4]
+
+
+class FeatureStore:
+    """
+    回测特征库：策略在每根K线上从K线派生的序列（波动率、S1日线高低点、4小时价格分位）
+    一次性向量化计算为按K线索引的数组，回测中按索引读取，不再每次重采样和重算。
+    计算口径与 MockExchangeClient.fetch_ohlcv 返回的K线（已完成K线 + 截至当前K线的部分K线）
+    及 GridTrader / PositionControllerS1 的计算逐位一致，只适用于按收盘价回放的模式。
+    指定 cache_dir 和 dataset_key（K线文件内容哈希）时结果按 (数据集, 特征, 参数) 持久化为 .npy，
+    其他进程或之后的回测直接读取；只改变下单量、阈值等参数的扫描不再重复计算指标。
+    """
+
+    CHUNK_ROWS = 1 << 16  # 按窗口计算时每块的K线数，限制临时二维数组的内存
+
+    def __init__(self, timestamps, highs, lows, closes, cache_dir: Optional[str] = None,
+                 dataset_key: Optional[str] = None):
+        self.timestamps = np.asarray(timestamps).astype(np.int64)
+        self.highs = np.ascontiguousarray(highs, dtype=np.float64)
+        self.lows = np.ascontiguousarray(lows, dtype=np.float64)
+        self.closes = np.ascontiguousarray(closes, dtype=np.float64)
+        self.base_timeframe_ms = detect_base_timeframe(self.timestamps)
+        self.cache_dir = cache_dir if dataset_key else None
+        self.dataset_key = dataset_key
+        self._series: Dict[str, np.ndarray] = {}
+        self.computed = 0  # 本实例实际计算（未命中内存和磁盘缓存）的特征数
+
+    @classmethod
+    def from_klines(cls, kline_data, cache_dir: Optional[str] = None, dataset_key: Optional[str] = None) -> 'FeatureStore':
+        return cls(*_kline_columns(kline_data), cache_dir=cache_dir, dataset_key=dataset_key)
+
+    @classmethod
+    def for_file(cls, kline_path: str, kline_data=None) -> 'FeatureStore':
+        """K线文件对应的特征库，持久化到文件所在目录的 .features 子目录，以文件内容哈希为键"""
+        if kline_data is None:
+            kline_data = open_kline_file(kline_path)
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(kline_path)), FEATURE_DIR_NAME)
+        return cls.from_klines(kline_data, cache_dir=cache_dir, dataset_key=dataset_hash(kline_path))
+
+    def __len__(self) -> int:
+        return len(self.closes)
+
+    @property
+    def descriptor(self) -> Dict[str, Optional[str]]:
+        """可跨进程传递的持久化位置，工作进程用 from_klines(kline_data, **descriptor) 读取同一份特征"""
+        return {'cache_dir': self.cache_dir, 'dataset_key': self.dataset_key}
+
+    def prepare(self, configs: Iterable) -> 'FeatureStore':
+        """按一组回测配置预先计算（并持久化）用到的全部特征，并行回测前在主进程调用一次"""
+        for config in configs:
+            self.volatility(config.VOLATILITY_WINDOW)
+            self.s1_levels(getattr(config, 'S1_LOOKBACK', 52))
+        return self
+
+    # ---------------- 特征 ----------------
+
+    def volatility(self, window: int) -> np.ndarray:
+        """每根K线上 GridTrader._calculate_volatility 的结果：最近 window 根1小时收盘价的年化波动率（不足2根为nan）"""
+        return self._cached('volatility', {'window': window},
+                            lambda: self._trailing_windows(timeframe_to_ms('1h'), window, self._annualized_volatility))
+
+    def price_percentile(self, timeframe: str = '4h', limit: int = 42) -> np.ndarray:
+        """每根K线上 GridTrader._get_price_percentile 的结果：当前价格在最近 limit 根 timeframe 收盘价中的分位位置"""
+        return self._cached('percentile', {'timeframe': timeframe, 'limit': limit},
+                            lambda: self._trailing_windows(timeframe_to_ms(timeframe), limit, self._percentile))
+
+    def s1_levels(self, lookback: int) -> np.ndarray:
+        """
+        每根K线上S1使用的 (日线高点, 日线低点)，形状 (N, 2)：当前日线之前 lookback 根已完成日线的最高/最低价，
+        日线不足 lookback + 1 根时为nan。
+        """
+        return self._cached('s1_levels', {'lookback': lookback}, lambda: self._s1_levels(lookback))
+
+    # ---------------- 计算 ----------------
+
+    def _buckets(self, timeframe_ms: int):
+        """
+        按 fetch_ohlcv 的口径返回 (各周期K线的收盘价/最高价/最低价, 每根基础K线所属的周期序号)。
+        请求周期不大于基础周期时直接使用基础K线。
+        """
+        n = len(self.closes)
+        if timeframe_ms <= self.base_timeframe_ms or n == 0:
+            return self.closes, self.highs, self.lows, np.arange(n)
+        buckets = self.timestamps // timeframe_ms
+        new_bucket = np.r_[True, buckets[1:] != buckets[:-1]]
+        starts = np.flatnonzero(new_bucket)
+        ends = np.r_[starts[1:], n]
+        return (self.closes[ends - 1], np.maximum.reduceat(self.highs, starts),
+                np.minimum.reduceat(self.lows, starts), np.cumsum(new_bucket) - 1)
+
+    def _trailing_windows(self, timeframe_ms: int, size: int, reduce: Callable[[np.ndarray], np.ndarray]) -> np.ndarray:
+        """
+        对每根K线，取 fetch_ohlcv(timeframe, limit=size) 返回的收盘价窗口
+        （之前最多 size - 1 根已完成K线 + 以当前收盘价结束的当前K线）组成一行，按行计算 reduce。
+        """
+        completed, _, _, bucket_of_bar = self._buckets(timeframe_ms)
+        closes = self.closes
+        n = len(closes)
+        out = np.empty(n)
+        # 历史不足 size - 1 根时窗口较短，按所属周期分组（组内窗口长度相同）
+        split = int(np.searchsorted(bucket_of_bar, size - 1))
+        if split:
+            buckets, starts = np.unique(bucket_of_bar[:split], return_index=True)
+            for bucket, start, end in zip(buckets.tolist(), starts.tolist(), np.r_[starts[1:], split].tolist()):
+                rows = np.empty((end - start, bucket + 1))
+                rows[:, :bucket] = completed[:bucket]
+                rows[:, bucket] = closes[start:end]
+                out[start:end] = reduce(rows)
+        if split < n:
+            history = sliding_window_view(completed, size - 1) if size > 1 else None
+            for start in range(split, n, self.CHUNK_ROWS):
+                end = min(start + self.CHUNK_ROWS, n)
+                rows = np.empty((end - start, size))
+                if history is not None:
+                    rows[:, :-1] = history[bucket_of_bar[start:end] - (size - 1)]
+                rows[:, -1] = closes[start:end]
+                out[start:end] = reduce(rows)
+        return out
+
+    @staticmethod
+    def _annualized_volatility(rows: np.ndarray) -> np.ndarray:
+        # 与 strategy_core.annualized_volatility 逐行一致
+        if rows.shape[1] < 2:
+            return np.full(len(rows), np.nan)
+        return np.std(np.diff(np.log(rows), axis=1), axis=1) * np.sqrt(24 * 365)
+
+    @staticmethod
+    def _percentile(rows: np.ndarray) -> np.ndarray:
+        # 与 GridTrader._get_price_percentile 一致（当前价格为窗口最后一根K线的收盘价）
+        count = rows.shape[1]
+        price = rows[:, -1].copy()
+        ordered = np.sort(rows, axis=1)
+        if count < 10:
+            mid_price = (ordered[:, 0] + ordered[:, -1]) / 2
+            return np.where(price >= mid_price, 0.5, 0.0)
+        lower, upper = ordered[:, int(count * 0.25)], ordered[:, int(count * 0.75)]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            inside = (price - lower) / (upper - lower)
+        return np.where(price <= lower, 0.0, np.where(price >= upper, 1.0, inside))
+
+    def _s1_levels(self, lookback: int) -> np.ndarray:
+        _, day_high, day_low, day_of_bar = self._buckets(timeframe_to_ms('1d'))
+        levels = np.full((len(self.closes), 2), np.nan)
+        # 第 d 根日线（含当前未完成日线共 d + 1 根）使用 [d - lookback, d) 的已完成日线
+        if lookback < 1 or len(day_high) <= lookback:
+            return levels
+        window_high = sliding_window_view(day_high[:-1], lookback).max(axis=1)
+        window_low = sliding_window_view(day_low[:-1], lookback).min(axis=1)
+        ready = day_of_bar >= lookback
+        levels[ready, 0] = window_high[day_of_bar[ready] - lookback]
+        levels[ready, 1] = window_low[day_of_bar[ready] - lookback]
+        return levels
+
+    # ---------------- 缓存 ----------------
+
+    def _path(self, key: str) -> Optional[str]:
+        if self.cache_dir is None:
+            return None
+        return os.path.join(self.cache_dir, f"{self.dataset_key}_v{FEATURE_VERSION}_{key}.npy")
+
+    def _cached(self, name: str, params: Dict[str, object], compute: Callable[[], np.ndarray]) -> np.ndarray:
+        key = name + ''.join(f"_{k}{v}" for k, v in sorted(params.items()))
+        series = self._series.get(key)
+        if series is not None:
+            return series
+        path = self._path(key)
+        if path is not None and os.path.exists(path):
+            series = np.load(path)
+        else:
+            series = compute()
+            self.computed += 1
+            if path is not None:
+                try:
+                    os.makedirs(self.cache_dir, exist_ok=True)
+                    tmp_path = f"{path}.{os.getpid()}.tmp"
+                    with open(tmp_path, 'wb') as f:
+                        np.save(f, series)
+                    os.replace(tmp_path, path)
+                except OSError as e:
+                    logging.warning(f"特征缓存写入失败，仅在内存中使用: {e}")
+        self._series[key] = series
+        return series
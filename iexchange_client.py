@@ -1,10 +1,34 @@
+import time
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional
+
+
+class Clock:
+    """策略使用的时钟，默认返回墙上时间（秒）"""
+
+    def time(self) -> float:
+        return time.time()
+
+
+class BarClock(Clock):
+    """回测时钟：返回回放位置的时间（由毫秒时间戳函数提供），与墙上时间无关"""
+
+    def __init__(self, timestamp_ms: Callable[[], float]):
+        self._timestamp_ms = timestamp_ms
+
+    def time(self) -> float:
+        return self._timestamp_ms() / 1000
+
+
+WALL_CLOCK = Clock()
+
 
 class IExchangeClient(ABC):
     """
     统一交易所接口协议，所有交易所客户端（实盘、回测、模拟盘）均需实现。
+    clock 为策略读取当前时间的时钟：实盘/模拟盘为墙上时间，回测为K线时间。
     """
+    clock: Clock = WALL_CLOCK
 
     @abstractmethod
     async def fetch_ohlcv(self, symbol: str, timeframe: str = '1h', limit: Optional[int] = None) -> List[List[Any]]:
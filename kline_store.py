@@ -0,0 +1,486 @@
+import json
+import os
+import queue
+import itertools
+import threading
+import numpy as np
+from multiprocessing import shared_memory
+from collections import deque
+from collections.abc import Sequence
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+# 列式K线文件的结构化数组格式（.npy）
+KLINE_DTYPE = np.dtype([
+    ('timestamp', '<i8'),
+    ('open', '<f8'),
+    ('high', '<f8'),
+    ('low', '<f8'),
+    ('close', '<f8'),
+    ('volume', '<f8'),
+])
+
+
+class KlineSeries(Sequence):
+    """
+    基于结构化数组（通常为 np.memmap）的只读K线序列。
+    行访问返回与JSON回测文件一致的 [timestamp, open, high, low, close, volume] 列表，
+    切片返回共享底层内存的新序列（零拷贝），np.asarray 得到 (N, 6) 的 float64 数组。
+    """
+
+    def __init__(self, array: np.ndarray):
+        if array.dtype != KLINE_DTYPE:
+            raise ValueError(f"K线数组格式不正确: {array.dtype}")
+        self.array = array
+
+    def __len__(self) -> int:
+        return len(self.array)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return KlineSeries(self.array[index])
+        return list(self.array[index].tolist())
+
+    def __iter__(self):
+        # 分块转换为Python标量，避免逐行访问memmap
+        for start in range(0, len(self.array), 4096):
+            yield from (list(row) for row in self.array[start:start + 4096].tolist())
+
+    def __array__(self, dtype=None, copy=None):
+        columns = [self.array[name].astype(np.float64) for name in KLINE_DTYPE.names]
+        data = np.column_stack(columns) if len(self.array) else np.empty((0, len(columns)))
+        return data if dtype is None else data.astype(dtype)
+
+    def column(self, name: str) -> np.ndarray:
+        """返回某一列的零拷贝视图"""
+        return self.array[name]
+
+
+def convert_json_to_npy(json_path: str, npy_path: str) -> int:
+    """将回测JSON文件（[timestamp, open, high, low, close(, volume)] 数组）转换为列式 .npy 文件，返回K线数量"""
+    if not os.path.exists(json_path):
+        raise FileNotFoundError(f"K线数据文件不存在: {json_path}")
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    array = rows_to_kline_array(data)
+    np.save(npy_path, array)
+    return len(array)
+
+
+def rows_to_kline_array(rows: List[List[Any]]) -> np.ndarray:
+    """JSON行列表（[timestamp, open, high, low, close(, volume)]）转换为 KLINE_DTYPE 结构化数组"""
+    array = np.zeros(len(rows), dtype=KLINE_DTYPE)
+    for i, name in enumerate(KLINE_DTYPE.names[:5]):
+        array[name] = [k[i] for k in rows]
+    array['volume'] = [k[5] if len(k) > 5 else 0.0 for k in rows]
+    return array
+
+
+class SharedKlineArray:
+    """
+    放在 multiprocessing.shared_memory 中的 KLINE_DTYPE K线数组，并行回测时只保留一份数据。
+    创建方（owner）用 from_file/create 写入一次，把 descriptor（名称+K线数）传给工作进程，
+    工作进程用 attach 按名称映射同一块内存，series() 返回零拷贝的 KlineSeries。
+    用完后各进程 close()，创建方再 unlink() 释放；作为上下文管理器时自动完成。
+    工作进程需由创建方通过 multiprocessing 启动（共享同一个 resource_tracker），
+    否则无关进程退出时可能提前回收共享内存。
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, length: int, owner: bool):
+        self._shm = shm
+        self.length = int(length)
+        self.owner = owner
+        self._closed = False
+        self.array = np.ndarray((self.length,), dtype=KLINE_DTYPE, buffer=shm.buf)
+
+    @classmethod
+    def create(cls, array: np.ndarray) -> 'SharedKlineArray':
+        if array.dtype != KLINE_DTYPE:
+            array = rows_to_kline_array(array)
+        # 共享内存大小不能为0
+        shm = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+        shared = cls(shm, len(array), owner=True)
+        shared.array[:] = array
+        return shared
+
+    @classmethod
+    def from_file(cls, kline_path: str) -> 'SharedKlineArray':
+        """读取JSON或 .npy K线文件并放入共享内存"""
+        data = open_kline_file(kline_path)
+        return cls.create(data.array if isinstance(data, KlineSeries) else rows_to_kline_array(data))
+
+    @classmethod
+    def attach(cls, descriptor: Dict[str, Any]) -> 'SharedKlineArray':
+        return cls(shared_memory.SharedMemory(name=descriptor['name']), descriptor['length'], owner=False)
+
+    @property
+    def descriptor(self) -> Dict[str, Any]:
+        """可跨进程传递的描述（共享内存名称和K线数）"""
+        return {'name': self._shm.name, 'length': self.length}
+
+    def series(self) -> 'KlineSeries':
+        return KlineSeries(self.array)
+
+    def close(self):
+        """解除本进程的映射；仍有视图（KlineSeries等）引用时保留映射，由进程退出时回收"""
+        if self._closed:
+            return
+        self.array = None
+        try:
+            self._shm.close()
+        except BufferError:
+            return
+        self._closed = True
+
+    def unlink(self):
+        """创建方删除共享内存（已映射的进程仍可继续读取，直到各自 close）"""
+        if self.owner:
+            self._shm.unlink()
+            self.owner = False
+
+    def __enter__(self) -> 'SharedKlineArray':
+        return self
+
+    def __exit__(self, *exc):
+        self.unlink()
+        self.close()
+
+
+def open_kline_file(kline_path: str) -> Union[KlineSeries, List[List[Any]]]:
+    """打开回测K线文件：.npy 以内存映射方式打开为 KlineSeries，其他按JSON读取为列表"""
+    if not os.path.exists(kline_path):
+        raise FileNotFoundError(f"K线数据文件不存在: {kline_path}")
+    if kline_path.endswith('.npy'):
+        return KlineSeries(np.load(kline_path, mmap_mode='r'))
+    with open(kline_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+# ccxt风格K线周期的单位（毫秒）
+TIMEFRAME_UNITS_MS = {'m': 60 * 1000, 'h': 3600 * 1000, 'd': 86400 * 1000, 'w': 7 * 86400 * 1000}
+TIMEFRAME_ALIASES = {'d1': '1d', 'day': '1d', 'daily': '1d'}
+# 周线与币安一致从周一UTC零点开始（1970-01-01为周四）
+WEEK_OFFSET_MS = 4 * 86400 * 1000
+
+
+def detect_base_timeframe(timestamps) -> int:
+    """
+    按相邻K线的最小时间间隔推断基础K线周期（毫秒）。
+    间隔小于1分钟（非ccxt周期）或数据不足时按1小时处理，与原有回测行为一致。
+    """
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    if len(timestamps) < 2:
+        return TIMEFRAME_UNITS_MS['h']
+    spacing = int(np.min(np.diff(timestamps)))
+    return spacing if spacing >= TIMEFRAME_UNITS_MS['m'] else TIMEFRAME_UNITS_MS['h']
+
+
+def timeframe_to_ms(timeframe: str) -> int:
+    """
+    将 '15m'、'4h'、'1d'、'1w' 等K线周期转换为毫秒。
+    月线（'1M'）长度不固定，无法按固定毫秒数对齐重采样，抛出 ValueError。
+    """
+    tf = TIMEFRAME_ALIASES.get(timeframe.lower(), timeframe)
+    if tf[-1:] == 'M':
+        raise ValueError(f"回测不支持月线周期 {timeframe}：月份长度不固定，只支持分钟(m)、小时(h)、日(d)、周(w)周期")
+    unit = tf[-1:].lower()
+    if unit not in TIMEFRAME_UNITS_MS or not tf[:-1].isdigit() or int(tf[:-1]) <= 0:
+        raise ValueError(f"不支持的K线周期: {timeframe}")
+    return int(tf[:-1]) * TIMEFRAME_UNITS_MS[unit]
+
+
+class KlineResampler:
+    """
+    将基础K线按UTC对齐聚合为更大周期的K线。
+    已完成的大周期K线一次性向量化聚合；当前未走完的K线随回放位置增量更新，
+    查询时只返回截至当前位置的K线（已完成 + 当前部分K线），不含未来数据，
+    返回切片的开销与 limit 成正比、与数据集长度无关。
+    """
+
+    def __init__(self, kline_data, timeframe_ms: int):
+        self.timeframe_ms = timeframe_ms
+        self.offset_ms = WEEK_OFFSET_MS if timeframe_ms % TIMEFRAME_UNITS_MS['w'] == 0 else 0
+        if isinstance(kline_data, KlineSeries):
+            # 直接使用各列的零拷贝视图（memmap / 共享内存），不复制整个数据集
+            self.has_volume = True
+            self.timestamps = kline_data.column('timestamp')
+            self.opens, self.highs, self.lows, self.closes, self.volumes = (
+                kline_data.column(name) for name in ('open', 'high', 'low', 'close', 'volume'))
+        else:
+            self.has_volume = bool(len(kline_data)) and len(kline_data[0]) > 5
+            width = 6 if self.has_volume else 5
+            columns = np.asarray([k[:width] for k in kline_data], dtype=np.float64).reshape(-1, width)
+            self.timestamps = columns[:, 0].astype(np.int64)
+            self.opens, self.highs, self.lows, self.closes = (np.ascontiguousarray(columns[:, j]) for j in range(1, 5))
+            self.volumes = np.ascontiguousarray(columns[:, 5]) if self.has_volume else None
+
+        buckets = (self.timestamps - self.offset_ms) // timeframe_ms
+        self.starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]]) if len(buckets) else np.empty(0, dtype=np.int64)
+        self.bar_of_row = np.cumsum(np.r_[True, buckets[1:] != buckets[:-1]]) - 1 if len(buckets) else np.empty(0, dtype=np.int64)
+        ends = np.r_[self.starts[1:], len(buckets)]
+        bar_ts = buckets[self.starts] * timeframe_ms + self.offset_ms
+        bars = [bar_ts.astype(np.float64), self.opens[self.starts], np.maximum.reduceat(self.highs, self.starts) if len(buckets) else np.empty(0),
+                np.minimum.reduceat(self.lows, self.starts) if len(buckets) else np.empty(0), self.closes[ends - 1]]
+        if self.has_volume:
+            bars.append(np.add.reduceat(self.volumes, self.starts) if len(buckets) else np.empty(0))
+        self._bar_ts = bar_ts.tolist()
+        self._bars = np.column_stack(bars) if len(buckets) else np.empty((0, len(bars)))
+        self._partial = None  # (bar, 已聚合到的行(不含), open, high, low, close, volume)
+
+    def _aggregate_partial(self, bar: int, index: int):
+        """增量聚合当前大周期K线中 [起始行, index) 的基础K线"""
+        start = int(self.starts[bar])
+        if self._partial is None or self._partial[0] != bar or self._partial[1] > index:
+            self._partial = (bar, start, None, None, None, None, 0.0)
+        _, upto, open_, high_, low_, close_, volume = self._partial
+        if upto < index:
+            high_chunk = float(self.highs[upto:index].max())
+            low_chunk = float(self.lows[upto:index].min())
+            open_ = float(self.opens[start]) if open_ is None else open_
+            high_ = high_chunk if high_ is None else max(high_, high_chunk)
+            low_ = low_chunk if low_ is None else min(low_, low_chunk)
+            close_ = float(self.closes[index - 1])
+            if self.has_volume:
+                volume += float(self.volumes[upto:index].sum())
+            self._partial = (bar, index, open_, high_, low_, close_, volume)
+        return self._partial
+
+    def bars_until(self, index: int, limit: Optional[int] = None, current_row: Optional[List[Any]] = None) -> List[List[Any]]:
+        """
+        返回截至第index根基础K线的大周期K线。
+        current_row 为第index根K线截至当前时刻的部分K线（K线内回放），默认使用完整K线。
+        """
+        if not len(self.timestamps):
+            return []
+        bar = int(self.bar_of_row[index])
+        first = 0 if limit is None else max(0, bar - limit + 1)
+        result = self._bars[first:bar].tolist()
+        for row, ts in zip(result, self._bar_ts[first:bar]):
+            row[0] = ts
+        if current_row is None:
+            current_row = [self.timestamps[index], self.opens[index], self.highs[index], self.lows[index], self.closes[index]]
+            if self.has_volume:
+                current_row.append(self.volumes[index])
+        _, _, open_, high_, low_, _, volume = self._aggregate_partial(bar, index)
+        partial = [self._bar_ts[bar],
+                   float(current_row[1]) if open_ is None else open_,
+                   float(current_row[2]) if high_ is None else max(high_, float(current_row[2])),
+                   float(current_row[3]) if low_ is None else min(low_, float(current_row[3])),
+                   float(current_row[4])]
+        if self.has_volume:
+            partial.append(volume + (float(current_row[5]) if len(current_row) > 5 else 0.0))
+        if limit is None or limit > 0:
+            result.append(partial)
+        return result
+
+
+def iter_kline_chunks(kline_path: str, chunk_rows: int = 4096) -> Iterator[List[List[Any]]]:
+    """
+    按块读取回测K线文件，每块为至多 chunk_rows 行 [timestamp, open, high, low, close(, volume)] 列表。
+    .npy 文件按结构化记录顺序读取；JSON数组文件按块增量解析，无需整体载入内存。
+    """
+    if not os.path.exists(kline_path):
+        raise FileNotFoundError(f"K线数据文件不存在: {kline_path}")
+    if kline_path.endswith('.npy'):
+        with open(kline_path, 'rb') as f:
+            version = np.lib.format.read_magic(f)
+            read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+            shape, _, dtype = read_header(f)
+            if dtype != KLINE_DTYPE:
+                raise ValueError(f"K线数组格式不正确: {dtype}")
+            remaining = shape[0]
+            while remaining > 0:
+                count = min(chunk_rows, remaining)
+                array = np.fromfile(f, dtype=KLINE_DTYPE, count=count)
+                if len(array) < count:
+                    raise ValueError(f"K线文件不完整: {kline_path}")
+                remaining -= count
+                yield [list(row) for row in array.tolist()]
+        return
+    with open(kline_path, 'r', encoding='utf-8') as f:
+        buffer, started = '', False
+        while True:
+            data = f.read(1 << 20)
+            buffer += data
+            if not started:
+                buffer = buffer.lstrip()
+                if not buffer:
+                    if not data:
+                        return
+                    continue
+                if buffer[0] != '[':
+                    raise ValueError(f"K线JSON文件格式不正确: {kline_path}")
+                buffer, started = buffer[1:], True
+            if data:
+                # 整块解析到最后一个后接逗号的行结束符（K线行内不含嵌套数组）
+                cut = buffer.rfind(']')
+                while cut >= 0 and not buffer[cut + 1:].lstrip().startswith(','):
+                    cut = buffer.rfind(']', 0, cut)
+                if cut < 0:
+                    continue
+                segment, buffer = buffer[:cut + 1], buffer[cut + 1:].lstrip()[1:]
+            else:
+                # 文件末尾：去掉外层数组的结束符
+                segment = buffer.rstrip()
+                if not segment.endswith(']'):
+                    raise ValueError(f"K线JSON文件格式不正确: {kline_path}")
+                segment = segment[:-1]
+            rows = json.loads('[' + segment + ']') if segment.strip() else []
+            for i in range(0, len(rows), chunk_rows):
+                yield rows[i:i + chunk_rows]
+            if not data:
+                return
+
+
+class KlineStream:
+    """
+    流式K线数据源：后台线程按块预读K线文件，内存中只保留最近 window 根K线的回看窗口。
+    以绝对K线索引访问（与列表一致），访问超前索引时向前读取，访问早于窗口的索引抛出 IndexError；
+    切片按窗口截断。峰值内存约为 window + chunk_rows * (read_ahead + 1) 行，与文件大小无关。
+    """
+
+    def __init__(self, kline_path: str, window: int, chunk_rows: int = 4096, read_ahead: int = 4):
+        self.kline_path = kline_path
+        self.window = max(2, int(window))
+        self.total = None
+        if kline_path.endswith('.npy'):
+            self.total = int(np.load(kline_path, mmap_mode='r').shape[0])
+        self._rows = deque(maxlen=self.window)
+        self._end = 0  # 已读入窗口的K线数（窗口末尾的绝对索引 + 1）
+        self._pending = deque()
+        self._queue = queue.Queue(maxsize=max(1, int(read_ahead)))
+        self._closed = False
+        self._exhausted = False
+        self._thread = threading.Thread(target=self._reader, args=(chunk_rows,), daemon=True)
+        self._thread.start()
+        # 用首块数据推断基础K线周期
+        self._pull_chunk()
+        self.base_timeframe_ms = detect_base_timeframe([row[0] for row in self._pending])
+
+    def _reader(self, chunk_rows: int):
+        try:
+            for chunk in iter_kline_chunks(self.kline_path, chunk_rows):
+                if self._closed:
+                    return
+                self._queue.put(chunk)
+            self._queue.put(None)
+        except Exception as e:
+            self._queue.put(e)
+
+    def _pull_chunk(self) -> bool:
+        if self._exhausted:
+            return False
+        chunk = self._queue.get()
+        if isinstance(chunk, Exception):
+            self._exhausted = True
+            raise chunk
+        if chunk is None:
+            self._exhausted = True
+            return False
+        self._pending.extend(chunk)
+        return True
+
+    def _fill_to(self, index: int) -> bool:
+        """向前读取直到窗口包含第index根K线，数据不足时返回False"""
+        while self._end <= index:
+            if not self._pending and not self._pull_chunk():
+                return False
+            self._rows.append(self._pending.popleft())
+            self._end += 1
+        return True
+
+    @property
+    def start(self) -> int:
+        """窗口中最早K线的绝对索引"""
+        return self._end - len(self._rows)
+
+    def has(self, index: int) -> bool:
+        """第index根K线是否存在（必要时向前读取）"""
+        return index >= 0 and self._fill_to(index)
+
+    def __getitem__(self, index):
+        if index.__class__ is int:
+            # 快速路径：窗口内的索引
+            offset = index - self._end + len(self._rows)
+            if 0 <= offset < len(self._rows) and index >= 0:
+                return self._rows[offset]
+        if isinstance(index, slice):
+            if index.step not in (None, 1) or index.start is None or index.stop is None or index.start < 0 or index.stop < 0:
+                raise IndexError("流式K线只支持正向连续切片")
+            if index.stop > index.start:
+                self._fill_to(index.stop - 1)
+            start = max(index.start, self.start) - self.start
+            stop = max(min(index.stop, self._end) - self.start, start)
+            return list(itertools.islice(self._rows, start, stop))
+        if index < 0 or not self._fill_to(index):
+            raise IndexError(f"K线索引超出范围: {index}")
+        if index < self.start:
+            raise IndexError(f"K线索引 {index} 早于回看窗口（起始 {self.start}）")
+        return self._rows[index - self.start]
+
+    def close(self):
+        self._closed = True
+        # 取出队列中的数据，避免读取线程阻塞
+        while self._thread.is_alive():
+            try:
+                self._queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+
+class StreamingResampler:
+    """
+    流式大周期K线聚合：基础K线按顺序 push，只保留最近 max_bars 根已完成的大周期K线和当前未完成K线。
+    结果与 KlineResampler 一致（UTC对齐，周线从周一开始，无未来数据）。
+    """
+
+    def __init__(self, timeframe_ms: int, max_bars: int):
+        self.timeframe_ms = timeframe_ms
+        self.offset_ms = WEEK_OFFSET_MS if timeframe_ms % TIMEFRAME_UNITS_MS['w'] == 0 else 0
+        self._bars = deque(maxlen=max(1, int(max_bars)))
+        self._partial = None
+        self._partial_end = None  # 当前未完成K线的结束时间（不含）
+
+    def _bucket(self, timestamp) -> int:
+        return (int(timestamp) - self.offset_ms) // self.timeframe_ms * self.timeframe_ms + self.offset_ms
+
+    def _merge(self, bar: Optional[List[Any]], row: List[Any]) -> List[Any]:
+        if bar is None or bar[0] != self._bucket(row[0]):
+            bar = [self._bucket(row[0]), float(row[1]), float(row[2]), float(row[3]), float(row[4])]
+            if len(row) > 5:
+                bar.append(float(row[5]))
+            return bar
+        merged = [bar[0], bar[1], max(bar[2], float(row[2])), min(bar[3], float(row[3])), float(row[4])]
+        if len(bar) > 5:
+            merged.append(bar[5] + (float(row[5]) if len(row) > 5 else 0.0))
+        return merged
+
+    def push(self, row: List[Any]):
+        """追加一根已走完的基础K线"""
+        partial = self._partial
+        if partial is not None and row[0] < self._partial_end:
+            # 同一大周期内原地更新
+            high, low = float(row[2]), float(row[3])
+            if high > partial[2]:
+                partial[2] = high
+            if low < partial[3]:
+                partial[3] = low
+            partial[4] = float(row[4])
+            if len(partial) > 5:
+                partial[5] += float(row[5]) if len(row) > 5 else 0.0
+            return
+        if partial is not None:
+            self._bars.append(partial)
+        self._partial = self._merge(None, row)
+        self._partial_end = self._partial[0] + self.timeframe_ms
+
+    def bars_until(self, limit: Optional[int], current_row: List[Any]) -> List[List[Any]]:
+        """返回已完成的大周期K线 + 包含当前（部分）基础K线的未完成K线，最多 limit 根"""
+        if limit is not None and limit <= 0:
+            return []
+        result = [list(bar) for bar in self._bars]
+        partial = self._partial
+        if partial is not None and partial[0] != self._bucket(current_row[0]):
+            result.append(list(partial))
+            partial = None
+        result.append(self._merge(partial, current_row))
+        return result if limit is None else result[-limit:]
@@ -5,14 +5,28 @@ import platform
 import sys
 import os
 import argparse
+import json
 from trader import GridTrader
+from order_tracker import OrderTracker
 from helpers import LogConfig, send_pushplus_message
 from web_server import start_web_server
 from exchange_client import ExchangeClient
-from mock_exchange_client import MockExchangeClient
+from mock_exchange_client import MockExchangeClient, stream_lookbacks
 from simulate_exchange_client import SimulateExchangeClient
 from iexchange_client import IExchangeClient
 from config import TradingConfig
+from vectorized_backtest import VectorizedBacktester
+from portfolio_backtest import PortfolioBacktester
+from coarse_to_fine import CoarseToFineBacktester
+from bar_skip import BarSkipper
+from feature_store import FeatureStore, dataset_hash
+from result_cache import BacktestResultCache, backtest_fingerprint
+from backtest_metrics import write_equity_csv, write_metrics_json, write_trades_csv
+from parameter_sweep import OPTIMIZATION_OBJECTIVES, load_param_grid, run_sweep, write_sweep_results
+from monte_carlo import run_monte_carlo, write_monte_carlo_results
+from successive_halving import run_successive_halving, write_halving_results
+from walk_forward import run_walk_forward, write_walk_forward_results
+from backtest_checkpoint import load_checkpoint, save_checkpoint
 
 # 在Windows平台上设置SelectorEventLoop
 if platform.system() == 'Windows':
@@ -24,11 +38,42 @@ if platform.system() == 'Windows':
 
 def parse_args():
     parser = argparse.ArgumentParser(description='GridBNB-USDT 启动参数')
-    parser.add_argument('--mode', type=str, default=None, help='运行模式: live/simulate/backtest')
+    parser.add_argument('--mode', type=str, default=None, help='运行模式: live/simulate/backtest/sweep/halving/walkforward/montecarlo/portfolio')
     parser.add_argument('--kline', type=str, default=None, help='回测K线数据文件路径')
     parser.add_argument('--init-usdt', type=float, default=None, help='初始USDT资金')
     parser.add_argument('--init-bnb', type=float, default=None, help='初始BNB资金')
     parser.add_argument('--fast-backtest', action='store_true', help='极速回测模式（不启动Web/日志，仅输出总盈亏）')
+    parser.add_argument('--intrabar', action='store_true', help='回测时将每根K线展开为K线内价格路径（O→H→L→C / O→L→H→C）')
+    parser.add_argument('--intrabar-ticks', type=int, default=0, help='K线内价格路径相邻端点间的插值tick数')
+    parser.add_argument('--resting-orders', action='store_true', help='回测限价单按挂单撮合（后续K线价格穿过挂单价才成交，可部分成交）')
+    parser.add_argument('--fill-volume-ratio', type=float, default=None, help='挂单撮合时每根K线每个方向的成交量上限（占K线成交量的比例）')
+    parser.add_argument('--stream', action='store_true', help='回测时流式分块读取K线文件，只在内存中保留策略所需的回看窗口')
+    parser.add_argument('--checkpoint', type=str, default=None, help='极速回测检查点文件路径（定期保存完整模拟状态）')
+    parser.add_argument('--checkpoint-every', type=int, default=10000, help='每推进多少步保存一次检查点')
+    parser.add_argument('--resume', action='store_true', help='从 --checkpoint 检查点恢复回测；K线文件追加新数据后可增量继续')
+    parser.add_argument('--vectorized', action='store_true', help='极速回测使用NumPy向量化引擎（交易历史 data/trade_history.json 中的成交盈亏全为0时结果与逐根回测一致，否则拒绝运行）')
+    parser.add_argument('--no-cache', action='store_true', help='极速回测不使用回测结果缓存，强制重新计算（默认相同数据集+配置+代码版本的回测直接读取 data/backtest_cache 中的结果）')
+    parser.add_argument('--no-feature-cache', action='store_true', help='极速回测不读取/写入K线目录下 .features 中按数据集缓存的波动率、S1高低点等预计算特征')
+    parser.add_argument('--no-bar-skip', action='store_true', help='极速回测逐根执行策略，不跳过价格在网格轨道内的K线（默认跳过，结果不变）')
+    parser.add_argument('--coarse-to-fine', action='store_true', help='极速回测按1小时粗筛、只逐根回放价格接近网格轨道或S1高低点的时段（用于1分钟K线）')
+    parser.add_argument('--screen-margin', type=float, default=0.002, help='粗筛时价格距网格轨道/S1高低点的余量比例')
+    parser.add_argument('--portfolio', nargs='+', default=None, metavar='SYMBOL=PATH', help='组合回测的交易对及K线文件，如 BNB/USDT=bnb.json ETH/USDT=eth.json')
+    parser.add_argument('--sweep-grid', type=str, default=None, help='参数扫描网格JSON文件路径（sweep模式）')
+    parser.add_argument('--sweep-output', type=str, default='sweep_results.csv', help='参数扫描结果CSV输出路径')
+    parser.add_argument('--workers', type=int, default=None, help='参数扫描并行进程数（默认CPU核数）')
+    parser.add_argument('--batch-size', type=int, default=1, help='参数扫描时每个进程内批量同时回测的参数组数')
+    parser.add_argument('--sh-first-fraction', type=float, default=0.2, help='逐轮淘汰优化第一轮使用的K线比例')
+    parser.add_argument('--sh-eta', type=int, default=3, help='逐轮淘汰优化每轮保留前 1/eta 的参数组合，K线长度扩大eta倍')
+    parser.add_argument('--sh-objective', type=str, default='total_pnl', choices=sorted(OPTIMIZATION_OBJECTIVES), help='逐轮淘汰优化的选优目标')
+    parser.add_argument('--wf-in-sample', type=int, default=24 * 90, help='滚动前推优化的样本内K线数（默认90天1小时K线）')
+    parser.add_argument('--wf-out-of-sample', type=int, default=24 * 30, help='滚动前推优化的样本外K线数（默认30天1小时K线）')
+    parser.add_argument('--wf-objective', type=str, default='total_pnl', choices=sorted(OPTIMIZATION_OBJECTIVES), help='样本内选优目标')
+    parser.add_argument('--mc-paths', type=int, default=1000, help='蒙特卡洛分析的重采样路径数')
+    parser.add_argument('--mc-block', type=int, default=24 * 7, help='块自助重采样的块长度（K线数，默认7天1小时K线）')
+    parser.add_argument('--mc-seed', type=int, default=None, help='蒙特卡洛随机种子（相同种子结果可复现）')
+    parser.add_argument('--mc-params', type=str, default=None, help='蒙特卡洛分析使用的配置覆盖（JSON对象，键同参数网格）')
+    parser.add_argument('--mc-output', type=str, default='monte_carlo_results.csv', help='蒙特卡洛逐路径结果CSV输出路径')
+    parser.add_argument('--wf-output', type=str, default='walk_forward_results.csv', help='滚动前推各窗口结果CSV输出路径（资金曲线写入同名 _equity.csv）')
     return parser.parse_args()
 
 async def main():
@@ -45,33 +90,201 @@ async def main():
     fast_backtest = getattr(args, 'fast_backtest', False)
     if fast_backtest:
         logging.basicConfig(level=logging.ERROR)
+    if mode == 'sweep':
+        kline_path = args.kline or os.getenv('BACKTEST_KLINE_PATH')
+        if not kline_path or not args.sweep_grid:
+            print('参数扫描模式需指定K线数据文件 --kline 和参数网格文件 --sweep-grid')
+            sys.exit(1)
+        results = run_sweep(kline_path, load_param_grid(args.sweep_grid), initial_balance=initial_balance, workers=args.workers, batch_size=args.batch_size)
+        write_sweep_results(results, args.sweep_output)
+        print(f"参数扫描完成，共 {len(results)} 组参数，结果已写入 {args.sweep_output}")
+        for row in sorted(results, key=lambda r: r['total_pnl'], reverse=True)[:5]:
+            print(f"总盈亏: {row['total_pnl']:.2f} USDT，最大回撤: {row['max_drawdown']*100:.2f}%，成交: {row['trade_count']}，参数: {row['params']}")
+        return
+    if mode == 'halving':
+        kline_path = args.kline or os.getenv('BACKTEST_KLINE_PATH')
+        if not kline_path or not args.sweep_grid:
+            print('逐轮淘汰优化模式需指定K线数据文件 --kline 和参数网格文件 --sweep-grid')
+            sys.exit(1)
+        result = run_successive_halving(kline_path, load_param_grid(args.sweep_grid), initial_balance=initial_balance,
+                                        first_fraction=args.sh_first_fraction, eta=args.sh_eta,
+                                        objective=args.sh_objective, workers=args.workers)
+        write_halving_results(result['results'], args.sweep_output)
+        for rung in result['rungs']:
+            print(f"前 {rung['bars']} 根K线: 回测 {rung['evaluated']} 组参数，保留 {rung['kept']} 组")
+        best = result['best']
+        print(f"逐轮淘汰优化完成，最优参数: {result['best_params']}，总盈亏: {best['total_pnl']:.2f} USDT，"
+              f"最大回撤: {best['max_drawdown']*100:.2f}%，计算量为穷举扫描的 {result['bars_evaluated'] / result['bars_exhaustive']*100:.1f}%，"
+              f"结果已写入 {args.sweep_output}")
+        return
+    if mode == 'walkforward':
+        kline_path = args.kline or os.getenv('BACKTEST_KLINE_PATH')
+        if not kline_path or not args.sweep_grid:
+            print('滚动前推优化模式需指定K线数据文件 --kline 和参数网格文件 --sweep-grid')
+            sys.exit(1)
+        result = run_walk_forward(kline_path, load_param_grid(args.sweep_grid), args.wf_in_sample, args.wf_out_of_sample,
+                                  initial_balance=initial_balance, workers=args.workers,
+                                  batch_size=max(args.batch_size, 64), objective=args.wf_objective)
+        equity_path = os.path.splitext(args.wf_output)[0] + '_equity.csv'
+        write_walk_forward_results(result, args.wf_output, equity_path)
+        for window in result['windows']:
+            print(f"样本外 {window['out_of_sample'][0]}-{window['out_of_sample'][1]} 盈亏: {window['out_of_sample_pnl']:.2f} USDT，"
+                  f"最大回撤: {window['out_of_sample_max_drawdown']*100:.2f}%，参数: {window['params']}")
+        metrics = result['metrics']
+        print(f"滚动前推优化完成，共 {len(result['windows'])} 个窗口，样本外总收益率: {metrics['total_return']*100:.2f}%，"
+              f"最大回撤: {metrics['max_drawdown']*100:.2f}%，结果已写入 {args.wf_output}")
+        return
+    if mode == 'montecarlo':
+        kline_path = args.kline or os.getenv('BACKTEST_KLINE_PATH')
+        if not kline_path:
+            print('蒙特卡洛分析模式需指定K线数据文件 --kline')
+            sys.exit(1)
+        params = json.loads(args.mc_params) if args.mc_params else {}
+        result = run_monte_carlo(kline_path, args.mc_paths, block_size=args.mc_block, params=params,
+                                 initial_balance=initial_balance, workers=args.workers, seed=args.mc_seed)
+        write_monte_carlo_results(result['paths'], args.mc_output)
+        summary = result['summary']
+        pnl, drawdown = summary['pnl_percentiles'], summary['max_drawdown_percentiles']
+        print(f"蒙特卡洛分析完成，共 {summary['paths']} 条路径，结果已写入 {args.mc_output}")
+        print(f"最终盈亏 均值: {summary['pnl_mean']:.2f}，5%/50%/95%分位: {pnl[5]:.2f} / {pnl[50]:.2f} / {pnl[95]:.2f} USDT，亏损概率: {summary['prob_loss']*100:.1f}%")
+        print(f"最大回撤 5%/50%/95%分位: {drawdown[5]*100:.2f}% / {drawdown[50]*100:.2f}% / {drawdown[95]*100:.2f}%，"
+              f"触及最大回撤限制({summary['max_drawdown_limit']*100:.0f}%)概率: {summary['prob_max_drawdown_breach']*100:.1f}%")
+        return
+    if mode == 'portfolio':
+        if not args.portfolio or any('=' not in item for item in args.portfolio):
+            print('组合回测模式需指定 --portfolio SYMBOL=PATH ...')
+            sys.exit(1)
+        logging.getLogger().setLevel(logging.ERROR)
+        kline_paths = dict(item.split('=', 1) for item in args.portfolio)
+        backtester = PortfolioBacktester(kline_paths, initial_balance={'USDT': args.init_usdt} if args.init_usdt is not None else None,
+                                         resting_orders=args.resting_orders, fill_volume_ratio=args.fill_volume_ratio,
+                                         stream=args.stream, lookbacks=stream_lookbacks(TradingConfig()) if args.stream else None)
+        result = await backtester.run()
+        metrics = result['metrics']
+        for symbol, row in result['symbols'].items():
+            print(f"{symbol} 盈亏: {row['pnl']:.2f} USDT，成交: {row['trade_count']}，手续费: {row['total_fees']:.2f}")
+        print(f"组合回测结束，总资产: {metrics['final_equity']:.2f} USDT，总收益率: {metrics['total_return']*100:.2f}%，"
+              f"最大回撤: {metrics['max_drawdown']*100:.2f}%")
+        backtester.export_equity_curve_to_csv('portfolio_equity_curve.csv')
+        return
     # 选择交易所实现
     if mode == 'backtest':
         kline_path = args.kline or os.getenv('BACKTEST_KLINE_PATH')
         if not kline_path:
             print('回测模式需指定K线数据文件路径 --kline')
             sys.exit(1)
-        exchange = MockExchangeClient(kline_path, initial_balance=initial_balance)
+        exchange = MockExchangeClient(kline_path, initial_balance=initial_balance,
+                                      intrabar=args.intrabar, intrabar_ticks=args.intrabar_ticks,
+                                      resting_orders=args.resting_orders, fill_volume_ratio=args.fill_volume_ratio,
+                                      stream=args.stream, lookbacks=stream_lookbacks(TradingConfig()) if args.stream else None)
         print('已启用回测模式')
     else:
         print('极速回测仅支持backtest模式')
         sys.exit(1)
+    if fast_backtest and not (args.no_feature_cache or args.intrabar or args.stream):
+        # 按K线文件内容哈希持久化的预计算特征，重复回测同一数据集时直接读取
+        exchange.features = FeatureStore.for_file(kline_path, exchange.kline_data)
     config = TradingConfig()
+    if args.resume and not args.checkpoint:
+        print('--resume 需同时指定检查点文件 --checkpoint')
+        sys.exit(1)
+    if fast_backtest and args.vectorized:
+        if args.intrabar or args.resting_orders or args.stream:
+            print('向量化回测引擎不支持K线内价格路径、挂单撮合和流式读取模式')
+            sys.exit(1)
+        try:
+            VectorizedBacktester.check_trade_history(
+                OrderTracker(persist=config.PERSIST_TRADE_HISTORY).get_trade_history())
+        except ValueError as e:
+            print(f"{e}，请去掉 --vectorized 使用逐根回测")
+            sys.exit(1)
+        result = VectorizedBacktester(exchange.kline_data, config, initial_balance=initial_balance,
+                                      features=exchange.features).run()
+        print(f"回测结束，总资产: {result['final_equity']:.2f} USDT，初始本金: {result['initial_principal']:.2f}，总盈亏: {result['profit']:.2f} USDT")
+        return
+    if fast_backtest and args.coarse_to_fine:
+        if args.intrabar or args.resting_orders or args.stream:
+            print('粗筛回测不支持K线内价格路径、挂单撮合和流式读取模式')
+            sys.exit(1)
+        backtester = CoarseToFineBacktester(kline_path, config, initial_balance=initial_balance,
+                                            margin=args.screen_margin, kline_data=exchange.kline_data,
+                                            features=exchange.features)
+        result = await backtester.run()
+        metrics = result['metrics']
+        backtester.exchange.export_trades_to_csv('backtest_trades.csv')
+        backtester.exchange.export_equity_curve_to_csv('backtest_equity_curve.csv')
+        backtester.exchange.export_metrics_to_json('backtest_metrics.json')
+        print(f"回测结束，总资产: {metrics['final_equity']:.2f} USDT，成交: {len(result['trades'])}，"
+              f"总收益率: {metrics['total_return']*100:.2f}%，最大回撤: {metrics['max_drawdown']*100:.2f}%")
+        print(f"粗筛 {result['windows']} 个时段，逐根回放 {result['fine_windows']} 个，"
+              f"执行策略 {result['steps']} 次（共 {exchange.total_ticks} 根K线）")
+        return
     trader = GridTrader(exchange, config)
+
+    def print_summary(total, metrics):
+        initial = config.INITIAL_PRINCIPAL
+        profit = total - initial if initial > 0 else 0
+        print(f"回测结束，总资产: {total:.2f} USDT，初始本金: {initial:.2f}，总盈亏: {profit:.2f} USDT")
+        print(f"总收益率: {metrics['total_return']*100:.2f}%，年化: {metrics['cagr']*100:.2f}%，夏普: {metrics['sharpe']:.2f}，"
+              f"索提诺: {metrics['sortino']:.2f}，最大回撤: {metrics['max_drawdown']*100:.2f}%（{metrics['max_drawdown_days']:.1f}天），"
+              f"换手率: {metrics['turnover']:.2f}，手续费拖累: {metrics['fee_drag']*100:.2f}%")
+
     # 极速回测主循环
     async def fast_backtest_main():
-        await trader.initialize()
-        kline_len = len(exchange.kline_data)
+        # 结果缓存：数据集内容、生效配置、撮合选项和代码版本相同时直接复用结果。
+        # 交易历史只通过已有记录的盈亏影响下单量（回测成交盈亏恒为0），全部为0时与历史内容无关
+        order_tracker = trader.order_tracker
+        history_before = list(order_tracker.trade_history)
+        cache = None if (args.no_cache or args.checkpoint) else BacktestResultCache()
+        if cache is not None:
+            profits = [t.get('profit', 0) for t in history_before]
+            cache_key = backtest_fingerprint(
+                dataset_hash(kline_path), config, symbol=exchange.symbol, initial_balance=initial_balance,
+                client={'intrabar': args.intrabar, 'intrabar_ticks': args.intrabar_ticks, 'resting_orders': args.resting_orders,
+                        'fill_volume_ratio': args.fill_volume_ratio, 'stream': args.stream},
+                history_profits=profits if any(profits) else None)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                # 追加回测记录的交易历史（保留最近100条），与重新回测的副作用一致
+                order_tracker.trade_history = (order_tracker.trade_history + cached['history_added'])[-100:]
+                order_tracker.save_trade_history()
+                write_trades_csv(cached['trades'], 'backtest_trades.csv')
+                write_equity_csv(cached['timestamps'], cached['equity_curve'], 'backtest_equity_curve.csv')
+                write_metrics_json(cached['metrics'], 'backtest_metrics.json')
+                print_summary(cached['total'], cached['metrics'])
+                print('（相同回测请求，已直接使用缓存结果；--no-cache 强制重新回测）')
+                return
+        if args.resume:
+            load_checkpoint(args.checkpoint, exchange, trader)
+            print(f"已从检查点恢复，当前K线: {exchange.kline_index}")
+        else:
+            await trader.initialize()
+        # 价格在网格轨道内且没有定时逻辑到期的K线上策略不会动作，直接快进（结果与逐根回测一致）
+        skipper = BarSkipper(exchange, trader) if not args.no_bar_skip and BarSkipper.supported(exchange) else None
+        steps = 0
+        completed = False
         try:
-            for _ in range(kline_len - 1):  # 每次推进一根K线
-                await trader.step_once()
+            while exchange.has_next():  # 每次推进一根K线（K线内模式下为一个tick）
+                if skipper is not None:
+                    if not await skipper.skip():
+                        break
+                    await skipper.step()
+                else:
+                    await trader.step_once()
                 try:
                     await exchange.next()
                 except StopIteration:
                     break
+                steps += 1
+                if args.checkpoint and steps % args.checkpoint_every == 0:
+                    save_checkpoint(args.checkpoint, exchange, trader)
                 # 打印总资产（由trader.py主循环内已实现，可选保留此处）
+            completed = True
         except Exception as e:
             print(f"主循环异常退出: {e}")
+        if args.checkpoint:
+            # 结束时也保存一次，K线文件追加新数据后可用 --resume 增量继续
+            save_checkpoint(args.checkpoint, exchange, trader)
         # 回测结束后输出总盈亏
         balance = await trader.exchange.fetch_balance()
         funding_balance = await trader.exchange.fetch_funding_balance()
@@ -79,9 +292,18 @@ async def main():
         usdt = float(balance['total'].get('USDT', 0)) + float(funding_balance.get('USDT', 0))
         bnb = float(balance['total'].get('BNB', 0)) + float(funding_balance.get('BNB', 0))
         total = usdt + bnb * current_price
-        initial = config.INITIAL_PRINCIPAL
-        profit = total - initial if initial > 0 else 0
-        print(f"回测结束，总资产: {total:.2f} USDT，初始本金: {initial:.2f}，总盈亏: {profit:.2f} USDT")
+        # 导出成交记录、逐K线资金曲线和绩效指标（供 /api/backtest_result 使用）
+        metrics = exchange.performance_metrics()
+        print_summary(total, metrics)
+        exchange.export_trades_to_csv('backtest_trades.csv')
+        exchange.export_equity_curve_to_csv('backtest_equity_curve.csv')
+        exchange.export_metrics_to_json('backtest_metrics.json')
+        if cache is not None and completed:
+            recorder = exchange.equity_recorder
+            before = {id(t) for t in history_before}
+            cache.put(cache_key, {'trades': exchange.trades, 'timestamps': recorder.timestamps, 'equity_curve': recorder.equity,
+                                  'metrics': metrics, 'total': total,
+                                  'history_added': [t for t in order_tracker.trade_history if id(t) not in before]})
     if fast_backtest:
         await fast_backtest_main()
     else:
@@ -1,168 +1,567 @@
 import json
-import os
 import asyncio
-import csv
+import heapq
+import numpy as np
+from array import array
 from typing import Any, Dict, List, Optional
-from iexchange_client import IExchangeClient
+from iexchange_client import BarClock, IExchangeClient
+from backtest_metrics import EquityRecorder, compute_metrics, write_equity_csv, write_metrics_json, write_trades_csv
+from kline_store import KlineResampler, KlineSeries, KlineStream, SharedKlineArray, StreamingResampler, detect_base_timeframe, open_kline_file, timeframe_to_ms
+from feature_store import FeatureStore
+
+class AccountLedger:
+    """
+    回测账户余额：现货可用、挂单冻结和理财余额按资产索引存放在double数组中，
+    每次变动递增版本号，便于按版本缓存余额快照。
+    """
+    __slots__ = ('_index', 'spot', 'locked', 'savings', 'version')
+
+    def __init__(self, spot: Dict[str, float], savings: Dict[str, float]):
+        assets = list(dict.fromkeys(list(spot) + list(savings)))
+        self._index = {asset: i for i, asset in enumerate(assets)}
+        self.spot = array('d', [float(spot.get(asset, 0.0)) for asset in assets])
+        self.locked = array('d', [0.0] * len(assets))
+        self.savings = array('d', [float(savings.get(asset, 0.0)) for asset in assets])
+        self.version = 0
+
+    def __contains__(self, asset: str) -> bool:
+        return asset in self._index
+
+    def index(self, asset: str) -> int:
+        i = self._index.get(asset)
+        if i is None:
+            i = self._index[asset] = len(self.spot)
+            self.spot.append(0.0)
+            self.locked.append(0.0)
+            self.savings.append(0.0)
+        return i
+
+    def spot_balance(self, asset: str) -> float:
+        i = self._index.get(asset)
+        return self.spot[i] if i is not None else 0.0
+
+    def locked_balance(self, asset: str) -> float:
+        i = self._index.get(asset)
+        return self.locked[i] if i is not None else 0.0
+
+    def savings_balance(self, asset: str) -> float:
+        i = self._index.get(asset)
+        return self.savings[i] if i is not None else 0.0
+
+    def add_spot(self, asset: str, amount: float):
+        self.spot[self.index(asset)] += amount
+        self.version += 1
+
+    def lock(self, asset: str, amount: float):
+        """从现货可用余额冻结（amount为负时解冻）"""
+        i = self.index(asset)
+        self.spot[i] -= amount
+        self.locked[i] += amount
+        self.version += 1
+
+    def add_locked(self, asset: str, amount: float):
+        self.locked[self.index(asset)] += amount
+        self.version += 1
+
+    def add_savings(self, asset: str, amount: float):
+        self.savings[self.index(asset)] += amount
+        self.version += 1
+
+    def spot_dict(self) -> Dict[str, float]:
+        return {asset: self.spot[i] for asset, i in self._index.items()}
+
+    def locked_dict(self) -> Dict[str, float]:
+        return {asset: self.locked[i] for asset, i in self._index.items()}
+
+    def savings_dict(self) -> Dict[str, float]:
+        return {asset: self.savings[i] for asset, i in self._index.items()}
+
+
+def stream_lookbacks(config) -> Dict[str, int]:
+    """
+    流式回测各K线周期需保留的回看根数：覆盖策略中最大的 fetch_ohlcv limit
+    （1h 波动率窗口与100根MACD/默认窗口、42根4小时分位窗口、S1回看天数+2）。
+    """
+    return {
+        '1h': max(100, int(getattr(config, 'VOLATILITY_WINDOW', 24))),
+        '4h': 42,
+        '1d': int(getattr(config, 'S1_LOOKBACK', 52)) + 2,
+    }
+
 
 class MockExchangeClient(IExchangeClient):
     """
     回测用虚拟交易所，支持历史K线回放、虚拟账户、订单撮合等。
+    intrabar=True 时将每根K线展开为确定性的K线内价格路径（阳线 O→L→H→C，阴线 O→H→L→C，
+    相邻端点间可插入 intrabar_ticks 个线性插值点），next() 按tick推进，策略在每个tick上判断信号。
+    价格路径按K线惰性生成，只保留当前K线的路径。
+    resting_orders=True 时限价单按挂单撮合：可立即成交的部分按当前价成交，其余挂入按价格排序的
+    买卖堆，之后的K线最低价/最高价（K线内模式下为tick价格）穿过挂单价时成交；
+    fill_volume_ratio 限制每根K线每个方向的成交量不超过该K线成交量的比例（无成交量数据时不限制），
+    超出部分保持挂单（部分成交）。默认沿用即时全部成交。
+    stream=True 时后台线程按块预读K线文件，只保留 lookbacks（{周期: 回看根数}，默认100根基础K线）
+    所需的回看窗口，大周期K线随回放增量聚合，内存占用与文件大小无关。
+    kline_data 为预加载的K线（JSON行列表或 KlineSeries，只读），提供时不再读取 kline_path，
+    同一份数据可在进程内被多次回测复用；shared_klines 为 SharedKlineArray.descriptor，
+    并行回测的工作进程按名称映射主进程放入共享内存的K线（零拷贝），close() 时解除映射。
+    features 为同一份K线的 FeatureStore，策略通过 feature_value 按当前K线读取预计算的波动率、
+    S1高低点和价格分位（按收盘价计算，不支持K线内和流式模式）。
     """
-    def __init__(self, kline_path: str, initial_balance: Dict[str, float] = None, fee_rate: float = 0.001, slippage: float = 0.0, symbol: str = 'BNB/USDT'):
+    def __init__(self, kline_path: str, initial_balance: Dict[str, float] = None, fee_rate: float = 0.001, slippage: float = 0.0, symbol: str = 'BNB/USDT',
+                 intrabar: bool = False, intrabar_ticks: int = 0, resting_orders: bool = False, fill_volume_ratio: Optional[float] = None,
+                 stream: bool = False, lookbacks: Optional[Dict[str, int]] = None, stream_chunk_rows: int = 4096,
+                 ledger: Optional[AccountLedger] = None, kline_data: Optional[Any] = None,
+                 shared_klines: Optional[Dict[str, Any]] = None, features: Optional[FeatureStore] = None):
+        if stream and (kline_data is not None or shared_klines is not None):
+            raise ValueError("流式模式不支持预加载的K线数据")
+        if features is not None and (stream or intrabar):
+            raise ValueError("预计算特征只支持按收盘价回放（不支持K线内和流式模式）")
+        self._shared_klines = None
+        if shared_klines is not None:
+            self._shared_klines = SharedKlineArray.attach(shared_klines)
+            kline_data = self._shared_klines.series()
         self.kline_path = kline_path
-        self.kline_data = self._load_kline_data()
+        self.stream = stream
+        self._lookbacks_ms = {timeframe_to_ms(tf): int(n) for tf, n in (lookbacks or {}).items()}
+        self.stream_chunk_rows = stream_chunk_rows
+        self.kline_data = kline_data if kline_data is not None else self._load_kline_data()
         self.kline_index = 0
-        self.orders = []  # 活跃订单
+        if features is not None and len(features) != len(self.kline_data):
+            raise ValueError(f"特征库K线数量 {len(features)} 与回测数据 {len(self.kline_data)} 不一致")
+        self.features = features
+        # K线内价格路径
+        self.intrabar = intrabar
+        self.intrabar_ticks = max(0, int(intrabar_ticks))
+        self.ticks_per_bar = 3 * (self.intrabar_ticks + 1) + 1 if intrabar else 1
+        self.tick_index = 0
+        # 策略时钟为当前K线（K线内模式下为当前tick）的时间
+        self.clock = BarClock(lambda: self._current_tick()[0])
+        self._path_bar_index = None
+        self._path = None
+        # 多周期重采样（按需构建，随回放位置增量更新）
+        self._base_timeframe_ms = self._detect_base_timeframe()
+        self._resamplers = {}
         self.trades = []  # 成交记录
-        self.balance = initial_balance or {'USDT': 10000.0, 'BNB': 0.0}
-        self.savings_balance = {'USDT': 0.0, 'BNB': 0.0}  # 新增理财账户
+        self._orders_by_id = {}  # 订单ID -> 订单状态
+        self._open_order_ids = {}  # 未完成订单ID（按下单顺序），成交/撤单时移除
+        # 挂单撮合：买单按价格从高到低、卖单按价格从低到高，同价按下单顺序（已撤/已成交订单惰性移除）
+        self.resting_orders = resting_orders
+        self.fill_volume_ratio = fill_volume_ratio
+        self._bid_heap = []  # (-价格, 序号, 订单ID)
+        self._ask_heap = []  # (价格, 序号, 订单ID)
+        self._fill_capacity = None  # (K线索引, 剩余可买量, 剩余可卖量)
+        # 自动解析base/quote币种
+        if '/' in symbol:
+            self.base, self.quote = symbol.split('/')
+        else:
+            self.base, self.quote = 'BNB', 'USDT'
+        # 现货 + 理财账户（组合回测时多个交易对共享同一账户）
+        self.ledger = ledger or AccountLedger(initial_balance or {self.quote: 10000.0, self.base: 0.0}, {self.quote: 0.0, self.base: 0.0})
+        self._balance_snapshot = None  # (账户版本, fetch_balance结果)
+        self._funding_snapshot = None  # (账户版本, fetch_funding_balance结果)
         self.fee_rate = fee_rate
         self.slippage = slippage
         self.order_id_counter = 1
         self.markets_loaded = True
         self.time_diff = 0
         self.symbol = symbol
-        # 自动解析base/quote币种
-        if '/' in symbol:
-            self.base, self.quote = symbol.split('/')
-        else:
-            self.base, self.quote = 'BNB', 'USDT'
-        self._sync_base_quote()
+        # 逐K线资金曲线（现货+冻结+理财，按K线收盘价计价）
+        self.equity_recorder = EquityRecorder((self.kline_data.total or 1024) if self.stream else len(self.kline_data))
+        self.initial_equity = self._total_equity(float(self.kline_data[0][4])) if self._has_bar(0) else 0.0
+        if self.stream:
+            # 流式模式下大周期K线需从头增量聚合，预先创建
+            for timeframe_ms in self._lookbacks_ms:
+                if timeframe_ms > self._base_timeframe_ms:
+                    self._resamplers[timeframe_ms] = StreamingResampler(timeframe_ms, self._lookbacks_ms[timeframe_ms])
 
     def _load_kline_data(self) -> List[List[Any]]:
-        if not os.path.exists(self.kline_path):
-            raise FileNotFoundError(f"K线数据文件不存在: {self.kline_path}")
-        with open(self.kline_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        return data
+        if self.stream:
+            # 基础K线窗口需覆盖不大于基础周期的最大回看根数（fetch_ohlcv默认100根），另留2根余量
+            base_window = max([100] + list(self._lookbacks_ms.values()))
+            return KlineStream(self.kline_path, base_window + 2, chunk_rows=self.stream_chunk_rows)
+        # 支持JSON文件和列式 .npy 文件（内存映射，切片零拷贝）
+        return open_kline_file(self.kline_path)
+
+    def _has_bar(self, index: int) -> bool:
+        if self.stream:
+            return self.kline_data.has(index)
+        return 0 <= index < len(self.kline_data)
+
+    def has_next(self) -> bool:
+        """是否还能推进（还有下一个tick或下一根K线）"""
+        return self.tick_index < self.ticks_per_bar - 1 or self._has_bar(self.kline_index + 1)
+
+    def _detect_base_timeframe(self) -> int:
+        if self.stream:
+            return self.kline_data.base_timeframe_ms
+        if isinstance(self.kline_data, KlineSeries):
+            return detect_base_timeframe(self.kline_data.column('timestamp'))
+        return detect_base_timeframe([k[0] for k in self.kline_data])
+
+    @property
+    def total_ticks(self) -> Optional[int]:
+        """回放的总tick数（非K线内模式下等于K线数量），流式读取JSON时未知返回None"""
+        if self.stream:
+            return self.kline_data.total * self.ticks_per_bar if self.kline_data.total is not None else None
+        return len(self.kline_data) * self.ticks_per_bar
+
+    def _bar_path(self, index: int) -> List[List[float]]:
+        """生成第index根K线的价格路径 [[timestamp, price], ...]"""
+        k = self.kline_data[index]
+        open_, high_, low_, close_ = float(k[1]), float(k[2]), float(k[3]), float(k[4])
+        vertices = [open_, low_, high_, close_] if close_ >= open_ else [open_, high_, low_, close_]
+        prices = [open_]
+        for start, end in zip(vertices, vertices[1:]):
+            steps = self.intrabar_ticks + 1
+            prices.extend(start + (end - start) * j / steps for j in range(1, steps))
+            prices.append(end)
+        # tick时间戳在K线时间跨度内均匀分布
+        if self._has_bar(index + 1):
+            span = self.kline_data[index + 1][0] - k[0]
+        elif index > 0:
+            span = k[0] - self.kline_data[index - 1][0]
+        else:
+            span = 0
+        return [[k[0] + span * j // len(prices), price] for j, price in enumerate(prices)]
+
+    def _current_path(self) -> List[List[float]]:
+        if self._path_bar_index != self.kline_index:
+            self._path = self._bar_path(self.kline_index)
+            self._path_bar_index = self.kline_index
+        return self._path
+
+    def _current_tick(self):
+        """返回当前tick的 (timestamp, price)"""
+        if not self.intrabar:
+            k = self.kline_data[self.kline_index]
+            return k[0], k[4]
+        return tuple(self._current_path()[self.tick_index])
+
+    def _current_bar(self) -> List[Any]:
+        """当前K线截至当前tick的部分K线（非K线内模式下为完整K线）"""
+        k = self.kline_data[self.kline_index]
+        if not self.intrabar:
+            return k
+        prices = [p for _, p in self._current_path()[:self.tick_index + 1]]
+        return [k[0], k[1], max(prices), min(prices), prices[-1]]
+
+    def get_state(self) -> Dict[str, Any]:
+        """回放位置、账户、订单和成交等模拟状态（用于检查点）"""
+        ledger = self.ledger
+        return {
+            'kline_index': self.kline_index,
+            'tick_index': self.tick_index,
+            'ticks_per_bar': self.ticks_per_bar,
+            'timestamp': self.kline_data[self.kline_index][0],
+            'ledger': {
+                'assets': list(ledger._index),
+                'spot': list(ledger.spot),
+                'locked': list(ledger.locked),
+                'savings': list(ledger.savings),
+                'version': ledger.version,
+            },
+            'trades': self.trades,
+            'orders': self._orders_by_id,
+            'bid_heap': self._bid_heap,
+            'ask_heap': self._ask_heap,
+            'fill_capacity': self._fill_capacity,
+            'order_id_counter': self.order_id_counter,
+            'equity': self.equity_recorder.get_state(),
+            'initial_equity': self.initial_equity,
+            'stream_resamplers': self._resamplers if self.stream else None,
+        }
+
+    def set_state(self, state: Dict[str, Any]):
+        """恢复 get_state 的状态；K线文件可在原有数据之后追加新K线"""
+        if state['ticks_per_bar'] != self.ticks_per_bar:
+            raise ValueError("检查点的K线内tick设置与当前回测不一致")
+        index = state['kline_index']
+        if not self._has_bar(index) or self.kline_data[index][0] != state['timestamp']:
+            raise ValueError("检查点与K线数据不匹配")
+        self.kline_index = index
+        self.tick_index = state['tick_index']
+        self._path_bar_index = None
+        ledger = state['ledger']
+        self.ledger = AccountLedger({}, {})
+        self.ledger._index = {asset: i for i, asset in enumerate(ledger['assets'])}
+        self.ledger.spot = array('d', ledger['spot'])
+        self.ledger.locked = array('d', ledger['locked'])
+        self.ledger.savings = array('d', ledger['savings'])
+        self.ledger.version = ledger['version']
+        self._balance_snapshot = None
+        self._funding_snapshot = None
+        self.trades = state['trades']
+        self._orders_by_id = state['orders']
+        self._open_order_ids = dict.fromkeys(order_id for order_id, order in self._orders_by_id.items() if order['status'] == 'open')
+        self._bid_heap = state['bid_heap']
+        self._ask_heap = state['ask_heap']
+        self._fill_capacity = state['fill_capacity']
+        self.order_id_counter = state['order_id_counter']
+        self.equity_recorder = EquityRecorder.from_state(state['equity'], self.total_ticks or 1024)
+        self.initial_equity = state['initial_equity']
+        if self.stream:
+            self._resamplers = state['stream_resamplers']
 
     async def fetch_ohlcv(self, symbol: str, timeframe: str = '1h', limit: Optional[int] = None) -> List[List[Any]]:
-        # 支持日线聚合
-        if timeframe.lower() in ['1d', 'd1', 'day', 'daily']:
-            # 聚合所有1小时K线为日线K线
-            from collections import defaultdict
-            import datetime
-            daily = defaultdict(list)
-            for k in self.kline_data:
-                # k[0]为毫秒时间戳，转为UTC日期
-                dt = datetime.datetime.utcfromtimestamp(k[0] // 1000)
-                day_key = dt.date()
-                daily[day_key].append(k)
-            # 按日期排序
-            days = sorted(daily.keys())
-            daily_klines = []
-            for day in days:
-                ks = daily[day]
-                open_ = ks[0][1]
-                high_ = max(x[2] for x in ks)
-                low_ = min(x[3] for x in ks)
-                close_ = ks[-1][4]
-                # 日线时间戳为该日零点（毫秒）
-                ts = int(datetime.datetime.combine(day, datetime.time(0,0)).timestamp() * 1000)
-                daily_klines.append([ts, open_, high_, low_, close_])
-            if limit is not None:
-                daily_klines = daily_klines[-limit:]
-            return daily_klines
+        # 大于基础K线周期时返回重采样K线（已完成K线 + 截至当前位置的部分K线，无未来数据）
+        timeframe_ms = timeframe_to_ms(timeframe)
+        if timeframe_ms > self._base_timeframe_ms:
+            resampler = self._resamplers.get(timeframe_ms)
+            if self.stream:
+                if resampler is None:
+                    # 未预先声明的周期只能从当前位置开始聚合
+                    max_bars = self._lookbacks_ms.get(timeframe_ms, max(100, limit or 0))
+                    resampler = self._resamplers[timeframe_ms] = StreamingResampler(timeframe_ms, max_bars)
+                return resampler.bars_until(limit, self._current_bar())
+            if resampler is None:
+                resampler = self._resamplers[timeframe_ms] = KlineResampler(self.kline_data, timeframe_ms)
+            current_row = self._current_bar() if self.intrabar else None
+            return resampler.bars_until(self.kline_index, limit, current_row)
         # 原有1小时K线逻辑
         if limit is None:
             limit = 100
         start = max(0, self.kline_index - limit + 1)
+        if self.intrabar:
+            # 当前K线尚未走完，只返回截至当前tick的部分K线
+            return list(self.kline_data[start:self.kline_index]) + [self._current_bar()]
         return self.kline_data[start:self.kline_index+1]
 
+    def feature_value(self, name: str, **params):
+        """当前K线的预计算特征（FeatureStore 的同名方法按参数返回的数组中的一项），未配置特征库时返回 None"""
+        if self.features is None:
+            return None
+        return getattr(self.features, name)(**params)[self.kline_index]
+
     async def fetch_ticker(self, symbol: str) -> Dict[str, Any]:
-        # 返回当前K线的收盘价
-        k = self.kline_data[self.kline_index]
-        return {'last': k[4], 'close': k[4], 'open': k[1], 'high': k[2], 'low': k[3], 'timestamp': k[0]}
+        # 返回当前K线的收盘价（K线内模式下为当前tick价格）
+        k = self._current_bar()
+        timestamp, price = self._current_tick()
+        return {'last': price, 'close': price, 'open': k[1], 'high': k[2], 'low': k[3], 'timestamp': timestamp}
 
     async def create_order(self, symbol: str, type: str, side: str, amount: float, price: Optional[float] = None) -> Dict[str, Any]:
-        # 仅支持限价单，立即撮合
-        k = self.kline_data[self.kline_index]
-        exec_price = price if price is not None else k[4]
+        # 默认即时全部成交；挂单撮合模式下限价单可能部分成交或挂单等待
+        timestamp, current_price = self._current_tick()
+        exec_price = price if price is not None else current_price
         if self.slippage > 0:
             exec_price *= (1 + self.slippage) if side == 'buy' else (1 - self.slippage)
-        fee = amount * exec_price * self.fee_rate
         order_id = str(self.order_id_counter)
         self.order_id_counter += 1
-        # 账户变动
+        # 冻结下单所需资金
+        ledger = self.ledger
         if side == 'buy':
+            reserved = amount * exec_price + amount * exec_price * self.fee_rate
+            if ledger.spot_balance(self.quote) < reserved:
+                raise Exception(f'{self.quote}余额不足')
+            ledger.lock(self.quote, reserved)
+        else:
+            reserved = amount
+            if ledger.spot_balance(self.base) < amount:
+                raise Exception(f'{self.base}余额不足')
+            ledger.lock(self.base, amount)
+        order = {
+            'id': order_id,
+            'status': 'open',
+            'price': exec_price,
+            'amount': amount,
+            'filled': 0.0,
+            'side': side,
+            'timestamp': timestamp,
+            'reserved': reserved
+        }
+        self._orders_by_id[order_id] = order
+        self._open_order_ids[order_id] = None
+        if not self.resting_orders or type == 'market':
+            self._fill(order, amount, timestamp)
+        else:
+            # 可立即成交（买价不低于/卖价不高于当前价）的部分按成交量上限成交，其余挂单
+            if (exec_price >= current_price) if side == 'buy' else (exec_price <= current_price):
+                self._fill(order, min(amount, self._take_capacity(side, amount)), timestamp)
+            if order['status'] == 'open':
+                heap = self._bid_heap if side == 'buy' else self._ask_heap
+                heapq.heappush(heap, (-exec_price if side == 'buy' else exec_price, int(order_id), order_id))
+        return self._order_status(order_id)
+
+    def _fill(self, order: Dict[str, Any], amount: float, timestamp):
+        """按订单价格成交amount数量，从冻结资金中扣减，全部成交后释放冻结余量"""
+        if amount <= 0:
+            return
+        ledger = self.ledger
+        exec_price = order['price']
+        fee = amount * exec_price * self.fee_rate
+        remaining = order['amount'] - order['filled']
+        if amount >= remaining:
+            amount = remaining
+        if order['side'] == 'buy':
             cost = amount * exec_price + fee
-            if self.balance['USDT'] < cost:
-                raise Exception('USDT余额不足')
-            self.balance['USDT'] -= cost
-            self.balance['BNB'] += amount
+            ledger.add_locked(self.quote, -cost)
+            order['reserved'] -= cost
+            ledger.add_spot(self.base, amount)
+            asset = self.quote
         else:
-            if self.balance['BNB'] < amount:
-                raise Exception('BNB余额不足')
-            self.balance['BNB'] -= amount
-            self.balance['USDT'] += amount * exec_price - fee
-        self._sync_base_quote()
+            ledger.add_locked(self.base, -amount)
+            order['reserved'] -= amount
+            ledger.add_spot(self.quote, amount * exec_price - fee)
+            asset = self.base
+        order['filled'] += amount
+        if amount == remaining:
+            order['filled'] = order['amount']
+            order['status'] = 'closed'
+            self._open_order_ids.pop(order['id'], None)
+            # 释放浮点误差导致的冻结余量
+            if order['reserved']:
+                ledger.lock(asset, -order['reserved'])
+                order['reserved'] = 0.0
         # 记录成交
-        trade = {
-            'timestamp': k[0],
-            'side': side,
+        self.trades.append({
+            'timestamp': timestamp,
+            'side': order['side'],
             'price': exec_price,
             'amount': amount,
             'cost': amount * exec_price,
             'fee': fee,
-            'order_id': order_id,
+            'order_id': order['id'],
             'profit': 0  # 回测可后续补充
-        }
-        self.trades.append(trade)
-        return {
-            'id': order_id,
-            'status': 'closed',
-            'price': exec_price,
-            'filled': amount,
-            'side': side
-        }
+        })
 
-    async def fetch_balance(self, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        result = {
-            'free': self.balance.copy(),
-            'used': {'USDT': 0, 'BNB': 0},
-            'total': self.balance.copy()
-        }
+    def _take_capacity(self, side: str, amount: float) -> float:
+        """从当前K线的成交量上限中扣减，返回本次可成交数量"""
+        if self.fill_volume_ratio is None:
+            return amount
+        k = self.kline_data[self.kline_index]
+        volume = float(k[5]) if len(k) > 5 else 0.0
+        if volume <= 0:
+            return amount
+        if self._fill_capacity is None or self._fill_capacity[0] != self.kline_index:
+            capacity = volume * self.fill_volume_ratio
+            self._fill_capacity = [self.kline_index, capacity, capacity]
+        slot = 1 if side == 'buy' else 2
+        taken = min(amount, self._fill_capacity[slot])
+        self._fill_capacity[slot] -= taken
+        return taken
+
+    def _match_resting_orders(self):
+        """用当前K线（K线内模式下为当前tick）的价格区间撮合挂单"""
+        if self.intrabar:
+            timestamp, price = self._current_tick()
+            low = high = price
+        else:
+            k = self.kline_data[self.kline_index]
+            timestamp, high, low = k[0], float(k[2]), float(k[3])
+        for side, heap in (('buy', self._bid_heap), ('sell', self._ask_heap)):
+            while heap:
+                key, _, order_id = heap[0]
+                order = self._orders_by_id[order_id]
+                if order['status'] != 'open':
+                    heapq.heappop(heap)
+                    continue
+                if (-key < low) if side == 'buy' else (key > high):
+                    break
+                remaining = order['amount'] - order['filled']
+                taken = self._take_capacity(side, remaining)
+                if taken <= 0:
+                    break
+                self._fill(order, taken, timestamp)
+                if order['status'] != 'open':
+                    heapq.heappop(heap)
+
+    @property
+    def balance(self) -> Dict[str, float]:
+        """现货余额（含 'base'/'quote' 别名）"""
+        balance = self.ledger.spot_dict()
         # 兼容主流程对'balance[base]'和'balance[quote]'的访问
-        result['free']['base'] = self.balance.get(self.base, 0)
-        result['free']['quote'] = self.balance.get(self.quote, 0)
-        result['total']['base'] = self.balance.get(self.base, 0)
-        result['total']['quote'] = self.balance.get(self.quote, 0)
-        self._sync_base_quote()
-        return result
+        balance['base'] = balance.get(self.base, 0)
+        balance['quote'] = balance.get(self.quote, 0)
+        return balance
+
+    @property
+    def savings_balance(self) -> Dict[str, float]:
+        """理财余额"""
+        return self.ledger.savings_dict()
+
+    async def fetch_balance(self, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        # 余额快照按账户版本缓存，账户未变动时直接返回（调用方不应修改返回值）
+        if self._balance_snapshot is None or self._balance_snapshot[0] != self.ledger.version:
+            balance = self.balance
+            used = self.ledger.locked_dict()
+            used['base'] = used.get(self.base, 0)
+            used['quote'] = used.get(self.quote, 0)
+            result = {
+                'free': balance,
+                'used': used,
+                'total': {asset: balance[asset] + used.get(asset, 0) for asset in balance}
+            }
+            self._balance_snapshot = (self.ledger.version, result)
+        return self._balance_snapshot[1]
 
     async def fetch_my_trades(self, symbol: str, limit: int = 10) -> List[Dict[str, Any]]:
         return self.trades[-limit:]
 
     async def fetch_order_book(self, symbol: str, limit: int = 5) -> Dict[str, Any]:
-        # 用当前K线的收盘价模拟盘口
-        k = self.kline_data[self.kline_index]
-        price = k[4]
+        # 用当前K线的收盘价（K线内模式下为当前tick价格）模拟盘口
+        price = self._current_tick()[1]
         return {
             'asks': [[price * 1.001, 100]],
             'bids': [[price * 0.999, 100]]
         }
 
     async def close(self):
-        pass
+        if self.stream:
+            self.kline_data.close()
+        if self._shared_klines is not None:
+            self.kline_data = None
+            self._resamplers = {}
+            self._shared_klines.close()
 
-    # 回测推进：手动推进K线
+    # 回测推进：手动推进K线（K线内模式下推进一个tick）
     async def next(self):
-        if self.kline_index < len(self.kline_data) - 1:
+        if self.tick_index < self.ticks_per_bar - 1:
+            self.tick_index += 1
+            await asyncio.sleep(0)
+        elif self._has_bar(self.kline_index + 1):
+            # 当前K线走完，记录收盘资金
+            self.record_equity()
+            if self.stream:
+                k = self.kline_data[self.kline_index]
+                for resampler in self._resamplers.values():
+                    resampler.push(k)
             self.kline_index += 1
+            self.tick_index = 0
             await asyncio.sleep(0)  # 兼容异步
         else:
+            self.record_equity()
             raise StopIteration('回测已到末尾')
+        if self._bid_heap or self._ask_heap:
+            self._match_resting_orders()
+
+    async def fast_forward(self, index: int):
+        """
+        不执行策略，直接推进到第index根K线（用于跳过确定不会产生任何动作的K线）。
+        跳过的K线上账户不变，按收盘价批量记录资金曲线；有挂单或流式读取时逐根推进，保持撮合和聚合。
+        """
+        if self.intrabar:
+            raise ValueError("K线内价格路径模式不支持快进")
+        if index <= self.kline_index:
+            return
+        if not self._has_bar(index):
+            raise IndexError(f"K线索引超出范围: {index}")
+        if self.stream or self._bid_heap or self._ask_heap:
+            while self.kline_index < index:
+                await self.next()
+            return
+        rows = self.kline_data[self.kline_index:index]
+        if isinstance(rows, KlineSeries):
+            timestamps, closes = rows.column('timestamp'), rows.column('close')
+        else:
+            timestamps = np.fromiter((k[0] for k in rows), dtype=np.int64, count=len(rows))
+            closes = np.fromiter((k[4] for k in rows), dtype=np.float64, count=len(rows))
+        quote, base = self.total_balances()
+        self.equity_recorder.record_many(np.arange(self.kline_index, index), timestamps, quote + base * closes)
+        self.kline_index = index
+        self.tick_index = 0
+        await asyncio.sleep(0)
 
     def export_trades_to_csv(self, file_path: str):
-        if not self.trades:
-            return False
-        with open(file_path, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=['timestamp', 'side', 'price', 'amount', 'cost', 'fee', 'order_id', 'profit'])
-            writer.writeheader()
-            for trade in self.trades:
-                writer.writerow(trade)
-        return True
+        return write_trades_csv(self.trades, file_path)
 
     def export_trades_to_json(self, file_path: str):
         if not self.trades:
@@ -171,56 +570,71 @@ class MockExchangeClient(IExchangeClient):
             json.dump(self.trades, f, ensure_ascii=False, indent=2)
         return True
 
+    def total_balances(self):
+        """计价币和基础币的总数量（现货 + 冻结 + 理财），返回 (quote, base)"""
+        ledger = self.ledger
+        quote = ledger.spot_balance(self.quote) + ledger.locked_balance(self.quote) + ledger.savings_balance(self.quote)
+        base = ledger.spot_balance(self.base) + ledger.locked_balance(self.base) + ledger.savings_balance(self.base)
+        return quote, base
+
+    def _total_equity(self, price: float) -> float:
+        quote, base = self.total_balances()
+        return quote + base * price
+
+    def record_equity(self):
+        """记录当前K线（K线内模式下为当前tick）的总资产，同一根K线重复调用时覆盖"""
+        price = float(self._current_tick()[1])
+        self.equity_recorder.record(self.kline_index, self.kline_data[self.kline_index][0], self._total_equity(price))
+
+    def performance_metrics(self) -> Dict[str, Any]:
+        """按逐K线资金曲线和成交记录计算绩效指标"""
+        self.record_equity()
+        recorder = self.equity_recorder
+        return compute_metrics(recorder.timestamps, recorder.equity, self.trades, self.initial_equity)
+
     def export_equity_curve_to_csv(self, file_path: str):
-        # 简单实现：按成交顺序统计总资产（USDT+BNB*当前成交价）
-        equity = []
-        usdt = self.balance.get('USDT', 0)
-        bnb = self.balance.get('BNB', 0)
-        for trade in self.trades:
-            if trade['side'] == 'buy':
-                usdt -= trade['cost'] + trade['fee']
-                bnb += trade['amount']
-            else:
-                bnb -= trade['amount']
-                usdt += trade['cost'] - trade['fee']
-            total = usdt + bnb * trade['price']
-            equity.append({'timestamp': trade['timestamp'], 'equity': total})
-        with open(file_path, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=['timestamp', 'equity'])
-            writer.writeheader()
-            for row in equity:
-                writer.writerow(row)
+        # 逐K线总资产（现货+冻结+理财）
+        self.record_equity()
+        recorder = self.equity_recorder
+        return write_equity_csv(recorder.timestamps, recorder.equity, file_path)
+
+    def export_metrics_to_json(self, file_path: str):
+        write_metrics_json(self.performance_metrics(), file_path)
         return True
 
     async def transfer_to_savings(self, asset, amount):
         # 现货转理财
         asset = asset.upper()
-        if asset not in self.balance:
+        ledger = self.ledger
+        if asset not in ledger:
             raise Exception(f"现货账户无{asset}")
-        if self.balance[asset] < amount:
+        if ledger.spot_balance(asset) < amount:
             raise Exception(f"现货{asset}余额不足，无法申购理财")
-        self.balance[asset] -= amount
-        self.savings_balance[asset] = self.savings_balance.get(asset, 0.0) + amount
+        ledger.add_spot(asset, -amount)
+        ledger.add_savings(asset, amount)
         # 日志
-        print(f"[Mock] 申购理财: {amount} {asset}，现货余额: {self.balance[asset]:.8f}，理财余额: {self.savings_balance[asset]:.8f}")
+        print(f"[Mock] 申购理财: {amount} {asset}，现货余额: {ledger.spot_balance(asset):.8f}，理财余额: {ledger.savings_balance(asset):.8f}")
         return True
 
     async def transfer_to_spot(self, asset, amount):
         # 理财转现货
         asset = asset.upper()
-        if asset not in self.savings_balance:
+        ledger = self.ledger
+        if asset not in ledger:
             raise Exception(f"理财账户无{asset}")
-        if self.savings_balance[asset] < amount:
+        if ledger.savings_balance(asset) < amount:
             raise Exception(f"理财{asset}余额不足，无法赎回")
-        self.savings_balance[asset] -= amount
-        self.balance[asset] = self.balance.get(asset, 0.0) + amount
+        ledger.add_savings(asset, -amount)
+        ledger.add_spot(asset, amount)
         # 日志
-        print(f"[Mock] 赎回理财: {amount} {asset}，现货余额: {self.balance[asset]:.8f}，理财余额: {self.savings_balance[asset]:.8f}")
+        print(f"[Mock] 赎回理财: {amount} {asset}，现货余额: {ledger.spot_balance(asset):.8f}，理财余额: {ledger.savings_balance(asset):.8f}")
         return True
 
     async def fetch_funding_balance(self):
-        # 回测模式下理财账户余额
-        return self.savings_balance.copy()
+        # 回测模式下理财账户余额（按账户版本缓存）
+        if self._funding_snapshot is None or self._funding_snapshot[0] != self.ledger.version:
+            self._funding_snapshot = (self.ledger.version, self.ledger.savings_dict())
+        return self._funding_snapshot[1]
 
     @property
     def exchange(self):
@@ -234,57 +648,52 @@ class MockExchangeClient(IExchangeClient):
                 return {'symbol': symbol, 'base': base, 'quote': quote}
         return Dummy()
 
-    def _sync_base_quote(self):
-        self.balance['base'] = self.balance.get(self.base, 0)
-        self.balance['quote'] = self.balance.get(self.quote, 0)
-
     async def create_market_order(self, symbol: str, side: str, amount: float, params: Optional[dict] = None):
         """
         回测环境下的市价单实现，直接用当前K线收盘价模拟成交。
         兼容S1策略和主流程的市价单调用。
         """
-        # 获取当前K线收盘价
-        k = self.kline_data[self.kline_index]
-        price = k[4]
+        # 获取当前K线收盘价（K线内模式下为当前tick价格）
+        price = self._current_tick()[1]
         # 调用限价单接口实现市价单逻辑
         return await self.create_order(symbol, type='market', side=side, amount=amount, price=price)
 
-    async def fetch_order(self, order_id, symbol, params=None):
-        # 在trades中查找order_id
-        for trade in self.trades:
-            if str(trade.get('order_id')) == str(order_id):
-                return {
-                    'id': order_id,
-                    'status': 'closed',
-                    'price': trade['price'],
-                    'filled': trade['amount'],
-                    'side': trade['side']
-                }
-        # 未找到则返回canceled
+    def _order_status(self, order_id) -> Dict[str, Any]:
+        # 按订单ID索引查找，未找到视为已取消
+        order = self._orders_by_id.get(str(order_id))
+        if order is None:
+            return {
+                'id': order_id,
+                'status': 'canceled',
+                'price': None,
+                'amount': None,
+                'filled': 0,
+                'remaining': 0,
+                'side': None
+            }
         return {
             'id': order_id,
-            'status': 'canceled',
-            'price': None,
-            'filled': 0,
-            'side': None
+            'status': order['status'],
+            'price': order['price'],
+            'amount': order['amount'],
+            'filled': order['filled'],
+            'remaining': order['amount'] - order['filled'],
+            'side': order['side']
         }
 
-    async def cancel_order(self, order_id, symbol, params=None):
-        # 检查是否已成交
-        for trade in self.trades:
-            if str(trade.get('order_id')) == str(order_id):
-                return {
-                    'id': order_id,
-                    'status': 'closed',
-                    'price': trade['price'],
-                    'filled': trade['amount'],
-                    'side': trade['side']
-                }
-        # 未找到则视为已取消
-        return {
-            'id': order_id,
-            'status': 'canceled',
-            'price': None,
-            'filled': 0,
-            'side': None
-        } 
\ No newline at end of file
+    async def fetch_order(self, order_id, symbol=None, params=None):
+        return self._order_status(order_id)
+
+    async def fetch_open_orders(self, symbol=None):
+        return [self._order_status(order_id) for order_id in self._open_order_ids]
+
+    async def cancel_order(self, order_id, symbol=None, params=None):
+        # 撤销挂单：保留已成交部分，释放剩余冻结资金；已成交订单返回成交状态
+        order = self._orders_by_id.get(str(order_id))
+        if order is not None and order['status'] == 'open':
+            order['status'] = 'canceled'
+            self._open_order_ids.pop(order['id'], None)
+            if order['reserved']:
+                self.ledger.lock(self.quote if order['side'] == 'buy' else self.base, -order['reserved'])
+                order['reserved'] = 0.0
+        return self._order_status(order_id)
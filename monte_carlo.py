@@ -0,0 +1,128 @@
+import csv
+import logging
+import os
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional
+from kline_store import KlineSeries, SharedKlineArray
+from vectorized_backtest import VectorizedBacktester
+from parameter_sweep import build_config
+
+# 工作进程映射的共享内存K线（KlineSeries 零拷贝视图，进程内不复制）
+_worker_shared = None
+_worker_klines = None
+
+
+def block_bootstrap_path(klines: np.ndarray, block_size: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    对K线（(N, 5+) 数组或 KlineSeries）做块自助重采样生成一条新的 (N, 5) 价格路径（向量化）。
+    以长度 block_size 的连续K线块（保留波动率聚集）为单位随机抽取收盘对数收益率，
+    每根K线的开/高/低/收按其相对前一收盘价的比例整体缩放到新路径上，因此
+    high >= max(open, close) >= min(open, close) >= low 仍然成立。
+    时间戳沿用原数据，第一根K线保持不变。
+    """
+    columns = _ohlc_columns(klines)
+    closes = columns[4]
+    n = len(closes)
+    path = np.empty((n, 5))
+    path[:, 0] = columns[0]
+    if n < 2:
+        for j in range(1, 5):
+            path[:, j] = columns[j]
+        return path
+    block_size = max(1, min(int(block_size), n - 1))
+    # 可抽取的块起点：收益率索引 1..n-block_size
+    starts = rng.integers(1, n - block_size + 1, size=-(-(n - 1) // block_size))
+    source = (starts[:, None] + np.arange(block_size)).ravel()[:n - 1]
+    log_returns = np.log(closes[source] / closes[source - 1])
+    new_closes = closes[0] * np.exp(np.cumsum(log_returns))
+    scale = np.r_[closes[0], new_closes[:-1]] / closes[source - 1]
+    for j in range(1, 5):
+        path[0, j] = columns[j][0]
+        path[1:, j] = columns[j][source] * scale
+    return path
+
+
+def _ohlc_columns(klines):
+    """返回 (timestamp, open, high, low, close) 列；KlineSeries 直接取零拷贝列视图"""
+    if isinstance(klines, KlineSeries):
+        return tuple(klines.column(name) for name in ('timestamp', 'open', 'high', 'low', 'close'))
+    data = np.asarray(klines, dtype=np.float64)
+    return tuple(data[:, j] for j in range(5))
+
+
+def path_seeds(n_paths: int, seed: Optional[int] = None) -> Iterator[np.random.SeedSequence]:
+    """每条路径一个独立的随机种子，路径在工作进程中按需生成，不在主进程中物化"""
+    return iter(np.random.SeedSequence(seed).spawn(n_paths))
+
+
+def _init_worker(descriptor: Dict[str, Any]):
+    global _worker_shared, _worker_klines
+    logging.getLogger().setLevel(logging.ERROR)
+    _worker_shared = SharedKlineArray.attach(descriptor)
+    _worker_klines = _worker_shared.series()
+
+
+def _run_path(args):
+    index, seed, params, initial_balance, block_size = args
+    start = time.perf_counter()
+    path = block_bootstrap_path(_worker_klines, block_size, np.random.default_rng(seed))
+    config = build_config(params)
+    result = VectorizedBacktester(path, config, initial_balance=initial_balance).run()
+    return {
+        'path': index,
+        'final_pnl': result['final_equity'] - result['initial_equity'],
+        'max_drawdown': result['max_drawdown'],
+        'trade_count': len(result['trades']),
+        'final_price': float(path[-1, 4]),
+        'runtime': time.perf_counter() - start,
+    }
+
+
+def summarize_paths(rows: List[Dict[str, Any]], max_drawdown_limit: float) -> Dict[str, Any]:
+    """汇总各路径的最终盈亏和最大回撤分布，以及亏损概率和触及最大回撤限制的概率"""
+    pnl = np.array([row['final_pnl'] for row in rows], dtype=np.float64)
+    drawdown = np.array([row['max_drawdown'] for row in rows], dtype=np.float64)
+    percentiles = (5, 25, 50, 75, 95)
+    if not len(pnl):
+        return {'paths': 0}
+    return {
+        'paths': len(rows),
+        'pnl_mean': float(pnl.mean()),
+        'pnl_std': float(pnl.std()),
+        'pnl_percentiles': {p: float(v) for p, v in zip(percentiles, np.percentile(pnl, percentiles))},
+        'max_drawdown_mean': float(drawdown.mean()),
+        'max_drawdown_percentiles': {p: float(v) for p, v in zip(percentiles, np.percentile(drawdown, percentiles))},
+        'prob_loss': float(np.mean(pnl < 0)),
+        'max_drawdown_limit': max_drawdown_limit,
+        'prob_max_drawdown_breach': float(np.mean(drawdown <= max_drawdown_limit)),
+    }
+
+
+def run_monte_carlo(kline_path: str, n_paths: int, block_size: int = 24 * 7, params: Dict[str, Any] = None,
+                    initial_balance: Dict[str, float] = None, workers: int = None, seed: Optional[int] = None) -> Dict[str, Any]:
+    """
+    蒙特卡洛稳健性分析：对原始K线做 n_paths 次块自助重采样，在进程池中并行回测每条路径。
+    原始K线只读取一次并放入共享内存；各路径由独立种子在工作进程中生成，回测完即丢弃。
+    params 为配置覆盖（同参数扫描），最大回撤限制取 RISK_PARAMS['max_drawdown']。
+    同一 seed 的结果可复现。
+    """
+    params = dict(params or {})
+    workers = workers or os.cpu_count() or 1
+    tasks = ((i, child, params, initial_balance, block_size) for i, child in enumerate(path_seeds(n_paths, seed)))
+    with SharedKlineArray.from_file(kline_path) as shared, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(shared.descriptor,)) as executor:
+        rows = list(executor.map(_run_path, tasks, chunksize=max(1, n_paths // (workers * 4))))
+    limit = build_config(params).RISK_PARAMS['max_drawdown']
+    return {'paths': rows, 'summary': summarize_paths(rows, limit)}
+
+
+def write_monte_carlo_results(rows: List[Dict[str, Any]], output_path: str):
+    """逐路径结果写入CSV：path, final_pnl, max_drawdown, trade_count, final_price, runtime"""
+    with open(output_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['path', 'final_pnl', 'max_drawdown', 'trade_count', 'final_price', 'runtime'])
+        for row in rows:
+            writer.writerow([row['path'], f"{row['final_pnl']:.6f}", f"{row['max_drawdown']:.6f}", row['trade_count'],
+                             f"{row['final_price']:.6f}", f"{row['runtime']:.4f}"])
@@ -19,23 +19,27 @@ class OrderThrottler:
         return True
 
 class OrderTracker:
-    def __init__(self):
+    def __init__(self, persist: bool = True):
+        """persist=False 时交易历史只保存在内存中，不读写 data 目录（用于进程内批量回测）"""
         self.logger = logging.getLogger(self.__class__.__name__)
+        self.persist = persist
         self.data_dir = os.path.join(os.path.dirname(__file__), 'data')
-        if not os.path.exists(self.data_dir):
-            os.makedirs(self.data_dir)
         self.history_file = os.path.join(self.data_dir, 'trade_history.json')
         self.backup_file = os.path.join(self.data_dir, 'trade_history.backup.json')
         self.archive_dir = os.path.join(self.data_dir, 'archives')
-        if not os.path.exists(self.archive_dir):
-            os.makedirs(self.archive_dir)
+        if persist:
+            if not os.path.exists(self.data_dir):
+                os.makedirs(self.data_dir)
+            if not os.path.exists(self.archive_dir):
+                os.makedirs(self.archive_dir)
         self.max_archive_months = 12
         self.order_states = {}
         self.trade_count = 0
         self.orders = {}
         self.trade_history = []
-        self.load_trade_history()
-        self.clean_old_archives()
+        if persist:
+            self.load_trade_history()
+            self.clean_old_archives()
     
     def log_order(self, order):
         self.order_states[order['id']] = {
@@ -80,6 +84,8 @@ class OrderTracker:
 
     def save_trade_history(self):
         """将当前交易历史保存到文件"""
+        if not self.persist:
+            return
         try:
             # 先备份当前文件
             self.backup_history()
@@ -138,6 +144,8 @@ class OrderTracker:
         self.trade_history.append(trade)
         if len(self.trade_history) > 100:
             self.trade_history = self.trade_history[-100:]
+        if not self.persist:
+            return
         try:
             # 先备份当前文件
             self.backup_history()
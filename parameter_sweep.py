@@ -0,0 +1,138 @@
+import csv
+import json
+import os
+import time
+import itertools
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List
+from config import TradingConfig
+from vectorized_backtest import VectorizedBacktester
+from kline_store import SharedKlineArray
+from feature_store import FeatureStore
+from batch_backtest import BatchBacktester
+
+# 参数网格中允许的键（除 TradingConfig 已有属性外）
+EXTRA_SWEEP_KEYS = ('FLIP_THRESHOLD', 'VOLATILITY_RANGES', 'S1_LOOKBACK', 'S1_SELL_TARGET_PCT', 'S1_BUY_TARGET_PCT')
+
+# 参数优化目标：由 (总盈亏, 最大回撤) 计算得分，越大越好
+OPTIMIZATION_OBJECTIVES = {
+    'total_pnl': lambda pnl, drawdown: pnl,
+    'pnl_drawdown': lambda pnl, drawdown: pnl / max(-drawdown, 1e-4),
+}
+
+# 工作进程映射的共享内存K线（整个进程池只有一份数据）及其预计算特征
+_worker_shared = None
+_worker_klines = None
+_worker_features = None
+
+
+def load_param_grid(grid_path: str) -> Dict[str, List[Any]]:
+    """读取参数网格JSON文件: {参数名: [候选值, ...]}"""
+    if not os.path.exists(grid_path):
+        raise FileNotFoundError(f"参数网格文件不存在: {grid_path}")
+    with open(grid_path, 'r', encoding='utf-8') as f:
+        grid = json.load(f)
+    if not isinstance(grid, dict) or not grid:
+        raise ValueError("参数网格需为非空JSON对象: {参数名: [候选值, ...]}")
+    return grid
+
+
+def expand_param_grid(grid: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    """将参数网格展开为参数组合列表（笛卡尔积，保持键的顺序）"""
+    for key, values in grid.items():
+        if key not in EXTRA_SWEEP_KEYS and not hasattr(TradingConfig, key):
+            raise ValueError(f"未知的扫描参数: {key}")
+        if not isinstance(values, list) or not values:
+            raise ValueError(f"扫描参数 {key} 的候选值需为非空列表")
+    keys = list(grid.keys())
+    return [dict(zip(keys, combo)) for combo in itertools.product(*(grid[k] for k in keys))]
+
+
+def build_config(params: Dict[str, Any]) -> TradingConfig:
+    """
+    按参数组合构造回测配置。
+    FLIP_THRESHOLD 取值为网格大小的比例（默认0.2，即网格的1/5），
+    VOLATILITY_RANGES 替换 GRID_PARAMS['volatility_threshold']['ranges']。
+    """
+    config = TradingConfig()
+    for key, value in params.items():
+        if key == 'FLIP_THRESHOLD':
+            ratio = float(value)
+            config.FLIP_THRESHOLD = lambda grid_size, ratio=ratio: grid_size * ratio / 100
+        elif key == 'VOLATILITY_RANGES':
+            config.GRID_PARAMS['volatility_threshold']['ranges'] = value
+        else:
+            setattr(config, key, value)
+    return config
+
+
+def _init_worker(descriptor: Dict[str, Any], features: Dict[str, Any]):
+    global _worker_shared, _worker_klines, _worker_features
+    logging.getLogger().setLevel(logging.ERROR)
+    _worker_shared = SharedKlineArray.attach(descriptor)
+    _worker_klines = _worker_shared.series()
+    _worker_features = FeatureStore.from_klines(_worker_klines, **features)
+
+
+def _run_point(args):
+    params, initial_balance = args
+    start = time.perf_counter()
+    result = VectorizedBacktester(_worker_klines, build_config(params), initial_balance=initial_balance,
+                                  features=_worker_features).run()
+    return {
+        'params': params,
+        'total_pnl': result['final_equity'] - result['initial_equity'],
+        'max_drawdown': result['max_drawdown'],
+        'trade_count': len(result['trades']),
+        'runtime': time.perf_counter() - start,
+    }
+
+
+def _run_batch(args):
+    batch, initial_balance = args
+    start = time.perf_counter()
+    result = BatchBacktester(_worker_klines, [build_config(params) for params in batch],
+                             initial_balance=initial_balance, record_equity=False, features=_worker_features).run()
+    runtime = (time.perf_counter() - start) / len(batch)
+    return [{
+        'params': params,
+        'total_pnl': float(result['final_equity'][j]) - result['initial_equity'],
+        'max_drawdown': float(result['max_drawdown'][j]),
+        'trade_count': int(result['trade_count'][j]),
+        'runtime': runtime,
+    } for j, params in enumerate(batch)]
+
+
+def run_sweep(kline_path: str, grid: Dict[str, List[Any]], initial_balance: Dict[str, float] = None,
+              workers: int = None, batch_size: int = 1) -> List[Dict[str, Any]]:
+    """
+    在进程池中并行运行参数扫描。K线文件只在主进程读取一次并放入共享内存，
+    各工作进程按名称映射同一份数据（零拷贝），内存占用与进程数无关；扫描结束后释放共享内存。
+    batch_size > 1 时每个任务用 BatchBacktester 同时回测一批参数组合（runtime 为批内平均耗时）。
+    各组合用到的波动率、S1高低点等特征在主进程按数据集计算（或读取）一次并持久化，工作进程直接读取。
+    返回与参数组合顺序一致的结果列表。
+    """
+    points = expand_param_grid(grid)
+    workers = workers or os.cpu_count() or 1
+    with SharedKlineArray.from_file(kline_path) as shared:
+        features = FeatureStore.for_file(kline_path, shared.series()).prepare(build_config(params) for params in points)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(shared.descriptor, features.descriptor)) as executor:
+            if batch_size > 1:
+                tasks = [(points[i:i + batch_size], initial_balance) for i in range(0, len(points), batch_size)]
+                return [row for rows in executor.map(_run_batch, tasks) for row in rows]
+            chunksize = max(1, len(points) // (workers * 4))
+            tasks = [(params, initial_balance) for params in points]
+            return list(executor.map(_run_point, tasks, chunksize=chunksize))
+
+
+def write_sweep_results(results: List[Dict[str, Any]], output_path: str):
+    """将扫描结果写入CSV：参数列 + total_pnl, max_drawdown, trade_count, runtime"""
+    param_keys = list(results[0]['params'].keys()) if results else []
+    with open(output_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(param_keys + ['total_pnl', 'max_drawdown', 'trade_count', 'runtime'])
+        for row in results:
+            values = [json.dumps(v) if isinstance(v, (list, dict)) else v for v in (row['params'][k] for k in param_keys)]
+            writer.writerow(values + [f"{row['total_pnl']:.6f}", f"{row['max_drawdown']:.6f}", row['trade_count'], f"{row['runtime']:.4f}"])
@@ -0,0 +1,154 @@
+import csv
+import heapq
+import logging
+from typing import Any, Dict, Optional
+from config import TradingConfig
+from trader import GridTrader
+from iexchange_client import BarClock
+from mock_exchange_client import AccountLedger, MockExchangeClient
+from backtest_metrics import EquityRecorder, compute_metrics
+
+
+class PortfolioBacktester:
+    """
+    多交易对组合回测：多个K线文件按时间戳对齐同步回放，每个交易对运行一个网格策略，
+    所有交易对共享同一个计价币账户（AccountLedger），各自在对应的虚拟交易对上撮合订单。
+    K线流按 (下一根K线时间戳, 交易对) 用堆归并，总开销与K线总数成正比，与交易对数量无关。
+    单个交易对的回放顺序与单交易对回测一致：最后一根K线不再执行策略。
+    """
+
+    def __init__(self, kline_paths: Dict[str, str], initial_balance: Optional[Dict[str, float]] = None,
+                 configs: Optional[Dict[str, Any]] = None, fee_rate: float = 0.001, **client_kwargs):
+        if not kline_paths:
+            raise ValueError("组合回测至少需要一个交易对")
+        if client_kwargs.get('intrabar'):
+            raise ValueError("组合回测不支持K线内价格路径模式")
+        self.symbols = list(kline_paths)
+        quotes = {symbol.split('/')[1] if '/' in symbol else 'USDT' for symbol in self.symbols}
+        if len(quotes) != 1:
+            raise ValueError(f"组合回测的交易对需使用同一计价币: {sorted(quotes)}")
+        self.quote = quotes.pop()
+        self.bases = {symbol: symbol.split('/')[0] if '/' in symbol else 'BNB' for symbol in self.symbols}
+        balance = initial_balance or {self.quote: 10000.0}
+        assets = [self.quote] + [base for base in self.bases.values() if base != self.quote]
+        self.ledger = AccountLedger({asset: float(balance.get(asset, 0.0)) for asset in assets},
+                                    {asset: 0.0 for asset in assets})
+        # 所有交易对共用组合时钟（当前归并到的时间戳）
+        self.current_timestamp = 0
+        self.clock = BarClock(lambda: self.current_timestamp)
+        self.exchanges = {}
+        for symbol, path in kline_paths.items():
+            exchange = MockExchangeClient(path, fee_rate=fee_rate, symbol=symbol, ledger=self.ledger, **client_kwargs)
+            exchange.clock = self.clock
+            self.exchanges[symbol] = exchange
+        starts = [exchange.kline_data[0][0] for exchange in self.exchanges.values() if exchange._has_bar(0)]
+        self.current_timestamp = min(starts) if starts else 0
+        self.traders = {}
+        for symbol in self.symbols:
+            config = (configs or {}).get(symbol) or TradingConfig()
+            config.SYMBOL = symbol
+            # 各交易对的成交历史只保存在内存中：不写入实盘的 data/trade_history.json，凯利仓位也不混用其他交易对的成交
+            config.PERSIST_TRADE_HISTORY = False
+            self.traders[symbol] = GridTrader(self.exchanges[symbol], config)
+        capacity = 0
+        for exchange in self.exchanges.values():
+            capacity += exchange.total_ticks or 1024
+        self.portfolio_recorder = EquityRecorder(capacity)
+        self.symbol_recorders = {symbol: EquityRecorder(capacity) for symbol in self.symbols}
+        # 各交易对成交带来的计价币净现金流（买入为负，卖出为正，已扣手续费）
+        self._cash_flow = {symbol: 0.0 for symbol in self.symbols}
+        self._trades_seen = {symbol: 0 for symbol in self.symbols}
+        self.steps = 0
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def _asset_total(self, asset: str) -> float:
+        ledger = self.ledger
+        return ledger.spot_balance(asset) + ledger.locked_balance(asset) + ledger.savings_balance(asset)
+
+    def _price(self, symbol: str, started: bool) -> float:
+        # 未开始回放的交易对按首根K线开盘价计价
+        k = self.exchanges[symbol].kline_data[self.exchanges[symbol].kline_index]
+        return float(k[4] if started else k[1])
+
+    def _record_equity(self, started):
+        for symbol in self.symbols:
+            trades = self.exchanges[symbol].trades
+            for trade in trades[self._trades_seen[symbol]:]:
+                if trade['side'] == 'buy':
+                    self._cash_flow[symbol] -= trade['cost'] + trade['fee']
+                else:
+                    self._cash_flow[symbol] += trade['cost'] - trade['fee']
+            self._trades_seen[symbol] = len(trades)
+        total = self._asset_total(self.quote)
+        for symbol in self.symbols:
+            value = self._asset_total(self.bases[symbol]) * self._price(symbol, symbol in started)
+            total += value
+            self.symbol_recorders[symbol].record(self.steps, self.current_timestamp, value + self._cash_flow[symbol])
+        self.portfolio_recorder.record(self.steps, self.current_timestamp, total)
+        self.steps += 1
+
+    async def run(self) -> Dict[str, Any]:
+        heap = [(exchange.kline_data[0][0], i, symbol) for i, (symbol, exchange) in enumerate(self.exchanges.items())
+                if exchange._has_bar(0)]
+        heapq.heapify(heap)
+        started = set()
+        initial_equity = None
+        while heap:
+            timestamp = heap[0][0]
+            self.current_timestamp = timestamp
+            arrived = []
+            while heap and heap[0][0] == timestamp:
+                arrived.append(heapq.heappop(heap)[1:])
+            # 先把同一时间戳的交易对推进到新K线，再依次执行策略
+            for _, symbol in arrived:
+                if symbol in started:
+                    await self.exchanges[symbol].next()
+                else:
+                    started.add(symbol)
+                    await self.traders[symbol].initialize()
+            if initial_equity is None:
+                initial_equity = self._asset_total(self.quote) + sum(
+                    self._asset_total(self.bases[symbol]) * self._price(symbol, symbol in started) for symbol in self.symbols)
+            for i, symbol in arrived:
+                exchange = self.exchanges[symbol]
+                if exchange.has_next():
+                    await self.traders[symbol].step_once()
+                    heapq.heappush(heap, (exchange.kline_data[exchange.kline_index + 1][0], i, symbol))
+            self._record_equity(started)
+        self.initial_equity = initial_equity or 0.0
+        for exchange in self.exchanges.values():
+            await exchange.close()
+        return self.result()
+
+    def result(self) -> Dict[str, Any]:
+        """组合与各交易对的资金曲线、绩效指标和成交记录"""
+        recorder = self.portfolio_recorder
+        trades = [trade for exchange in self.exchanges.values() for trade in exchange.trades]
+        symbols = {}
+        for symbol in self.symbols:
+            equity = self.symbol_recorders[symbol].equity
+            symbol_trades = self.exchanges[symbol].trades
+            symbols[symbol] = {
+                'equity_curve': equity,
+                'pnl': float(equity[-1] - equity[0]) if len(equity) else 0.0,
+                'trade_count': len(symbol_trades),
+                'total_fees': sum(trade['fee'] for trade in symbol_trades),
+                'trades': symbol_trades,
+            }
+        return {
+            'timestamps': recorder.timestamps,
+            'equity_curve': recorder.equity,
+            'metrics': compute_metrics(recorder.timestamps, recorder.equity, trades, getattr(self, 'initial_equity', None)),
+            'symbols': symbols,
+        }
+
+    def export_equity_curve_to_csv(self, file_path: str):
+        """导出组合及各交易对资金曲线：timestamp, portfolio, <交易对>..."""
+        recorder = self.portfolio_recorder
+        columns = [recorder.timestamps.tolist(), recorder.equity.tolist()] + \
+                  [self.symbol_recorders[symbol].equity.tolist() for symbol in self.symbols]
+        with open(file_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['timestamp', 'portfolio'] + self.symbols)
+            writer.writerows(zip(*columns))
+        return True
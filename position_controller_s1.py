@@ -1,15 +1,29 @@
 # position_controller_s1.py
-import time
 import asyncio
 import logging
 import math # 需要 math 来处理精度
+from strategy_core import S1Core
+
+
+def _s1_core_attribute(name):
+    """S1参数和高低点保存在 S1Core 中，控制器上保持原有的属性访问方式"""
+    return property(lambda self: getattr(self.s1_core, name),
+                    lambda self, value: setattr(self.s1_core, name, value))
+
 
 class PositionControllerS1:
     """
     独立的仓位控制策略 (S1)。
     基于每日更新的52日高低点，高频检查仓位并执行调整。
     独立于主网格策略运行，不修改网格的 base_price。
+    判断规则由 S1Core 同步计算，本类负责获取日线/账户数据和下单。
     """
+    s1_lookback = _s1_core_attribute('lookback')
+    s1_sell_target_pct = _s1_core_attribute('sell_target_pct')
+    s1_buy_target_pct = _s1_core_attribute('buy_target_pct')
+    s1_daily_high = _s1_core_attribute('daily_high')
+    s1_daily_low = _s1_core_attribute('daily_low')
+
     def __init__(self, trader_instance):
         """
         初始化S1仓位控制器。
@@ -22,15 +36,10 @@ class PositionControllerS1:
         self.config = trader_instance.config # 访问配置
         self.logger = logging.getLogger(self.__class__.__name__) # 创建独立的 logger
 
-        # S1 策略参数 (从配置或直接赋值)
-        # 确保这些参数在你的 config.py 或 trader_instance 中可访问
-        self.s1_lookback = getattr(self.config, 'S1_LOOKBACK', 52)
-        self.s1_sell_target_pct = getattr(self.config, 'S1_SELL_TARGET_PCT', 0.50)
-        self.s1_buy_target_pct = getattr(self.config, 'S1_BUY_TARGET_PCT', 0.70)
+        # S1 策略参数（S1_LOOKBACK、S1_SELL_TARGET_PCT、S1_BUY_TARGET_PCT）和日线高低点
+        self.s1_core = S1Core(self.config)
 
         # S1 状态变量
-        self.s1_daily_high = None
-        self.s1_daily_low = None
         self.s1_last_data_update_ts = 0
         # 每日更新时间间隔（秒），略小于24小时确保不会错过
         self.daily_update_interval = 23.9 * 60 * 60 
@@ -40,6 +49,17 @@ class PositionControllerS1:
     async def _fetch_and_calculate_s1_levels(self):
         """获取日线数据并计算52日高低点"""
         try:
+            levels = self.trader._precomputed_feature('s1_levels', lookback=self.s1_lookback)
+            if levels is not None:
+                # 回测特征库中按当前K线预计算的高低点
+                if math.isnan(levels[0]):
+                    self.logger.warning(f"S1: Not enough relevant klines for lookback {self.s1_lookback}.")
+                    return False
+                self.s1_daily_high, self.s1_daily_low = float(levels[0]), float(levels[1])
+                self.s1_last_data_update_ts = self.trader.clock.time()
+                self.logger.info(f"S1 Levels Updated: High={self.s1_daily_high:.4f}, Low={self.s1_daily_low:.4f}")
+                return True
+
             # 获取比回看期稍多的日线数据 (+2 buffer)
             limit = self.s1_lookback + 2
             klines = await self.trader.exchange.fetch_ohlcv(
@@ -53,17 +73,12 @@ class PositionControllerS1:
                 return False
 
             # 使用倒数第2根K线往前数 s1_lookback 根来计算 (排除最新未完成K线)
-            # klines[-1] 是当前未完成日线，klines[-2] 是昨天收盘的日线
-            relevant_klines = klines[-(self.s1_lookback + 1) : -1]
-
-            if len(relevant_klines) < self.s1_lookback:
-                 self.logger.warning(f"S1: Not enough relevant klines ({len(relevant_klines)}) for lookback {self.s1_lookback}.")
+            if not self.s1_core.update_levels(klines):
+                 relevant_count = len(klines[-(self.s1_lookback + 1) : -1])
+                 self.logger.warning(f"S1: Not enough relevant klines ({relevant_count}) for lookback {self.s1_lookback}.")
                  return False
 
-            # 计算高低点 (索引 2 是 high, 3 是 low)
-            self.s1_daily_high = max(float(k[2]) for k in relevant_klines)
-            self.s1_daily_low = min(float(k[3]) for k in relevant_klines)
-            self.s1_last_data_update_ts = time.time()
+            self.s1_last_data_update_ts = self.trader.clock.time()
             self.logger.info(f"S1 Levels Updated: High={self.s1_daily_high:.4f}, Low={self.s1_daily_low:.4f}")
             return True
 
@@ -73,7 +88,7 @@ class PositionControllerS1:
 
     async def update_daily_s1_levels(self):
         """每日检查并更新一次S1所需的52日高低价"""
-        now = time.time()
+        now = self.trader.clock.time()
         if now - self.s1_last_data_update_ts >= self.daily_update_interval:
             self.logger.info("S1: Time to update daily high/low levels...")
             await self._fetch_and_calculate_s1_levels()
@@ -92,7 +107,7 @@ class PositionControllerS1:
                 adjusted_amount = self.trader._adjust_amount_precision(amount_bnb)
             else:
                 # 如果没有，提供一个基础实现 (根据需要调整精度)
-                precision = 3 
+                precision = getattr(self.config, 'AMOUNT_PRECISION', 3)
                 factor = 10 ** precision
                 adjusted_amount = math.floor(amount_bnb * factor) / factor
                 self.logger.warning("S1: Using basic amount precision adjustment.")
@@ -126,7 +141,7 @@ class PositionControllerS1:
             if side == 'BUY':
                 # 检查USDT余额是否足够
                 usdt_needed = adjusted_amount * current_price
-                usdt_available = await self.trader.get_available_balance('USDT')
+                usdt_available = await self.trader.get_available_balance(self.trader.quote_asset)
                 
                 if usdt_available < usdt_needed:
                     self.logger.info(f"S1: USDT余额不足，需要{usdt_needed:.2f}，可用{usdt_available:.2f}，尝试从理财赎回")
@@ -136,7 +151,7 @@ class PositionControllerS1:
                         try:
                             await self.trader._pre_transfer_funds(current_price)
                             # 重新检查余额
-                            usdt_available = await self.trader.get_available_balance('USDT')
+                            usdt_available = await self.trader.get_available_balance(self.trader.quote_asset)
                             if usdt_available < usdt_needed:
                                 self.logger.warning(f"S1: 即使赎回后，USDT余额仍不足，可用{usdt_available:.2f}")
                                 return False
@@ -149,7 +164,7 @@ class PositionControllerS1:
                     
             elif side == 'SELL':
                 # 检查BNB余额是否足够
-                if adjusted_amount > await self.trader.get_available_balance('BNB'):
+                if adjusted_amount > await self.trader.get_available_balance(self.trader.base_asset):
                     self.logger.warning(f"S1: BNB余额不足，无法执行卖出操作")
                     return False
 
@@ -168,7 +183,7 @@ class PositionControllerS1:
             # 6. （可选）更新交易记录器 (如果希望S1交易也记录在案)
             if hasattr(self.trader, 'order_tracker'):
                  trade_info = {
-                     'timestamp': time.time(),
+                     'timestamp': self.trader.clock.time(),
                      'strategy': 'S1', # 标记来源
                      'side': side,
                      'price': float(order.get('average', current_price)), # 使用成交均价或市价
@@ -206,18 +221,18 @@ class PositionControllerS1:
             self.logger.debug("S1: Daily high/low levels not available yet.")
             return # 等待下次数据更新
 
+        current_price = self.trader.current_price
+        if not current_price or current_price <= 0:
+            self.logger.warning("S1: Invalid current price from trader.")
+            return
+
         # 1. 获取当前状态 (通过 trader 实例)
         try:
-            current_price = self.trader.current_price
-            if not current_price or current_price <= 0:
-                self.logger.warning("S1: Invalid current price from trader.")
-                return
-
             # 使用风控管理器的仓位计算方法
             position_pct = await self.trader.risk_manager._get_position_ratio()
             position_value = await self.trader.risk_manager._get_position_value()
             total_assets = await self.trader._get_total_assets()
-            bnb_balance = await self.trader.get_available_balance('BNB') # 获取可用 BNB
+            bnb_balance = await self.trader.get_available_balance(self.trader.base_asset) # 获取可用 BNB
 
             if total_assets <= 0:
                 self.logger.warning("S1: Invalid total assets value.")
@@ -227,36 +242,18 @@ class PositionControllerS1:
             self.logger.error(f"S1: Failed to get current state: {e}")
             return
 
-        # 2. 判断 S1 条件
-        s1_action = 'NONE'
-        s1_trade_amount_bnb = 0
-
-        # 高点检查
-        if current_price > self.s1_daily_high and position_pct > self.s1_sell_target_pct:
-            s1_action = 'SELL'
-            target_position_value = total_assets * self.s1_sell_target_pct
-            sell_value_needed = position_value - target_position_value
-            # 确保不会卖出负数或零 (以防万一)
-            if sell_value_needed > 0:
-                s1_trade_amount_bnb = min(sell_value_needed / current_price, bnb_balance)
+        # 2. 判断 S1 条件（价格在高低点之间时不调仓）
+        if not self.s1_core.may_act(current_price):
+            return
+        action = self.s1_core.decide(current_price, position_pct, position_value, total_assets, bnb_balance)
+
+        # 3. 如果触发，执行 S1 调仓
+        if action is not None:
+            s1_action, s1_trade_amount_bnb = action
+            if s1_action == 'SELL':
                 self.logger.info(f"S1: High level breached. Need to SELL {s1_trade_amount_bnb:.8f} BNB to reach {self.s1_sell_target_pct*100:.0f}% target.")
             else:
-                s1_action = 'NONE' # 重置，因为计算结果无效
-
-        # 低点检查 (用 elif 避免同时触发)
-        elif current_price < self.s1_daily_low and position_pct < self.s1_buy_target_pct:
-            s1_action = 'BUY'
-            target_position_value = total_assets * self.s1_buy_target_pct
-            buy_value_needed = target_position_value - position_value
-            # 确保不会买入负数或零
-            if buy_value_needed > 0:
-                s1_trade_amount_bnb = buy_value_needed / current_price
                 self.logger.info(f"S1: Low level breached. Need to BUY {s1_trade_amount_bnb:.8f} BNB to reach {self.s1_buy_target_pct*100:.0f}% target.")
-            else:
-                s1_action = 'NONE' # 重置
-
-        # 3. 如果触发，执行 S1 调仓
-        if s1_action != 'NONE' and s1_trade_amount_bnb > 1e-9: # 加个极小值判断
             self.logger.info(f"S1: Condition met for {s1_action} adjustment.")
             await self._execute_s1_adjustment(s1_action, s1_trade_amount_bnb)
             # 注意：这里不等待执行结果，执行函数内部处理日志和错误
@@ -0,0 +1,142 @@
+import os
+import glob
+import gzip
+import json
+import pickle
+import hashlib
+import logging
+import types
+from typing import Any, Dict, Optional
+from config import FLIP_THRESHOLD
+
+# 缓存条目格式变化时递增
+RESULT_CACHE_VERSION = 1
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_code_version: Optional[str] = None
+
+
+def code_version() -> str:
+    """策略与回测代码的版本：包目录下全部 .py 源文件内容的 SHA-256（前16位），修改任一模块后缓存自动失效"""
+    global _code_version
+    if _code_version is None:
+        digest = hashlib.sha256()
+        for path in sorted(glob.glob(os.path.join(PACKAGE_DIR, '*.py'))):
+            digest.update(os.path.basename(path).encode('utf-8'))
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+        _code_version = digest.hexdigest()[:16]
+    return _code_version
+
+
+def _stable(value):
+    """把配置值转换为可稳定序列化的形式；函数（如 FLIP_THRESHOLD）按字节码、常量、默认参数和闭包取值"""
+    if isinstance(value, types.CodeType):
+        return {'code': value.co_code.hex(), 'consts': _stable(list(value.co_consts)), 'names': list(value.co_names)}
+    if callable(value):
+        code = getattr(value, '__code__', None)
+        if code is None:
+            return repr(value)
+        closure = [cell.cell_contents for cell in (value.__closure__ or ())]
+        return {'code': _stable(code), 'defaults': _stable(list(value.__defaults__ or ())), 'closure': _stable(closure)}
+    if isinstance(value, dict):
+        return {str(k): _stable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_stable(v) for v in value]
+    if value is None or isinstance(value, (bool, int, str)):
+        return value
+    return repr(value)
+
+
+def effective_config(config) -> Dict[str, Any]:
+    """回测实际使用的配置：TradingConfig 的全部大写属性（类属性 + 实例覆盖）及生效的 FLIP_THRESHOLD"""
+    values = {name: getattr(config, name) for name in dir(config) if name.isupper()}
+    values['FLIP_THRESHOLD'] = getattr(config, 'FLIP_THRESHOLD', FLIP_THRESHOLD)
+    return _stable(values)
+
+
+def backtest_fingerprint(dataset_key: str, config, **options) -> str:
+    """回测请求指纹：数据集内容哈希 + 生效配置 + 回测选项（初始余额、撮合模式等）+ 代码版本"""
+    payload = {
+        'version': RESULT_CACHE_VERSION,
+        'code': code_version(),
+        'dataset': dataset_key,
+        'config': effective_config(config),
+        'options': _stable(options),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class BacktestResultCache:
+    """
+    本地磁盘上的回测结果缓存：以 backtest_fingerprint 为键，每个结果（成交、资金曲线、绩效指标等）
+    保存为一个 gzip 压缩的 pickle 文件。命中时更新文件修改时间，写入后按修改时间淘汰最久未使用的条目，
+    使缓存目录总大小不超过 max_bytes。多进程并发读写安全（先写临时文件再替换，损坏的条目视为未命中）。
+    """
+
+    DEFAULT_DIR = os.path.join(PACKAGE_DIR, 'data', 'backtest_cache')
+    DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir or self.DEFAULT_DIR
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.pkl.gz")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self._path(key)
+        try:
+            with gzip.open(path, 'rb') as f:
+                result = pickle.load(f)
+            os.utime(path)  # 标记为最近使用
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, EOFError, pickle.UnpicklingError) as e:
+            self.logger.warning(f"回测缓存条目损坏，已忽略: {path} ({e})")
+            self.misses += 1
+            return None
+        self.hits += 1
+        return result
+
+    def put(self, key: str, result: Dict[str, Any]):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._path(key)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with gzip.open(tmp_path, 'wb', compresslevel=6) as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            self.logger.warning(f"回测结果写入缓存失败: {e}")
+            return
+        self.evict(keep=path)
+
+    def evict(self, keep: Optional[str] = None):
+        """按修改时间从旧到新删除条目，直到总大小不超过 max_bytes（keep 为刚写入的条目，不删除）"""
+        entries = []
+        for path in glob.glob(os.path.join(self.cache_dir, '*.pkl.gz')):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        for path in glob.glob(os.path.join(self.cache_dir, '*.pkl.gz')):
+            os.remove(path)
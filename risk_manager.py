@@ -58,8 +58,8 @@ class AdvancedRiskManager:
             # print(f"[DEBUG][risk_manager._get_position_ratio] balance: {balance}\nTraceback:\n{''.join(traceback.format_stack(limit=5))}")
             funding_balance = await self.trader.exchange.fetch_funding_balance()
             usdt_balance = (
-                float(balance.get('total', {}).get('USDT', 0)) +
-                float(funding_balance.get('USDT', 0))
+                float(balance.get('total', {}).get(self.trader.quote_asset, 0)) +
+                float(funding_balance.get(self.trader.quote_asset, 0))
             )
             total_assets = position_value + usdt_balance
             if total_assets == 0:
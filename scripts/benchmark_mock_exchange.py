@@ -0,0 +1,54 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import contextlib
+import io
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mock_exchange_client import MockExchangeClient
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='MockExchangeClient 单步开销基准：不同历史成交数量下的每秒步数')
+    parser.add_argument('--trades', type=int, nargs='+', default=[10000, 100000, 1000000], help='预先生成的历史成交数量')
+    parser.add_argument('--steps', type=int, default=20000, help='每档测量的步数')
+    return parser.parse_args()
+
+async def fill_trades(client, count):
+    # 交替买卖小额订单，快速累积历史成交
+    for i in range(count):
+        await client.create_order('BNB/USDT', 'limit', 'buy' if i % 2 == 0 else 'sell', 0.001, 100.0)
+
+async def run_steps(client, steps):
+    # 模拟 GridTrader 每步对交易所的调用：行情、余额、盘口、下单和订单状态查询
+    first_id = client.trades[0]['order_id'] if client.trades else '1'
+    start = time.perf_counter()
+    for i in range(steps):
+        await client.fetch_ticker('BNB/USDT')
+        await client.fetch_balance()
+        await client.fetch_funding_balance()
+        await client.fetch_order_book('BNB/USDT')
+        order = await client.create_order('BNB/USDT', 'limit', 'buy' if i % 2 == 0 else 'sell', 0.001, 100.0)
+        await client.fetch_order(order['id'], 'BNB/USDT')
+        await client.fetch_order(first_id, 'BNB/USDT')
+    return steps / (time.perf_counter() - start)
+
+def main():
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        kline_path = os.path.join(tmpdir, 'kline.json')
+        with open(kline_path, 'w') as f:
+            json.dump([[1609459200000 + i * 3600000, 100.0, 101.0, 99.0, 100.0] for i in range(100)], f)
+        print(f"{'历史成交数':>12} | {'步/秒':>10}")
+        for count in args.trades:
+            client = MockExchangeClient(kline_path, initial_balance={'USDT': 1e9, 'BNB': 1e6})
+            with contextlib.redirect_stdout(io.StringIO()):
+                asyncio.run(fill_trades(client, count))
+            rate = asyncio.run(run_steps(client, args.steps))
+            print(f"{count:>12} | {rate:>10.0f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,21 @@
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from kline_store import convert_json_to_npy
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='将回测JSON K线文件转换为列式.npy文件（内存映射加载）')
+    parser.add_argument('input', type=str, help='输入JSON K线文件，如bnbusdt_1h.json')
+    parser.add_argument('--output', type=str, default=None, help='输出.npy文件名（默认与输入同名）')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    output = args.output or os.path.splitext(args.input)[0] + '.npy'
+    count = convert_json_to_npy(args.input, output)
+    print(f"已转换 {count} 根K线，保存为 {output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+import numpy as np
+from typing import Optional, Sequence, Tuple
+from config import FLIP_THRESHOLD
+
+
+class GridCore:
+    """
+    网格策略状态机（不访问交易所的纯同步计算，实盘/模拟盘/回测共用）：
+    基准价、上下轨、越过上轨后的最高价 / 跌破下轨后的最低价跟踪、反弹/回调阈值触发，
+    以及按波动率分档的网格调整和调整周期。输入为当前价格、时间等行情快照，输出为意图信号，
+    余额检查、下单、理财申赎等IO由 GridTrader 根据信号执行。
+    """
+
+    def __init__(self, config, base_price: Optional[float] = None, grid_size: Optional[float] = None,
+                 last_grid_adjust_time: float = 0.0):
+        self.config = config
+        # 反弹/回调阈值函数，可由配置覆盖（参数扫描使用）
+        self.flip_threshold = getattr(config, 'FLIP_THRESHOLD', FLIP_THRESHOLD)
+        self.base_price = base_price
+        self.grid_size = config.INITIAL_GRID if grid_size is None else grid_size
+        self.highest = None
+        self.lowest = None
+        self.last_grid_adjust_time = last_grid_adjust_time
+
+    def upper_band(self) -> float:
+        return self.base_price * (1 + self.grid_size / 100)
+
+    def lower_band(self) -> float:
+        return self.base_price * (1 - self.grid_size / 100)
+
+    def threshold(self) -> float:
+        return self.flip_threshold(self.grid_size)
+
+    def sell_signal(self, price: float) -> bool:
+        """价格在上轨及以上时跟踪最高价，从最高价回调 threshold 比例时返回 True"""
+        if price < self.upper_band():
+            return False
+        if self.highest is None or price > self.highest:
+            self.highest = price
+        return price <= self.highest * (1 - self.threshold())
+
+    def buy_signal(self, price: float) -> bool:
+        """价格在下轨及以下时跟踪最低价，从最低价反弹 threshold 比例时返回 True"""
+        if price > self.lower_band():
+            return False
+        if self.lowest is None or price < self.lowest:
+            self.lowest = price
+        return price >= self.lowest * (1 + self.threshold())
+
+    def adjust_due(self, now: float) -> bool:
+        """距上次网格调整是否已超过 GRID_PARAMS['adjust_interval']（小时）"""
+        return now - self.last_grid_adjust_time > self.config.GRID_PARAMS.get('adjust_interval', 24) * 3600
+
+    def grid_for_volatility(self, volatility: float) -> float:
+        """按波动率分档表取网格大小（未匹配时用 INITIAL_GRID），并限制在 [min, max] 内"""
+        grid = None
+        for range_config in self.config.GRID_PARAMS['volatility_threshold']['ranges']:
+            if range_config['range'][0] <= volatility < range_config['range'][1]:
+                grid = range_config['grid']
+                break
+        if grid is None:
+            grid = self.config.INITIAL_GRID
+        return max(min(grid, self.config.GRID_PARAMS['max']), self.config.GRID_PARAMS['min'])
+
+    def resize(self, volatility: float) -> bool:
+        """按波动率调整网格大小，返回网格是否变化"""
+        new_grid = self.grid_for_volatility(volatility)
+        if new_grid == self.grid_size:
+            return False
+        self.grid_size = new_grid
+        return True
+
+
+def annualized_volatility(closes: Sequence[float]) -> float:
+    """小时收盘价的对数收益率标准差，按 24*365 年化"""
+    returns = np.diff(np.log(closes))
+    return np.std(returns) * np.sqrt(24 * 365)
+
+
+class S1Core:
+    """
+    S1仓位控制规则（纯同步计算）：由日线计算回看期高低点；价格突破高点且仓位高于卖出目标时
+    卖出到目标仓位，跌破低点且仓位低于买入目标时买入到目标仓位。
+    """
+
+    def __init__(self, config):
+        self.lookback = getattr(config, 'S1_LOOKBACK', 52)
+        self.sell_target_pct = getattr(config, 'S1_SELL_TARGET_PCT', 0.50)
+        self.buy_target_pct = getattr(config, 'S1_BUY_TARGET_PCT', 0.70)
+        self.daily_high = None
+        self.daily_low = None
+
+    def update_levels(self, daily_klines: Sequence[Sequence[float]]) -> bool:
+        """
+        用倒数第2根日线往前 lookback 根（排除最新未完成日线）计算高低点。
+        日线不足时返回 False，保留原有高低点。
+        """
+        if not daily_klines or len(daily_klines) < self.lookback + 1:
+            return False
+        relevant = daily_klines[-(self.lookback + 1):-1]
+        if len(relevant) < self.lookback:
+            return False
+        self.daily_high = max(float(k[2]) for k in relevant)
+        self.daily_low = min(float(k[3]) for k in relevant)
+        return True
+
+    def may_act(self, price: float) -> bool:
+        """高低点已就绪且价格在高低点之外时才可能调仓（不需要读取账户）"""
+        if self.daily_high is None or self.daily_low is None:
+            return False
+        return price > self.daily_high or price < self.daily_low
+
+    def decide(self, price: float, position_pct: float, position_value: float, total_assets: float,
+               base_available: float) -> Optional[Tuple[str, float]]:
+        """按账户快照返回调仓意图 (side, 基础币数量)，不需要调仓时返回 None"""
+        if price > self.daily_high and position_pct > self.sell_target_pct:
+            needed = position_value - total_assets * self.sell_target_pct
+            amount = min(needed / price, base_available) if needed > 0 else 0
+            side = 'SELL'
+        elif price < self.daily_low and position_pct < self.buy_target_pct:
+            needed = total_assets * self.buy_target_pct - position_value
+            amount = needed / price if needed > 0 else 0
+            side = 'BUY'
+        else:
+            return None
+        return (side, amount) if amount > 1e-9 else None
@@ -0,0 +1,128 @@
+import csv
+import json
+import logging
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List
+from config import TradingConfig
+from kline_store import SharedKlineArray
+from feature_store import FeatureStore
+from vectorized_backtest import VectorizedBacktester
+from parameter_sweep import OPTIMIZATION_OBJECTIVES, build_config, expand_param_grid
+
+# 工作进程的回测引擎模板（K线预处理只做一次，各参数组合浅拷贝使用）
+_worker_shared = None
+_worker_engine = None
+
+
+def halving_rungs(n_bars: int, first_fraction: float = 0.2, eta: int = 3) -> List[int]:
+    """各轮回测的K线前缀长度：first_fraction * eta^r（按比例递增），最后一轮为全部K线"""
+    if not 0 < first_fraction <= 1 or eta < 2:
+        raise ValueError("first_fraction 需在 (0, 1] 内，eta 需不小于2")
+    rungs = []
+    fraction = first_fraction
+    while fraction < 1:
+        stop = max(2, int(n_bars * fraction))
+        if not rungs or stop > rungs[-1]:
+            rungs.append(stop)
+        fraction *= eta
+    if not rungs or rungs[-1] < n_bars:
+        rungs.append(n_bars)
+    return rungs
+
+
+def _init_worker(descriptor: Dict[str, Any], initial_balance: Dict[str, float], features: Dict[str, Any]):
+    global _worker_shared, _worker_engine
+    logging.getLogger().setLevel(logging.ERROR)
+    _worker_shared = SharedKlineArray.attach(descriptor)
+    series = _worker_shared.series()
+    _worker_engine = VectorizedBacktester(series, TradingConfig(), initial_balance=initial_balance,
+                                          features=FeatureStore.from_klines(series, **features))
+
+
+def _advance(args):
+    """将一批参数组合从各自保存的状态继续回测到前stop根K线，返回得分和新的状态"""
+    candidates, stop, objective = args
+    score = OPTIMIZATION_OBJECTIVES[objective]
+    rows = []
+    for candidate_id, params, state in candidates:
+        engine = _worker_engine.with_config(build_config(params))
+        if state is not None:
+            engine.set_state(state)
+        result = engine.run_until(stop)
+        pnl = result['final_equity'] - result['initial_equity']
+        rows.append({
+            'id': candidate_id,
+            'score': score(pnl, result['max_drawdown']),
+            'total_pnl': pnl,
+            'max_drawdown': result['max_drawdown'],
+            'trade_count': len(result['trades']),
+            'state': engine.get_state(),
+        })
+    return rows
+
+
+def run_successive_halving(kline_path: str, grid: Dict[str, List[Any]], initial_balance: Dict[str, float] = None,
+                           first_fraction: float = 0.2, eta: int = 3, objective: str = 'total_pnl',
+                           workers: int = None) -> Dict[str, Any]:
+    """
+    逐轮淘汰（successive halving）参数优化：全部参数组合先在前 first_fraction 的K线上回测，
+    按 objective 保留得分最高的 1/eta，存活组合从各自保存的回测状态继续回测到更长的前缀（不重复已回测的K线），
+    如此重复直到全部K线。每轮在进程池中并行，K线只读取一次并放入共享内存。
+    结果中 bars_evaluated / bars_exhaustive 为相对穷举扫描的计算量。
+    """
+    if objective not in OPTIMIZATION_OBJECTIVES:
+        raise ValueError(f"未知的优化目标: {objective}，可选: {sorted(OPTIMIZATION_OBJECTIVES)}")
+    points = expand_param_grid(grid)
+    workers = workers or os.cpu_count() or 1
+    states = {i: None for i in range(len(points))}
+    scores = {}
+    rung_summary = []
+    bars_evaluated = 0
+    with SharedKlineArray.from_file(kline_path) as shared:
+        features = FeatureStore.for_file(kline_path, shared.series()).prepare(
+            [TradingConfig()] + [build_config(params) for params in points])
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(shared.descriptor, initial_balance, features.descriptor)) as executor:
+            rungs = halving_rungs(shared.length, first_fraction, eta)
+            alive = list(range(len(points)))
+            done = 0
+            for r, stop in enumerate(rungs):
+                chunk = max(1, math.ceil(len(alive) / (workers * 4)))
+                tasks = [([(i, points[i], states[i]) for i in alive[j:j + chunk]], stop, objective)
+                         for j in range(0, len(alive), chunk)]
+                for rows in executor.map(_advance, tasks):
+                    for row in rows:
+                        states[row['id']] = row.pop('state')
+                        scores[row['id']] = dict(row, bars=stop)
+                bars_evaluated += len(alive) * (stop - done)
+                done = stop
+                ranked = sorted(alive, key=lambda i: scores[i]['score'], reverse=True)
+                keep = ranked if r == len(rungs) - 1 else ranked[:max(1, math.ceil(len(alive) / eta))]
+                rung_summary.append({'bars': stop, 'evaluated': len(alive), 'kept': len(keep)})
+                # 淘汰的组合不再需要回测状态
+                for i in set(alive) - set(keep):
+                    states[i] = None
+                alive = keep
+    best = alive[0]
+    return {
+        'best_params': points[best],
+        'best': scores[best],
+        'rungs': rung_summary,
+        'results': [dict(scores[i], params=points[i]) for i in range(len(points))],
+        'bars_evaluated': bars_evaluated,
+        'bars_exhaustive': len(points) * shared.length,
+    }
+
+
+def write_halving_results(results: List[Dict[str, Any]], output_path: str):
+    """各参数组合最后一轮的结果写入CSV：参数列 + bars, score, total_pnl, max_drawdown, trade_count"""
+    param_keys = list(results[0]['params'].keys()) if results else []
+    with open(output_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(param_keys + ['bars', 'score', 'total_pnl', 'max_drawdown', 'trade_count'])
+        for row in sorted(results, key=lambda r: (r['bars'], r['score']), reverse=True):
+            values = [json.dumps(v) if isinstance(v, (list, dict)) else v for v in (row['params'][k] for k in param_keys)]
+            writer.writerow(values + [row['bars'], f"{row['score']:.6f}", f"{row['total_pnl']:.6f}",
+                                      f"{row['max_drawdown']:.6f}", row['trade_count']])
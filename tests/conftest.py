@@ -0,0 +1,18 @@
+import json
+import pytest
+
+
+@pytest.fixture
+def sample_kline(tmp_path):
+    # 生成简单K线数据文件
+    kline = [
+        [1, 100, 105, 95, 100],
+        [2, 100, 110, 99, 108],
+        [3, 108, 112, 107, 110],
+        [4, 110, 115, 109, 114],
+        [5, 114, 120, 113, 119],
+    ]
+    file = tmp_path / 'kline.json'
+    with open(file, 'w') as f:
+        json.dump(kline, f)
+    return str(file)
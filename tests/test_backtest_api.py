@@ -0,0 +1,41 @@
+import os
+import json
+import asyncio
+from backtest_api import BacktestDataset, run_backtest
+from config import TradingConfig
+from mock_exchange_client import MockExchangeClient
+from trader import GridTrader
+
+KLINE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'bnbusdt_1h.json')
+
+
+def test_run_backtest_reuses_dataset_without_global_state(tmp_path):
+    with open(KLINE_PATH, 'r', encoding='utf-8') as f:
+        data = json.load(f)[3000:4500]
+    path = tmp_path / 'kline.json'
+    path.write_text(json.dumps(data))
+    dataset = BacktestDataset(str(path))
+    first = run_backtest(dataset, {'INITIAL_GRID': 1.5})
+    other = run_backtest(dataset, {'INITIAL_GRID': 3.0, 'FLIP_THRESHOLD': 0.1})
+    again = run_backtest(dataset, {'INITIAL_GRID': 1.5})
+    # 复用同一数据集的重复回测结果一致，参数互不影响，全局配置不变
+    assert first['trades'] and first['trades'] == again['trades']
+    assert first['equity_curve'].tolist() == again['equity_curve'].tolist()
+    assert other['trades'] != first['trades']
+    assert TradingConfig.INITIAL_GRID == 2.0 and TradingConfig().INITIAL_GRID == 2.0
+    assert first['metrics']['final_equity'] == first['final_equity'] and len(first['timestamps']) == len(dataset)
+    # 与命令行回测路径（空交易历史，不写入data目录）一致
+    config = TradingConfig()
+    config.INITIAL_GRID = 1.5
+    config.PERSIST_TRADE_HISTORY = False
+    exchange = MockExchangeClient(str(path))
+    trader = GridTrader(exchange, config)
+
+    async def run():
+        await trader.initialize()
+        while exchange.has_next():
+            await trader.step_once()
+            await exchange.next()
+
+    asyncio.run(run())
+    assert exchange.trades == first['trades']
@@ -0,0 +1,73 @@
+import os
+import json
+import asyncio
+import pytest
+from config import TradingConfig
+from backtest_checkpoint import load_checkpoint, save_checkpoint
+from mock_exchange_client import MockExchangeClient
+from trader import GridTrader
+
+KLINE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'bnbusdt_1h.json')
+
+
+@pytest.fixture
+def klines(tmp_path):
+    with open(KLINE_PATH, 'r', encoding='utf-8') as f:
+        # 选取成交较密集的区间，检查点前后都有成交
+        data = json.load(f)[3000:6000]
+    paths = {}
+    for name, rows in (('head', data[:2000]), ('full', data)):
+        path = tmp_path / f'{name}.json'
+        path.write_text(json.dumps(rows))
+        paths[name] = str(path)
+    return paths
+
+
+def _run(kline_path, checkpoint=None, resume=False, stop_after=None):
+    exchange = MockExchangeClient(kline_path, initial_balance={'USDT': 10000.0, 'BNB': 0.0})
+    # 使用干净的成交历史且不写入data目录，避免本地成交历史影响凯利仓位计算
+    config = TradingConfig()
+    config.PERSIST_TRADE_HISTORY = False
+    trader = GridTrader(exchange, config)
+
+    async def run():
+        if resume:
+            load_checkpoint(checkpoint, exchange, trader)
+        else:
+            await trader.initialize()
+        steps = 0
+        while exchange.has_next() and steps != stop_after:
+            await trader.step_once()
+            await exchange.next()
+            steps += 1
+        if checkpoint:
+            save_checkpoint(checkpoint, exchange, trader)
+
+    asyncio.run(run())
+    return exchange
+
+
+def test_resume_matches_uninterrupted_run(klines, tmp_path):
+    reference = _run(klines['full'])
+    checkpoint = str(tmp_path / 'state.ckpt')
+    # 中途中断后恢复
+    _run(klines['full'], checkpoint, stop_after=1200)
+    resumed = _run(klines['full'], checkpoint, resume=True)
+    assert len(reference.trades) > 100
+    assert resumed.trades == reference.trades
+    assert resumed.equity_recorder.equity.tolist() == reference.equity_recorder.equity.tolist()
+    # 跑完前2000根后追加新K线，增量继续
+    _run(klines['head'], checkpoint)
+    appended = _run(klines['full'], checkpoint, resume=True)
+    assert appended.trades == reference.trades
+    assert appended.performance_metrics() == reference.performance_metrics()
+
+
+def test_resume_rejects_mismatched_klines(klines, tmp_path):
+    checkpoint = str(tmp_path / 'state.ckpt')
+    _run(klines['full'], checkpoint, stop_after=100)
+    shifted = tmp_path / 'shifted.json'
+    with open(klines['full'], 'r', encoding='utf-8') as f:
+        shifted.write_text(json.dumps(json.load(f)[50:]))
+    with pytest.raises(ValueError):
+        _run(str(shifted), checkpoint, resume=True)
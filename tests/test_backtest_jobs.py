@@ -0,0 +1,87 @@
+import os
+import json
+import asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+import web_server
+from backtest_api import BacktestDataset, run_backtest
+from backtest_jobs import BacktestJobManager
+
+KLINE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'bnbusdt_1h.json')
+
+
+def _app(manager):
+    app = web.Application()
+    app['backtest_jobs'] = manager
+    app.on_cleanup.append(web_server._shutdown_backtest_jobs)
+    app.router.add_post('/api/backtest/jobs', web_server.handle_backtest_job_submit)
+    app.router.add_get('/api/backtest/jobs/{job_id}', web_server.handle_backtest_job_status)
+    app.router.add_get('/api/backtest/jobs/{job_id}/result', web_server.handle_backtest_job_result)
+    app.router.add_delete('/api/backtest/jobs/{job_id}', web_server.handle_backtest_job_cancel)
+    return app
+
+
+async def _wait(client, job_id, states=('done', 'failed', 'cancelled')):
+    for _ in range(600):
+        status = await (await client.get(f'/api/backtest/jobs/{job_id}')).json()
+        if status['status'] in states:
+            return status
+        await asyncio.sleep(0.1)
+    raise AssertionError(f"任务未结束: {status}")
+
+
+def test_submit_poll_fetch_and_cancel(tmp_path):
+    with open(KLINE_PATH, 'r', encoding='utf-8') as f:
+        klines = json.load(f)
+    (tmp_path / 'short.json').write_text(json.dumps(klines[:1500]))
+    (tmp_path / 'long.json').write_text(json.dumps(klines))
+    balance = {'USDT': 5000.0, 'BNB': 10.0}
+    expected = run_backtest(BacktestDataset(str(tmp_path / 'short.json')), {'INITIAL_GRID': 1.5}, balance)
+    manager = BacktestJobManager(max_workers=1, max_queued=1, kline_dir=str(tmp_path), cache_dir=str(tmp_path / 'cache'))
+
+    async def run():
+        async with TestClient(TestServer(_app(manager))) as client:
+            # 参数校验
+            for body in ({'kline': '../bnbusdt_1h.json'}, {'kline': 'missing.json'},
+                         {'kline': 'short.json', 'params': {'NO_SUCH_PARAM': 1}},
+                         {'kline': 'short.json', 'options': {'stream': True}},
+                         {'kline': 'short.json', 'options': {'fee_rate': 'free'}},
+                         {'kline': 'short.json', 'params': {'SYMBOL': 'ETH/USDT'}},
+                         {'kline': 'short.json', 'params': {'PERSIST_TRADE_HISTORY': True}},
+                         {'kline': 'short.json', 'params': {'__class__': 1}},
+                         {'kline': 'short.json', 'params': {'RISK_PARAMS': {}}},
+                         {'kline': 'short.json', 'params': {'INITIAL_GRID': 'abc'}},
+                         {'kline': 'short.json', 'params': {'S1_LOOKBACK': 2.5}},
+                         {'kline': 'short.json', 'params': {'VOLATILITY_RANGES': [{'range': [0]}]}},
+                         {'kline': 'short.json', 'symbol': 'bnb-usdt'},
+                         {'kline': 'short.json', 'initial_balance': {'USDT': -100.0}},
+                         {'kline': 'short.json', 'initial_balance': {'USDT': 'lots'}},
+                         {'kline': 'short.json', 'initial_balance': {'USDT': 1000.0, 'BNB': float('nan')}},
+                         {'kline': 'short.json', 'initial_balance': {'USDT': float('inf')}},
+                         {'kline': 'short.json', 'initial_balance': [1000.0]}):
+                assert (await client.post('/api/backtest/jobs', json=body)).status == 400
+            assert manager.jobs == {}
+
+            resp = await client.post('/api/backtest/jobs', json={'kline': 'short.json', 'params': {'INITIAL_GRID': 1.5},
+                                                                 'initial_balance': balance})
+            assert resp.status == 202
+            job_id = (await resp.json())['job_id']
+            assert (await client.get(f'/api/backtest/jobs/{job_id}/result')).status in (200, 409)
+            status = await _wait(client, job_id)
+            assert status['status'] == 'done' and status['trade_count'] == len(expected['trades'])
+            result = await (await client.get(f'/api/backtest/jobs/{job_id}/result')).json()
+            assert result['final_equity'] == expected['final_equity']
+            assert result['equity_curve'] == expected['equity_curve'].tolist()
+
+            # 单进程 + 最多1个排队任务：第3个任务被拒绝；排队和运行中的任务都可取消
+            running = (await (await client.post('/api/backtest/jobs', json={'kline': 'long.json'})).json())['job_id']
+            await _wait(client, running, states=('running',))
+            queued = (await (await client.post('/api/backtest/jobs', json={'kline': 'short.json'})).json())['job_id']
+            assert (await client.post('/api/backtest/jobs', json={'kline': 'short.json'})).status == 429
+            assert (await (await client.delete(f'/api/backtest/jobs/{queued}')).json())['status'] == 'cancelled'
+            assert (await client.delete(f'/api/backtest/jobs/{running}')).status == 200
+            assert (await _wait(client, running))['status'] == 'cancelled'
+            assert (await client.get(f'/api/backtest/jobs/{running}/result')).status == 409
+            assert (await client.get('/api/backtest/jobs/unknown')).status == 404
+
+    asyncio.run(run())
@@ -0,0 +1,52 @@
+import asyncio
+import json
+import math
+import numpy as np
+import pytest
+from backtest_metrics import EquityRecorder, compute_metrics
+from mock_exchange_client import MockExchangeClient
+
+DAY_MS = 86400 * 1000
+
+
+def test_compute_metrics_matches_reference():
+    timestamps = np.arange(6) * DAY_MS
+    equity = np.array([100.0, 110.0, 99.0, 88.0, 105.0, 121.0])
+    trades = [{'cost': 50.0, 'fee': 0.05}, {'cost': 150.0, 'fee': 0.15}]
+    metrics = compute_metrics(timestamps, equity, trades, initial_equity=100.0)
+    returns = [0.0, 0.1, -0.1, -1 / 9, 17 / 88, 16 / 105]
+    mean = sum(returns) / len(returns)
+    std = math.sqrt(sum((r - mean) ** 2 for r in returns) / (len(returns) - 1))
+    downside = math.sqrt(sum(min(r, 0) ** 2 for r in returns) / len(returns))
+    assert metrics['total_return'] == pytest.approx(0.21)
+    assert metrics['cagr'] == pytest.approx(1.21 ** (365 / 5) - 1)
+    assert metrics['sharpe'] == pytest.approx(mean / std * math.sqrt(365))
+    assert metrics['sortino'] == pytest.approx(mean / downside * math.sqrt(365))
+    assert metrics['max_drawdown'] == pytest.approx(88 / 110 - 1)
+    assert metrics['max_drawdown_bars'] == 3 and metrics['max_drawdown_days'] == 3
+    assert metrics['turnover'] == pytest.approx(200 / equity.mean())
+    assert metrics['fee_drag'] == pytest.approx(0.002)
+
+
+def test_equity_recorder_grows_and_overwrites_same_bar():
+    recorder = EquityRecorder(2)
+    for i in range(5):
+        recorder.record(i, i * 1000, 100.0 + i)
+    recorder.record(4, 4000, 200.0)
+    assert len(recorder) == 5
+    assert recorder.equity.tolist() == [100.0, 101.0, 102.0, 103.0, 200.0]
+
+
+def test_mock_exchange_records_equity_per_bar(tmp_path):
+    kline = [[i * DAY_MS, 100, 101, 99, 100 + i] for i in range(5)]
+    path = tmp_path / 'kline.json'
+    path.write_text(json.dumps(kline))
+    client = MockExchangeClient(str(path), initial_balance={'USDT': 1000, 'BNB': 1}, fee_rate=0)
+    asyncio.run(client.transfer_to_savings('USDT', 500))
+    for _ in range(4):
+        asyncio.run(client.next())
+    metrics = client.performance_metrics()
+    # 每根K线一条记录，理财余额计入总资产
+    assert client.equity_recorder.equity.tolist() == [1000 + 100 + i for i in range(5)]
+    assert metrics['bars'] == 5 and metrics['initial_equity'] == 1100
+    assert metrics['total_return'] == pytest.approx(4 / 1100)
@@ -0,0 +1,56 @@
+import os
+import json
+import numpy as np
+from backtest_metrics import write_equity_csv, write_trades_csv
+from backtest_view import BacktestResultView, lttb_indices, minmax_indices
+
+
+def test_downsampling_keeps_shape():
+    rng = np.random.default_rng(0)
+    x = np.arange(100000, dtype=np.float64)
+    y = np.cumsum(rng.normal(size=len(x))) + 1000
+    y[54321] += 500  # 尖峰
+    for index in (lttb_indices(x, y, 400), minmax_indices(y, 400)):
+        assert len(index) <= 400 and index[0] == 0 and index[-1] == len(x) - 1
+        assert np.all(np.diff(index) > 0)
+        assert 54321 in index
+    assert len(lttb_indices(x, y, 400)) == 400
+    assert int(np.argmin(y)) in minmax_indices(y, 400)
+    assert lttb_indices(x[:10], y[:10], 50).tolist() == list(range(10))
+
+
+def test_query_range_pagination_and_cache(tmp_path):
+    timestamps = 1_600_000_000_000 + np.arange(200000, dtype=np.int64) * 60000
+    equity = 10000 + np.cumsum(np.random.default_rng(1).normal(size=len(timestamps)))
+    trades = [{'timestamp': int(t), 'side': 'buy' if i % 2 else 'sell', 'price': 300.0 + i, 'amount': 0.1,
+               'cost': 30.0, 'fee': 0.03, 'order_id': f'o{i}', 'profit': 0}
+              for i, t in enumerate(timestamps[::100].tolist())]
+    paths = {name: str(tmp_path / name) for name in ('trades.csv', 'equity.csv', 'metrics.json')}
+    write_equity_csv(timestamps, equity, paths['equity.csv'])
+    write_trades_csv(trades, paths['trades.csv'])
+    with open(paths['metrics.json'], 'w', encoding='utf-8') as f:
+        json.dump({'bars': len(timestamps)}, f)
+    view = BacktestResultView(paths['trades.csv'], paths['equity.csv'], paths['metrics.json'])
+
+    result = view.query(points=500, page_size=100)
+    assert len(json.dumps(result)) < 100_000
+    assert result['equity_points'] == len(timestamps) and len(result['equity_curve']) == 500
+    assert result['equity_curve'][-1] == {'timestamp': int(timestamps[-1]), 'equity': float(equity[-1])}
+    assert result['trade_page']['total'] == len(trades) and result['trade_page']['pages'] == 20
+    assert [t['order_id'] for t in result['trades']] == [f'o{i}' for i in range(100)]
+    assert result['metrics'] == {'bars': len(timestamps)}
+
+    start, end = int(timestamps[1000]), int(timestamps[1999])
+    ranged = view.query(start=start, end=end, points=5000, page=2, page_size=4, order='desc')
+    assert ranged['equity_points'] == 1000 and not ranged['downsampled']
+    assert ranged['equity_curve'][0]['timestamp'] == start
+    assert [t['order_id'] for t in ranged['trades']] == ['o15', 'o14', 'o13', 'o12']
+    assert ranged['trade_page']['total'] == 10
+
+    # 文件未变化时使用缓存的解析结果，重新写入后重新解析
+    cached = view._cache[paths['trades.csv']][1]
+    view.query()
+    assert view._cache[paths['trades.csv']][1] is cached
+    write_trades_csv(trades[:5], paths['trades.csv'])
+    os.utime(paths['trades.csv'], ns=(0, 0))
+    assert view.query()['trade_page']['total'] == 5
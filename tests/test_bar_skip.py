@@ -0,0 +1,58 @@
+import os
+import json
+import asyncio
+import numpy as np
+from backtest_api import BacktestDataset, run_backtest
+from bar_skip import BarSkipper
+from config import TradingConfig
+from mock_exchange_client import MockExchangeClient
+from trader import GridTrader
+
+KLINE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'bnbusdt_1h.json')
+
+
+def _ranging_minute_klines(n, seed=3):
+    """在 ±3% 内震荡的1分钟合成K线"""
+    rng = np.random.default_rng(seed)
+    closes = 300 * (1 + 0.03 * np.sin(np.arange(n) / 900) + rng.normal(0, 0.0005, n))
+    opens = np.r_[closes[0], closes[:-1]]
+    timestamps = 1609459200000 + 60000 * np.arange(n)
+    return [[int(t), float(o), float(max(o, c) * 1.0002), float(min(o, c) * 0.9998), float(c)]
+            for t, o, c in zip(timestamps, opens, closes)]
+
+
+def test_bar_skip_matches_every_bar_backtest(tmp_path):
+    minute = tmp_path / 'kline_1m.json'
+    minute.write_text(json.dumps(_ranging_minute_klines(14400)))
+    with open(KLINE_PATH, 'r', encoding='utf-8') as f:
+        hourly = tmp_path / 'kline_1h.json'
+        hourly.write_text(json.dumps(json.load(f)[3000:6000]))
+    balance = {'USDT': 5000.0, 'BNB': 10.0}
+    for path in (minute, hourly):
+        dataset = BacktestDataset(str(path))
+        stepped = run_backtest(dataset, initial_balance=balance, skip_bars=False)
+        skipped = run_backtest(dataset, initial_balance=balance)
+        assert stepped['trades'] and skipped['trades'] == stepped['trades']
+        assert skipped['equity_curve'].tolist() == stepped['equity_curve'].tolist()
+        assert skipped['final_balance'] == stepped['final_balance']
+
+
+def test_bar_skip_steps_only_active_bars(tmp_path):
+    path = tmp_path / 'kline_1m.json'
+    path.write_text(json.dumps(_ranging_minute_klines(14400)))
+    config = TradingConfig()
+    config.PERSIST_TRADE_HISTORY = False
+    exchange = MockExchangeClient(str(path), initial_balance={'USDT': 5000.0, 'BNB': 10.0})
+    trader = GridTrader(exchange, config)
+    skipper = BarSkipper(exchange, trader)
+
+    async def run():
+        await trader.initialize()
+        while await skipper.skip():
+            await skipper.step()
+            await exchange.next()
+
+    asyncio.run(run())
+    assert exchange.kline_index == 14399 and len(exchange.equity_recorder.equity) == 14399
+    assert skipper.steps < 14400 / 5
+    assert not BarSkipper.supported(MockExchangeClient(str(path), intrabar=True))
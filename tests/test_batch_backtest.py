@@ -0,0 +1,71 @@
+import os
+import numpy as np
+import pytest
+from batch_backtest import BatchBacktester
+from config import SAFETY_MARGIN
+from parameter_sweep import build_config, expand_param_grid
+from strategy_core import GridCore, S1Core
+from vectorized_backtest import VectorizedBacktester, load_kline_array
+
+KLINE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'bnbusdt_1h.json')
+
+
+@pytest.mark.parametrize('balance', [{'USDT': 10000.0, 'BNB': 0.0}, {'USDT': 1000.0, 'BNB': 30.0}])
+def test_batch_matches_single_runs(balance):
+    klines = load_kline_array(KLINE_PATH)
+    points = expand_param_grid({
+        'INITIAL_GRID': [1.0, 3.0],
+        'FLIP_THRESHOLD': [0.1, 0.3],
+        'MAX_POSITION_RATIO': [1.0],
+        'S1_SELL_TARGET_PCT': [0.3],
+        'S1_LOOKBACK': [10, 52],
+    })
+    result = BatchBacktester(klines, [build_config(p) for p in points], initial_balance=balance).run()
+    assert result['equity_curve'].shape == (len(points), len(klines))
+    assert (result['equity_curve'][:, -1] == result['final_equity']).all()
+    assert result['trade_count'].sum() > 0
+    for k, params in enumerate(points):
+        single = VectorizedBacktester(klines, build_config(params), initial_balance=balance).run()
+        assert result['trades'][k] == single['trades']
+        assert result['final_equity'][k] == single['final_equity']
+        assert result['max_drawdown'][k] == single['max_drawdown']
+
+
+def test_vectorized_rules_match_strategy_core():
+    # 批量引擎的向量化信号和S1判断与 GridCore / S1Core 逐配置计算的结果一致
+    klines = load_kline_array(KLINE_PATH)[:100]
+    points = expand_param_grid({'INITIAL_GRID': [1.0, 2.5], 'FLIP_THRESHOLD': [0.1, 0.4],
+                                'S1_SELL_TARGET_PCT': [0.3, 0.6]})
+    configs = [build_config(p) for p in points]
+    batch = BatchBacktester(klines, configs)
+    batch._reset_state()
+    grids = [GridCore(c, base_price=600.0) for c in configs]
+    batch.base_price[:] = 600.0
+    batch.grid_size[:] = [core.grid_size for core in grids]
+    batch.threshold[:] = [core.threshold() for core in grids]
+    everyone = np.arange(batch.k)
+    prices = 600.0 * (1 + 0.04 * np.sin(np.linspace(0, 12, 400))) * (1 + 0.01 * np.random.default_rng(3).normal(size=400))
+    for price in prices.tolist():
+        sells = batch._sell_signal(everyone, price)
+        buys = batch._buy_signal(everyone, price)
+        assert sells.tolist() == [k for k, core in enumerate(grids) if core.sell_signal(price)]
+        assert buys.tolist() == [k for k, core in enumerate(grids) if core.buy_signal(price)]
+        assert [None if np.isnan(h) else h for h in batch.highest.tolist()] == [core.highest for core in grids]
+        assert [None if np.isnan(h) else h for h in batch.lowest.tolist()] == [core.lowest for core in grids]
+
+    s1 = [S1Core(c) for c in configs]
+    batch.s1_daily_high[:], batch.s1_daily_low[:] = 620.0, 580.0
+    batch.bnb[:] = 3.0
+    for core in s1:
+        core.daily_high, core.daily_low = 620.0, 580.0
+    for price, pct in ((630.0, 0.8), (630.0, 0.4), (600.0, 0.9), (570.0, 0.2), (570.0, 0.65), (570.0, 0.9)):
+        total_assets = np.full(batch.k, 5000.0)
+        sell, amount, act = batch._s1_decide(everyone, price, np.full(batch.k, pct), total_assets * pct, total_assets)
+        for k, core in enumerate(s1):
+            expected = core.decide(price, pct, 5000.0 * pct, 5000.0, 3.0 * SAFETY_MARGIN)
+            assert expected == (('SELL' if sell[k] else 'BUY', float(amount[k])) if act[k] else None)
+
+    # 波动率→网格映射直接使用 GridCore
+    for i in (60, 99):
+        volatility, targets = batch._bar_volatility(i)
+        assert targets[batch.grid_table].tolist() == [GridCore(c).grid_for_volatility(volatility) for c in configs]
@@ -0,0 +1,12 @@
+import asyncio
+from iexchange_client import WALL_CLOCK
+from mock_exchange_client import MockExchangeClient
+from simulate_exchange_client import SimulateExchangeClient
+
+
+def test_mock_exchange_clock_follows_bars(sample_kline):
+    client = MockExchangeClient(sample_kline)
+    assert client.clock.time() == 0.001
+    asyncio.run(client.next())
+    assert client.clock.time() == 0.002
+    assert SimulateExchangeClient.clock is WALL_CLOCK
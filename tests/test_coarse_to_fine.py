@@ -0,0 +1,55 @@
+import json
+import asyncio
+import numpy as np
+from backtest_api import BacktestDataset, run_backtest
+from coarse_to_fine import CoarseToFineBacktester
+from config import TradingConfig
+from mock_exchange_client import MockExchangeClient
+
+
+def _minute_klines(n, seed=7):
+    """均值回复的1分钟合成K线（价格大部分时间在网格轨道内震荡）"""
+    rng = np.random.default_rng(seed)
+    noise = rng.normal(0, 0.0008, n)
+    x = np.zeros(n)
+    for i in range(1, n):
+        x[i] = x[i - 1] * (1 - 1 / 5000) + noise[i]
+    closes = 300 * np.exp(x)
+    opens = np.r_[closes[0], closes[:-1]]
+    timestamps = 1609459200000 + 60000 * np.arange(n)
+    return [[int(t), float(o), float(max(o, c) * 1.0003), float(min(o, c) * 0.9997), float(c)]
+            for t, o, c in zip(timestamps, opens, closes)]
+
+
+def test_coarse_to_fine_matches_full_minute_backtest(tmp_path):
+    path = tmp_path / 'kline_1m.json'
+    path.write_text(json.dumps(_minute_klines(14400)))
+    full = run_backtest(BacktestDataset(str(path)))
+    config = TradingConfig()
+    config.PERSIST_TRADE_HISTORY = False
+    backtester = CoarseToFineBacktester(str(path), config, margin=0.0)
+    result = asyncio.run(backtester.run())
+    # 平静期快进不改变结果，只减少执行策略的次数
+    assert full['trades'] and result['trades'] == full['trades']
+    assert result['equity_curve'].tolist() == full['equity_curve'].tolist()
+    assert result['metrics']['final_equity'] == full['final_equity']
+    assert result['windows'] == 240 and result['fine_windows'] < result['windows'] / 2
+    assert result['steps'] < 14400 / 2
+
+
+def test_fast_forward_records_same_equity_as_next(tmp_path):
+    path = tmp_path / 'kline_1m.json'
+    path.write_text(json.dumps(_minute_klines(500)))
+    stepped = MockExchangeClient(str(path), initial_balance={'USDT': 1000.0, 'BNB': 2.0})
+    skipped = MockExchangeClient(str(path), initial_balance={'USDT': 1000.0, 'BNB': 2.0})
+
+    async def run():
+        while stepped.kline_index < 300:
+            await stepped.next()
+        await skipped.fast_forward(120)
+        await skipped.fast_forward(300)
+
+    asyncio.run(run())
+    assert skipped.kline_index == stepped.kline_index == 300
+    assert skipped.equity_recorder.equity.tolist() == stepped.equity_recorder.equity.tolist()
+    assert skipped.equity_recorder.timestamps.tolist() == stepped.equity_recorder.timestamps.tolist()
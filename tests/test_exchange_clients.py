@@ -5,22 +5,6 @@ from mock_exchange_client import MockExchangeClient
 from simulate_exchange_client import SimulateExchangeClient
 from exchange_client import ExchangeClient
 
-@pytest.fixture
-def sample_kline(tmp_path):
-    # 生成简单K线数据文件
-    kline = [
-        [1, 100, 105, 95, 100],
-        [2, 100, 110, 99, 108],
-        [3, 108, 112, 107, 110],
-        [4, 110, 115, 109, 114],
-        [5, 114, 120, 113, 119],
-    ]
-    file = tmp_path / 'kline.json'
-    import json
-    with open(file, 'w') as f:
-        json.dump(kline, f)
-    return str(file)
-
 def test_mock_exchange_basic(sample_kline):
     client = MockExchangeClient(sample_kline, initial_balance={'USDT': 1000, 'BNB': 0})
     # 推进到最后一根K线
@@ -83,4 +67,4 @@ def test_simulate_exchange_basic(monkeypatch):
     ob = asyncio.run(client.fetch_order_book('BNB/USDT'))
     assert 'asks' in ob and 'bids' in ob
     # 测试关闭
-    asyncio.run(client.close()) 
\ No newline at end of file
+    asyncio.run(client.close()) 
@@ -0,0 +1,59 @@
+import json
+import asyncio
+import numpy as np
+from backtest_api import BacktestDataset, run_backtest
+from feature_store import FeatureStore
+from mock_exchange_client import MockExchangeClient
+from strategy_core import S1Core, annualized_volatility
+from config import TradingConfig
+
+
+def _minute_klines(n, seed=11):
+    rng = np.random.default_rng(seed)
+    closes = 300 * np.exp(np.cumsum(rng.normal(0, 0.001, n)))
+    opens = np.r_[closes[0], closes[:-1]]
+    timestamps = 1609459200000 + 60000 * np.arange(n)
+    return [[int(t), float(o), float(max(o, c) * 1.0004), float(min(o, c) * 0.9996), float(c)]
+            for t, o, c in zip(timestamps, opens, closes)]
+
+
+def test_features_match_resampled_klines(tmp_path):
+    path = tmp_path / 'kline_1m.json'
+    # 6天：S1回看3天时前3天高低点不可用
+    path.write_text(json.dumps(_minute_klines(6 * 1440)))
+    exchange = MockExchangeClient(str(path))
+    features = FeatureStore.from_klines(exchange.kline_data)
+    volatility, levels = features.volatility(24), features.s1_levels(3)
+    s1 = S1Core(TradingConfig())
+    s1.lookback = 3
+
+    async def check(i):
+        exchange.kline_index = i
+        hourly = await exchange.fetch_ohlcv('BNB/USDT', '1h', limit=24)
+        expected = annualized_volatility([k[4] for k in hourly]) if len(hourly) > 1 else np.nan
+        assert volatility[i] == expected or np.isnan(volatility[i]) and np.isnan(expected)
+        s1.daily_high = s1.daily_low = None
+        if s1.update_levels(await exchange.fetch_ohlcv('BNB/USDT', '1d', limit=5)):
+            assert levels[i].tolist() == [s1.daily_high, s1.daily_low]
+        else:
+            assert np.isnan(levels[i]).all()
+
+    for i in list(range(0, 200)) + list(range(200, len(exchange.kline_data), 97)):
+        asyncio.run(check(i))
+
+
+def test_features_persist_and_keep_backtest_unchanged(tmp_path):
+    path = tmp_path / 'kline_1m.json'
+    path.write_text(json.dumps(_minute_klines(4 * 1440)))
+    dataset = BacktestDataset(str(path))
+    balance = {'USDT': 5000.0, 'BNB': 10.0}
+    overrides = {'S1_LOOKBACK': 2, 'INITIAL_GRID': 1.0}
+    baseline = run_backtest(dataset, overrides, balance, features=None)
+    cached = run_backtest(dataset, overrides, balance)
+    assert baseline['trades'] and cached['trades'] == baseline['trades']
+    assert cached['equity_curve'].tolist() == baseline['equity_curve'].tolist()
+    assert dataset.features.computed > 0 and list((tmp_path / '.features').glob('*.npy'))
+    # 新进程/新数据集对象直接读取持久化结果
+    reloaded = FeatureStore.for_file(str(path))
+    assert np.array_equal(reloaded.volatility(24), dataset.features.volatility(24), equal_nan=True)
+    assert reloaded.computed == 0
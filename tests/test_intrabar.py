@@ -0,0 +1,25 @@
+import asyncio
+from mock_exchange_client import MockExchangeClient
+
+
+def test_mock_exchange_intrabar_path(sample_kline):
+    client = MockExchangeClient(sample_kline, initial_balance={'USDT': 1000, 'BNB': 0}, intrabar=True, intrabar_ticks=1)
+    assert client.ticks_per_bar == 7
+    assert client.total_ticks == 35
+    # 第一根K线收平（视为阳线）：O→L→H→C，端点间各插入1个tick
+    prices = []
+    for _ in range(client.ticks_per_bar):
+        prices.append(asyncio.run(client.fetch_ticker('BNB/USDT'))['last'])
+        asyncio.run(client.next())
+    assert prices == [100, 97.5, 95, 100, 105, 102.5, 100]
+    assert client.kline_index == 1 and client.tick_index == 0
+    # 第二根K线：当前K线只返回截至当前tick的部分K线
+    asyncio.run(client.next())
+    ohlcv = asyncio.run(client.fetch_ohlcv('BNB/USDT', '1h', 2))
+    assert ohlcv[-1] == [2, 100, 100, 99.5, 99.5]
+    order = asyncio.run(client.create_order('BNB/USDT', 'market', 'buy', 1))
+    assert order['price'] == 99.5
+    for _ in range(client.total_ticks - client.ticks_per_bar - 2):
+        asyncio.run(client.next())
+    assert asyncio.run(client.fetch_ticker('BNB/USDT'))['last'] == 119
+    assert client.kline_index == 4 and client.tick_index == client.ticks_per_bar - 1
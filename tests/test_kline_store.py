@@ -0,0 +1,91 @@
+import json
+import asyncio
+import numpy as np
+import pytest
+from kline_store import KlineResampler, KlineSeries, KlineStream, SharedKlineArray, convert_json_to_npy, iter_kline_chunks, open_kline_file
+from mock_exchange_client import MockExchangeClient
+from config import TradingConfig
+from vectorized_backtest import VectorizedBacktester, load_kline_array
+
+
+def test_npy_klines_match_json(tmp_path):
+    kline = [[1609459200000 + i * 3600000, 100 + i, 101 + i, 99 + i, 100.5 + i] for i in range(50)]
+    json_path = tmp_path / 'kline.json'
+    json_path.write_text(json.dumps(kline), encoding='utf-8')
+    npy_path = str(tmp_path / 'kline.npy')
+    assert convert_json_to_npy(str(json_path), npy_path) == 50
+
+    series = open_kline_file(npy_path)
+    assert isinstance(series, KlineSeries)
+    assert isinstance(series.array, np.memmap)
+    assert series[3] == kline[3] + [0.0]
+    # 切片为共享内存的视图
+    assert np.shares_memory(series[10:20].array, series.array)
+    assert np.array_equal(load_kline_array(npy_path), load_kline_array(str(json_path)))
+
+    json_client = MockExchangeClient(str(json_path))
+    npy_client = MockExchangeClient(npy_path)
+    for client in (json_client, npy_client):
+        client.kline_index = 30
+    ohlcv = asyncio.run(npy_client.fetch_ohlcv('BNB/USDT', '1h', 5))
+    assert [k[:5] for k in ohlcv] == asyncio.run(json_client.fetch_ohlcv('BNB/USDT', '1h', 5))
+    daily = asyncio.run(npy_client.fetch_ohlcv('BNB/USDT', '1d', 3))
+    assert [k[:5] for k in daily] == asyncio.run(json_client.fetch_ohlcv('BNB/USDT', '1d', 3))
+    assert asyncio.run(npy_client.fetch_ticker('BNB/USDT')) == asyncio.run(json_client.fetch_ticker('BNB/USDT'))
+    # 重采样直接使用列视图，不复制内存映射的数据
+    resampler = KlineResampler(series, 4 * 3600000)
+    assert all(np.shares_memory(column, series.array) for column in (resampler.timestamps, resampler.closes, resampler.volumes))
+
+
+def test_stream_matches_in_memory_replay(tmp_path):
+    kline = [[1609459200000 + i * 3600000, 100 + i % 7, 103 + i % 5, 97 - i % 3, 100.5 + i % 11] for i in range(300)]
+    json_path = tmp_path / 'kline.json'
+    json_path.write_text(json.dumps(kline, indent=1), encoding='utf-8')
+    npy_path = str(tmp_path / 'kline.npy')
+    convert_json_to_npy(str(json_path), npy_path)
+    assert [row for chunk in iter_kline_chunks(str(json_path), 64) for row in chunk] == kline
+    assert [row[:5] for chunk in iter_kline_chunks(npy_path, 64) for row in chunk] == kline
+
+    # 窗口只保留最近的K线
+    stream = KlineStream(str(json_path), window=20, chunk_rows=16)
+    assert stream[150] == kline[150] and stream.start == 131
+    assert stream[140:151] == kline[140:151]
+    with pytest.raises(IndexError):
+        stream[100]
+    assert stream.has(299) and not stream.has(300)
+    stream.close()
+
+    memory = MockExchangeClient(str(json_path))
+    streaming = MockExchangeClient(str(json_path), stream=True, lookbacks={'1h': 10, '4h': 6, '1d': 3}, stream_chunk_rows=32)
+    while True:
+        for timeframe, limit in (('1h', 10), ('4h', 6), ('1d', 3)):
+            assert asyncio.run(streaming.fetch_ohlcv('BNB/USDT', timeframe, limit)) == asyncio.run(memory.fetch_ohlcv('BNB/USDT', timeframe, limit))
+        assert streaming.has_next() == memory.has_next()
+        if not memory.has_next():
+            break
+        asyncio.run(memory.next())
+        asyncio.run(streaming.next())
+    assert streaming.total_ticks is None and len(streaming.kline_data._rows) <= 102
+    asyncio.run(streaming.close())
+
+
+def test_shared_memory_klines_match_file(tmp_path):
+    kline = [[1609459200000 + i * 3600000, 100 + i % 7, 103 + i % 5, 97 - i % 3, 100.5 + i % 11] for i in range(300)]
+    json_path = tmp_path / 'kline.json'
+    json_path.write_text(json.dumps(kline), encoding='utf-8')
+    with SharedKlineArray.from_file(str(json_path)) as shared:
+        # 按名称映射同一块共享内存
+        client = MockExchangeClient(str(json_path), shared_klines=shared.descriptor)
+        assert client.kline_data[120] == kline[120] + [0.0]
+        # 同一块内存：创建方的写入对映射方可见
+        shared.array['volume'][120] = 5.0
+        assert client.kline_data[120][5] == 5.0
+        memory = MockExchangeClient(str(json_path))
+        client.kline_index = memory.kline_index = 200
+        for timeframe in ('1h', '4h', '1d'):
+            assert [k[:5] for k in asyncio.run(client.fetch_ohlcv('BNB/USDT', timeframe, 10))] == \
+                   asyncio.run(memory.fetch_ohlcv('BNB/USDT', timeframe, 10))
+        asyncio.run(client.close())
+        # 向量化引擎按列读取共享K线，结果与普通数组一致
+        vectorized = VectorizedBacktester(shared.series(), TradingConfig()).run()
+        assert vectorized['trades'] == VectorizedBacktester(load_kline_array(str(json_path)), TradingConfig()).run()['trades']
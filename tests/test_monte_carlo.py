@@ -0,0 +1,46 @@
+import os
+import json
+import numpy as np
+import pytest
+from config import TradingConfig
+from monte_carlo import block_bootstrap_path, path_seeds, run_monte_carlo
+from vectorized_backtest import VectorizedBacktester, load_kline_array
+from kline_store import convert_json_to_npy, open_kline_file
+
+KLINE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'bnbusdt_1h.json')
+
+
+def test_block_bootstrap_path_keeps_bar_shape(tmp_path):
+    klines = load_kline_array(KLINE_PATH)[:2000]
+    path = block_bootstrap_path(klines, 48, np.random.default_rng(7))
+    assert path.shape == klines.shape and np.array_equal(path[0], klines[0]) and np.array_equal(path[:, 0], klines[:, 0])
+    opens, highs, lows, closes = path[:, 1], path[:, 2], path[:, 3], path[:, 4]
+    assert np.all(highs >= np.maximum(opens, closes) - 1e-9) and np.all(lows <= np.minimum(opens, closes) + 1e-9)
+    # 块内收益率与原数据中某段连续K线一致
+    returns, source = np.diff(np.log(closes))[:48], np.diff(np.log(klines[:, 4]))
+    assert any(np.allclose(returns, source[i:i + 48]) for i in range(len(source) - 47))
+    # 块长度覆盖全部K线时只能抽到原路径
+    assert np.allclose(block_bootstrap_path(klines, len(klines), np.random.default_rng(0)), klines)
+    # 直接从内存映射的 KlineSeries 列视图生成的路径与 (N, 5) 数组逐位一致
+    npy_path = str(tmp_path / 'kline.npy')
+    convert_json_to_npy(KLINE_PATH, npy_path)
+    series = open_kline_file(npy_path)[:2000]
+    assert np.array_equal(block_bootstrap_path(series, 48, np.random.default_rng(7)), path)
+
+
+def test_monte_carlo_is_reproducible_and_matches_single_paths(tmp_path):
+    with open(KLINE_PATH, 'r', encoding='utf-8') as f:
+        data = json.load(f)[:1500]
+    path = tmp_path / 'kline.json'
+    path.write_text(json.dumps(data))
+    result = run_monte_carlo(str(path), 6, block_size=72, workers=2, seed=42)
+    again = run_monte_carlo(str(path), 6, block_size=72, workers=1, seed=42)
+    assert [row['final_pnl'] for row in result['paths']] == [row['final_pnl'] for row in again['paths']]
+    klines = load_kline_array(str(path))
+    for row, seed in zip(result['paths'], path_seeds(6, 42)):
+        single = VectorizedBacktester(block_bootstrap_path(klines, 72, np.random.default_rng(seed)), TradingConfig()).run()
+        assert row['final_pnl'] == pytest.approx(single['final_equity'] - single['initial_equity'])
+        assert row['max_drawdown'] == pytest.approx(single['max_drawdown'])
+    summary = result['summary']
+    assert summary['paths'] == 6 and summary['max_drawdown_limit'] == -0.15
+    assert summary['prob_max_drawdown_breach'] == np.mean([row['max_drawdown'] <= -0.15 for row in result['paths']])
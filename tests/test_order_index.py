@@ -0,0 +1,38 @@
+import asyncio
+import pytest
+from mock_exchange_client import MockExchangeClient
+
+
+def test_mock_exchange_order_index_and_balance_snapshot(sample_kline):
+    client = MockExchangeClient(sample_kline, initial_balance={'USDT': 1000, 'BNB': 0})
+    snapshot = asyncio.run(client.fetch_balance())
+    # 账户未变动时复用同一快照
+    assert asyncio.run(client.fetch_balance()) is snapshot
+    order = asyncio.run(client.create_order('BNB/USDT', 'limit', 'buy', 1, 100))
+    balance = asyncio.run(client.fetch_balance())
+    assert balance is not snapshot
+    assert balance['total']['BNB'] == 1 and balance['total']['base'] == 1
+    assert balance['free']['USDT'] == pytest.approx(1000 - 100 * 1.001)
+    assert asyncio.run(client.fetch_order(order['id'], 'BNB/USDT'))['status'] == 'closed'
+    assert asyncio.run(client.fetch_order(int(order['id']), 'BNB/USDT'))['price'] == 100
+    assert asyncio.run(client.cancel_order('999', 'BNB/USDT'))['status'] == 'canceled'
+    asyncio.run(client.transfer_to_savings('USDT', 100))
+    assert asyncio.run(client.fetch_funding_balance())['USDT'] == 100
+    assert client.savings_balance['USDT'] == 100
+
+
+def test_mock_exchange_open_orders_follow_fills_and_cancels(sample_kline):
+    # 未完成订单单独索引：fetch_open_orders 只遍历挂单，成交和撤单后移除，检查点恢复后重建
+    client = MockExchangeClient(sample_kline, initial_balance={'USDT': 1000, 'BNB': 5}, resting_orders=True)
+    filled = asyncio.run(client.create_order('BNB/USDT', 'limit', 'buy', 1, 100))
+    low = asyncio.run(client.create_order('BNB/USDT', 'limit', 'buy', 1, 90))
+    high = asyncio.run(client.create_order('BNB/USDT', 'limit', 'sell', 1, 130))
+    assert filled['status'] == 'closed'
+    assert [o['id'] for o in asyncio.run(client.fetch_open_orders('BNB/USDT'))] == [low['id'], high['id']]
+    asyncio.run(client.cancel_order(low['id'], 'BNB/USDT'))
+    assert list(client._open_order_ids) == [high['id']]
+    restored = MockExchangeClient(sample_kline, resting_orders=True)
+    restored.set_state(client.get_state())
+    assert [o['id'] for o in asyncio.run(restored.fetch_open_orders('BNB/USDT'))] == [high['id']]
+    asyncio.run(client.cancel_order(high['id'], 'BNB/USDT'))
+    assert asyncio.run(client.fetch_open_orders('BNB/USDT')) == [] and len(client._orders_by_id) == 3
@@ -0,0 +1,32 @@
+import os
+import pytest
+from parameter_sweep import build_config, expand_param_grid, run_sweep, write_sweep_results
+from vectorized_backtest import VectorizedBacktester, load_kline_array
+
+KLINE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'bnbusdt_1h.json')
+
+
+def test_expand_param_grid():
+    points = expand_param_grid({'INITIAL_GRID': [1.5, 2.0], 'S1_LOOKBACK': [30, 52, 60]})
+    assert len(points) == 6
+    assert points[0] == {'INITIAL_GRID': 1.5, 'S1_LOOKBACK': 30}
+    with pytest.raises(ValueError):
+        expand_param_grid({'NOT_A_PARAM': [1]})
+
+
+def test_sweep_matches_single_runs(tmp_path):
+    grid = {'INITIAL_GRID': [1.5, 2.5], 'FLIP_THRESHOLD': [0.2, 0.4]}
+    balance = {'USDT': 5000.0, 'BNB': 10.0}
+    results = run_sweep(KLINE_PATH, grid, initial_balance=balance, workers=2)
+    klines = load_kline_array(KLINE_PATH)
+    assert [r['params'] for r in results] == expand_param_grid(grid)
+    for row in results:
+        single = VectorizedBacktester(klines, build_config(row['params']), initial_balance=balance).run()
+        assert row['total_pnl'] == pytest.approx(single['final_equity'] - single['initial_equity'])
+        assert row['max_drawdown'] == pytest.approx(single['max_drawdown'])
+        assert row['trade_count'] == len(single['trades'])
+    output = tmp_path / 'sweep.csv'
+    write_sweep_results(results, str(output))
+    lines = output.read_text(encoding='utf-8').splitlines()
+    assert lines[0] == 'INITIAL_GRID,FLIP_THRESHOLD,total_pnl,max_drawdown,trade_count,runtime'
+    assert len(lines) == 5
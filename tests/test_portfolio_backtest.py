@@ -0,0 +1,62 @@
+import os
+import json
+import asyncio
+import numpy as np
+import pytest
+from config import TradingConfig
+from mock_exchange_client import MockExchangeClient
+from portfolio_backtest import PortfolioBacktester
+from trader import GridTrader
+
+KLINE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'bnbusdt_1h.json')
+
+
+@pytest.fixture
+def klines(tmp_path):
+    with open(KLINE_PATH, 'r', encoding='utf-8') as f:
+        bnb = json.load(f)[:3000]
+    # 第二个交易对：时间错开、价格放大
+    eth = [[k[0] + 500 * 3600000, k[1] * 10, k[2] * 10, k[3] * 10, k[4] * 10] for k in bnb[:2000]]
+    paths = {}
+    for name, data in (('bnb', bnb), ('eth', eth)):
+        path = tmp_path / f'{name}.json'
+        path.write_text(json.dumps(data))
+        paths[name] = str(path)
+    return paths
+
+
+def test_single_symbol_portfolio_matches_single_backtest(klines):
+    exchange = MockExchangeClient(klines['bnb'], initial_balance={'USDT': 10000.0, 'BNB': 0.0})
+    # 使用干净的成交历史且不写入data目录，与组合回测中各交易对的配置一致
+    config = TradingConfig()
+    config.PERSIST_TRADE_HISTORY = False
+    trader = GridTrader(exchange, config)
+
+    async def run():
+        await trader.initialize()
+        while exchange.has_next():
+            await trader.step_once()
+            await exchange.next()
+
+    asyncio.run(run())
+    result = asyncio.run(PortfolioBacktester({'BNB/USDT': klines['bnb']}, initial_balance={'USDT': 10000.0}).run())
+    assert result['symbols']['BNB/USDT']['trades'] == exchange.trades
+    assert len(result['equity_curve']) == 3000
+
+
+def test_portfolio_shares_quote_balance(klines):
+    backtester = PortfolioBacktester({'BNB/USDT': klines['bnb'], 'ETH/USDT': klines['eth']}, initial_balance={'USDT': 10000.0})
+    result = asyncio.run(backtester.run())
+    # 时间轴为两个交易对时间戳的并集
+    timestamps = set()
+    for path in klines.values():
+        with open(path, 'r', encoding='utf-8') as f:
+            timestamps.update(k[0] for k in json.load(f))
+    assert result['timestamps'].tolist() == sorted(timestamps)
+    assert all(row['trade_count'] > 0 for row in result['symbols'].values())
+    # 组合资产 = 初始计价币 + 各交易对（持仓市值 + 成交净现金流）
+    symbol_sum = sum(row['equity_curve'] for row in result['symbols'].values())
+    assert np.allclose(result['equity_curve'], 10000.0 + symbol_sum)
+    assert backtester.ledger is backtester.exchanges['ETH/USDT'].ledger
+    with pytest.raises(ValueError):
+        PortfolioBacktester({'BNB/USDT': klines['bnb'], 'ETH/BTC': klines['eth']})
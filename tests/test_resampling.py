@@ -0,0 +1,32 @@
+import json
+import asyncio
+import pytest
+from mock_exchange_client import MockExchangeClient
+
+
+def test_mock_exchange_resampling_without_lookahead(tmp_path):
+    # 2021-01-01 00:00 UTC 起的3天1小时K线
+    kline = [[1609459200000 + i * 3600000, 100 + i, 100.5 + i + (i % 5), 99 + i - (i % 3), 100.2 + i] for i in range(72)]
+    file = tmp_path / 'kline.json'
+    file.write_text(json.dumps(kline))
+    client = MockExchangeClient(str(file))
+
+    def expected(timeframe_ms, index, limit):
+        groups = {}
+        for k in kline[:index + 1]:
+            groups.setdefault(k[0] // timeframe_ms * timeframe_ms, []).append(k)
+        bars = [[ts, ks[0][1], max(x[2] for x in ks), min(x[3] for x in ks), ks[-1][4]] for ts, ks in sorted(groups.items())]
+        return bars[-limit:]
+
+    for index in range(72):
+        assert asyncio.run(client.fetch_ohlcv('BNB/USDT', '1d', 54)) == expected(86400000, index, 54)
+        assert asyncio.run(client.fetch_ohlcv('BNB/USDT', '4h', 3)) == expected(4 * 3600000, index, 3)
+        if index < 71:
+            asyncio.run(client.next())
+    # 未走完的日线只包含当前K线之前的数据
+    client.kline_index = 30
+    daily = asyncio.run(client.fetch_ohlcv('BNB/USDT', '1d'))
+    assert len(daily) == 2 and daily[-1][4] == kline[30][4]
+    # 月线长度不固定，不支持重采样
+    with pytest.raises(ValueError, match='月线'):
+        asyncio.run(client.fetch_ohlcv('BNB/USDT', '1M'))
@@ -0,0 +1,40 @@
+import json
+import asyncio
+import pytest
+from mock_exchange_client import MockExchangeClient
+
+
+def test_mock_exchange_resting_orders_partial_fill(tmp_path):
+    kline = [
+        [1, 100, 101, 99, 100, 10],
+        [2, 100, 100, 97, 98, 10],
+        [3, 98, 99, 94, 95, 10],
+        [4, 95, 104, 95, 103, 10],
+    ]
+    path = tmp_path / 'kline.json'
+    path.write_text(json.dumps(kline))
+    client = MockExchangeClient(str(path), initial_balance={'USDT': 1000, 'BNB': 5}, fee_rate=0,
+                                resting_orders=True, fill_volume_ratio=0.2)
+    buys = [asyncio.run(client.create_order('BNB/USDT', 'limit', 'buy', 3, price)) for price in (95, 98)]
+    sell = asyncio.run(client.create_order('BNB/USDT', 'limit', 'sell', 1, 102))
+    assert all(o['status'] == 'open' and o['filled'] == 0 for o in buys + [sell])
+    balance = asyncio.run(client.fetch_balance())
+    assert balance['used']['USDT'] == 3 * 95 + 3 * 98 and balance['used']['BNB'] == 1
+    assert balance['total']['USDT'] == 1000
+    # 第二根K线最低97：只有98的买单被穿过，成交量上限 10*0.2=2
+    asyncio.run(client.next())
+    assert asyncio.run(client.fetch_order(buys[1]['id']))['filled'] == 2
+    assert asyncio.run(client.fetch_order(buys[0]['id']))['filled'] == 0
+    # 第三根K线最低94：先成交价格更高的剩余1，再成交95的买单1
+    asyncio.run(client.next())
+    assert asyncio.run(client.fetch_order(buys[1]['id']))['status'] == 'closed'
+    assert asyncio.run(client.fetch_order(buys[0]['id']))['filled'] == 1
+    canceled = asyncio.run(client.cancel_order(buys[0]['id'], 'BNB/USDT'))
+    assert canceled['status'] == 'canceled' and canceled['filled'] == 1
+    asyncio.run(client.next())
+    assert asyncio.run(client.fetch_order(sell['id']))['status'] == 'closed'
+    assert asyncio.run(client.fetch_open_orders('BNB/USDT')) == []
+    balance = asyncio.run(client.fetch_balance())
+    assert balance['used']['USDT'] == pytest.approx(0) and balance['used']['BNB'] == 0
+    assert balance['free']['BNB'] == 5 + 3 + 1 - 1
+    assert balance['free']['USDT'] == pytest.approx(1000 - 3 * 98 - 95 + 102)
@@ -0,0 +1,45 @@
+import os
+import json
+import time
+import numpy as np
+from backtest_api import BacktestDataset, run_backtest
+from result_cache import BacktestResultCache, backtest_fingerprint
+from parameter_sweep import build_config
+
+KLINE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'bnbusdt_1h.json')
+
+
+def test_identical_backtest_served_from_cache(tmp_path):
+    path = tmp_path / 'kline_1h.json'
+    with open(KLINE_PATH, 'r', encoding='utf-8') as f:
+        path.write_text(json.dumps(json.load(f)[:2000]))
+    dataset = BacktestDataset(str(path))
+    cache = BacktestResultCache(str(tmp_path / 'cache'))
+    balance = {'USDT': 5000.0, 'BNB': 10.0}
+    first = run_backtest(dataset, {'INITIAL_GRID': 1.5}, balance, cache=cache)
+    again = run_backtest(dataset, {'INITIAL_GRID': 1.5}, balance, cache=cache)
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert again['trades'] == first['trades'] and again['metrics'] == first['metrics']
+    assert np.array_equal(again['equity_curve'], first['equity_curve'])
+    # 配置或初始余额不同时重新计算
+    run_backtest(dataset, {'INITIAL_GRID': 2.0}, balance, cache=cache)
+    run_backtest(dataset, {'INITIAL_GRID': 1.5}, {'USDT': 5000.0, 'BNB': 11.0}, cache=cache)
+    assert (cache.hits, cache.misses) == (1, 3)
+
+
+def test_fingerprint_and_lru_eviction(tmp_path):
+    assert backtest_fingerprint('a', build_config({'FLIP_THRESHOLD': 0.2})) == backtest_fingerprint('a', build_config({'FLIP_THRESHOLD': 0.2}))
+    assert backtest_fingerprint('a', build_config({'FLIP_THRESHOLD': 0.2})) != backtest_fingerprint('a', build_config({'FLIP_THRESHOLD': 0.3}))
+    assert backtest_fingerprint('a', build_config({})) != backtest_fingerprint('b', build_config({}))
+
+    payload = {'equity_curve': np.random.default_rng(0).random(2000)}
+    cache = BacktestResultCache(str(tmp_path), max_bytes=1)
+    cache.put('a', payload)
+    size = os.path.getsize(tmp_path / 'a.pkl.gz')
+    cache.max_bytes = int(size * 2.5)
+    cache.put('b', payload)
+    time.sleep(0.01)
+    assert cache.get('a') is not None  # a 变为最近使用
+    time.sleep(0.01)
+    cache.put('c', payload)
+    assert sorted(os.listdir(tmp_path)) == ['a.pkl.gz', 'c.pkl.gz']
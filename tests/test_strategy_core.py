@@ -0,0 +1,61 @@
+import asyncio
+from types import SimpleNamespace
+from config import TradingConfig
+from strategy_core import GridCore, S1Core
+from position_controller_s1 import PositionControllerS1
+
+
+def test_grid_core_tracks_extremes_and_flips():
+    config = TradingConfig()
+    core = GridCore(config, base_price=100.0, grid_size=2.0)
+    # 上轨 102，下轨 98，反弹/回调阈值 0.4%
+    assert not core.sell_signal(101.0) and core.highest is None
+    assert not core.sell_signal(103.0) and core.highest == 103.0
+    assert not core.sell_signal(102.7) and core.sell_signal(102.5)
+    assert not core.buy_signal(97.0) and core.lowest == 97.0
+    assert not core.buy_signal(97.3) and core.buy_signal(97.4)
+    assert not core.adjust_due(3600)
+    assert core.adjust_due(config.GRID_PARAMS.get('adjust_interval', 24) * 3600 + 1)
+
+
+def test_s1_core_levels_and_decisions():
+    core = S1Core(TradingConfig())
+    daily = [[i, 100.0, 110.0 + i % 3, 90.0 - i % 3, 100.0] for i in range(core.lookback)]
+    # 日线不足 lookback+1 根时不更新
+    assert not core.update_levels(daily) and core.daily_high is None
+    assert core.update_levels(daily + [[0, 100.0, 500.0, 10.0, 100.0]])
+    assert (core.daily_high, core.daily_low) == (112.0, 88.0)
+    assert not core.may_act(100.0) and core.may_act(113.0) and core.may_act(87.0)
+    # 高位且仓位高于卖出目标：卖到目标仓位，不超过可用数量
+    assert core.decide(120.0, 0.8, 800.0, 1000.0, 10.0) == ('SELL', (800.0 - 1000.0 * core.sell_target_pct) / 120.0)
+    assert core.decide(120.0, 0.8, 800.0, 1000.0, 1.0) == ('SELL', 1.0)
+    assert core.decide(80.0, 0.2, 200.0, 1000.0, 0.0) == ('BUY', (1000.0 * core.buy_target_pct - 200.0) / 80.0)
+    assert core.decide(120.0, 0.3, 300.0, 1000.0, 10.0) is None
+
+
+def test_s1_controller_reads_account_before_gating():
+    # 实盘控制器：价格在高低点之间时仍按原流程读取仓位和余额（刷新缓存），只是不下单
+    calls = []
+
+    async def record(name, value):
+        calls.append(name)
+        return value
+
+    trader = SimpleNamespace(config=TradingConfig(), current_price=100.0, base_asset='BNB')
+    trader.risk_manager = SimpleNamespace(_get_position_ratio=lambda: record('ratio', 0.8),
+                                          _get_position_value=lambda: record('value', 800.0))
+    trader._get_total_assets = lambda: record('assets', 1000.0)
+    trader.get_available_balance = lambda asset: record('balance', 5.0)
+    controller = PositionControllerS1(trader)
+    controller.s1_daily_high, controller.s1_daily_low = 110.0, 90.0
+    executed = []
+
+    async def execute(side, amount):
+        executed.append(side)
+
+    controller._execute_s1_adjustment = execute
+    asyncio.run(controller.check_and_execute())
+    assert calls == ['ratio', 'value', 'assets', 'balance'] and executed == []
+    trader.current_price = 120.0
+    asyncio.run(controller.check_and_execute())
+    assert calls[4:] == ['ratio', 'value', 'assets', 'balance'] and executed == ['SELL']
@@ -0,0 +1,31 @@
+import os
+import pytest
+from parameter_sweep import build_config, expand_param_grid
+from successive_halving import halving_rungs, run_successive_halving
+from vectorized_backtest import VectorizedBacktester, load_kline_array
+
+KLINE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'bnbusdt_1h.json')
+
+
+def test_halving_rungs():
+    assert halving_rungs(9000, 0.2, 3) == [1800, 5400, 9000]
+    assert halving_rungs(100, 1.0, 3) == [100]
+    with pytest.raises(ValueError):
+        halving_rungs(100, 0.2, 1)
+
+
+def test_successive_halving_survivors_match_full_backtests():
+    grid = {'INITIAL_GRID': [1.0, 1.5, 2.0, 3.0], 'FLIP_THRESHOLD': [0.1, 0.2, 0.4]}
+    result = run_successive_halving(KLINE_PATH, grid, first_fraction=0.2, eta=3, workers=2)
+    assert [rung['evaluated'] for rung in result['rungs']] == [12, 4, 2]
+    assert result['bars_evaluated'] < result['bars_exhaustive'] / 2
+    klines = load_kline_array(KLINE_PATH)
+    full = {}
+    for params in expand_param_grid(grid):
+        single = VectorizedBacktester(klines, build_config(params)).run()
+        full[str(params)] = single['final_equity'] - single['initial_equity']
+    # 跑完全部K线的组合从检查点状态继续，结果与完整回测一致
+    for row in result['results']:
+        if row['bars'] == len(klines):
+            assert row['total_pnl'] == pytest.approx(full[str(row['params'])])
+    assert result['best']['total_pnl'] == pytest.approx(max(full.values()))
@@ -0,0 +1,69 @@
+import os
+import asyncio
+import pytest
+from mock_exchange_client import MockExchangeClient
+from vectorized_backtest import VectorizedBacktester, load_kline_array
+from config import TradingConfig
+
+KLINE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'bnbusdt_1h.json')
+
+
+def _run_async_backtest(kline_path):
+    import trader as trader_module
+    # MockExchangeClient 提供K线时钟，缓存、网格调整和S1日更按回测时间推进
+    exchange = MockExchangeClient(kline_path, initial_balance={'USDT': 10000.0, 'BNB': 0.0})
+    # 使用干净的成交历史且不写入data目录，避免本地成交历史影响凯利仓位计算
+    config = TradingConfig()
+    config.PERSIST_TRADE_HISTORY = False
+    trader = trader_module.GridTrader(exchange, config)
+
+    async def run():
+        await trader.initialize()
+        for _ in range(len(exchange.kline_data) - 1):
+            await trader.step_once()
+            await exchange.next()
+        balance = await exchange.fetch_balance()
+        funding = await exchange.fetch_funding_balance()
+        price = await trader._get_latest_price()
+        usdt = float(balance['total'].get('USDT', 0)) + float(funding.get('USDT', 0))
+        bnb = float(balance['total'].get('BNB', 0)) + float(funding.get('BNB', 0))
+        return usdt + bnb * price
+
+    return exchange, asyncio.run(run())
+
+
+def test_vectorized_matches_mock_exchange():
+    exchange, final_equity = _run_async_backtest(KLINE_PATH)
+    result = VectorizedBacktester(load_kline_array(KLINE_PATH), TradingConfig(),
+                                  initial_balance={'USDT': 10000.0, 'BNB': 0.0}).run()
+    assert len(exchange.trades) > 0
+    assert result['trades'] == exchange.trades
+    assert result['final_equity'] == pytest.approx(final_equity, rel=1e-12)
+    # 大部分K线应被向量化跳过
+    assert result['steps'] < result['bars']
+
+
+def test_run_until_resumes_like_prefix_backtests():
+    from parameter_sweep import build_config
+    klines = load_kline_array(KLINE_PATH)
+    params = {'INITIAL_GRID': 1.0, 'FLIP_THRESHOLD': 0.1}
+    engine = VectorizedBacktester(klines, TradingConfig()).with_config(build_config(params))
+    for stop in (1500, 4000, len(klines)):
+        result = engine.run_until(stop)
+        prefix = VectorizedBacktester(klines[:stop], build_config(params)).run()
+        assert result['trades'] == prefix['trades']
+        assert result['final_equity'] == prefix['final_equity'] and result['max_drawdown'] == prefix['max_drawdown']
+    # 保存的状态可恢复到另一个引擎上继续
+    state = VectorizedBacktester(klines, build_config(params))
+    state.run_until(2000)
+    resumed = VectorizedBacktester(klines, TradingConfig()).with_config(build_config(params))
+    resumed.set_state(state.get_state())
+    assert resumed.run_until(len(klines))['trades'] == result['trades']
+
+
+def test_trade_history_with_profits_is_rejected():
+    # 盈亏全为0（含回测追加的成交）时与逐根回测一致，存在非零盈亏时拒绝
+    VectorizedBacktester.check_trade_history([])
+    VectorizedBacktester.check_trade_history([{'side': 'buy', 'profit': 0}, {'side': 'sell'}])
+    with pytest.raises(ValueError):
+        VectorizedBacktester.check_trade_history([{'side': 'sell', 'profit': 12.5}, {'side': 'buy', 'profit': 0}])
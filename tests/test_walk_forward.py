@@ -0,0 +1,44 @@
+import os
+import json
+import numpy as np
+import pytest
+from parameter_sweep import build_config, expand_param_grid
+from vectorized_backtest import VectorizedBacktester, load_kline_array
+from walk_forward import run_walk_forward, stitch_equity_curves, walk_forward_windows
+
+KLINE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'bnbusdt_1h.json')
+
+
+def test_walk_forward_windows():
+    assert walk_forward_windows(100, 50, 20) == [(0, 50, 70), (20, 70, 90), (40, 90, 100)]
+    # 样本外不足2根K线的尾部窗口丢弃
+    assert walk_forward_windows(71, 50, 20) == [(0, 50, 70)]
+    with pytest.raises(ValueError):
+        walk_forward_windows(100, 1, 20)
+
+
+def test_walk_forward_picks_in_sample_winner(tmp_path):
+    with open(KLINE_PATH, 'r', encoding='utf-8') as f:
+        data = json.load(f)[3000:6000]
+    path = tmp_path / 'kline.json'
+    path.write_text(json.dumps(data))
+    grid = {'INITIAL_GRID': [1.0, 2.0, 3.0], 'FLIP_THRESHOLD': [0.2, 0.4]}
+    result = run_walk_forward(str(path), grid, 1200, 600, workers=2, batch_size=4)
+    klines = load_kline_array(str(path))
+    points = expand_param_grid(grid)
+    assert len(result['windows']) == 3
+    for (start, split, end), window in zip(walk_forward_windows(len(klines), 1200, 600), result['windows']):
+        # 样本内最优参数与逐组单独回测一致
+        pnls = []
+        for params in points:
+            single = VectorizedBacktester(klines[start:split], build_config(params)).run()
+            pnls.append(single['final_equity'] - single['initial_equity'])
+        assert window['params'] == points[int(np.argmax(pnls))]
+        oos = VectorizedBacktester(klines[split:end], build_config(window['params'])).run()
+        assert window['out_of_sample_pnl'] == pytest.approx(oos['final_equity'] - oos['initial_equity'])
+        assert window['trades'] == oos['trades']
+    # 样本外资金曲线首尾相接、按收益率复利衔接
+    assert result['timestamps'].tolist() == klines[1200:, 0].astype(np.int64).tolist()
+    total = np.prod([w['equity_curve'][-1] / w['initial_equity'] for w in result['windows']])
+    assert result['equity_curve'][-1] == pytest.approx(result['windows'][0]['initial_equity'] * total)
+    assert stitch_equity_curves([])[1].size == 0
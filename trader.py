@@ -12,27 +12,43 @@ from helpers import send_pushplus_message, format_trade_message
 import json
 from monitor import TradingMonitor
 from position_controller_s1 import PositionControllerS1
+from strategy_core import GridCore, annualized_volatility
+
+
+def _grid_core_attribute(name):
+    """网格状态保存在 GridCore 中，GridTrader 上保持原有的属性访问方式"""
+    return property(lambda self: getattr(self.grid_core, name),
+                    lambda self, value: setattr(self.grid_core, name, value))
+
 
 class GridTrader:
+    base_price = _grid_core_attribute('base_price')
+    grid_size = _grid_core_attribute('grid_size')
+    highest = _grid_core_attribute('highest')
+    lowest = _grid_core_attribute('lowest')
+    last_grid_adjust_time = _grid_core_attribute('last_grid_adjust_time')
+
     def __init__(self, exchange: IExchangeClient, config):
         """初始化网格交易器"""
         self.exchange = exchange
         self.config = config
         self.symbol = config.SYMBOL
-        self.base_price = config.INITIAL_BASE_PRICE
-        self.grid_size = config.INITIAL_GRID
+        # 交易对的基础币/计价币（如 BNB/USDT）
+        self.base_asset, self.quote_asset = config.SYMBOL.split('/') if '/' in config.SYMBOL else ('BNB', 'USDT')
+        self.amount_precision = getattr(config, 'AMOUNT_PRECISION', 3)
+        # 策略时钟：实盘为墙上时间，回测为K线时间
+        self.clock = exchange.clock
+        # 网格状态机（基准价、网格大小、最高/最低价跟踪、调整时间），纯同步计算
+        self.grid_core = GridCore(config, config.INITIAL_BASE_PRICE, config.INITIAL_GRID, self.clock.time())
         self.initialized = False
-        self.highest = None
-        self.lowest = None
         self.current_price = None
         self.active_orders = {'buy': None, 'sell': None}
-        self.order_tracker = OrderTracker()
+        self.order_tracker = OrderTracker(persist=getattr(config, 'PERSIST_TRADE_HISTORY', True))
         self.risk_manager = AdvancedRiskManager(self)
         self.total_assets = 0
         self.last_trade_time = None
         self.last_trade_price = None
         self.price_history = []
-        self.last_grid_adjust_time = time.time()
         self.logger = logging.getLogger(self.__class__.__name__)
         self.symbol_info = None
         self.monitored_orders = []
@@ -185,75 +201,65 @@ class GridTrader:
             return self.base_price
 
     def _get_upper_band(self):
-        return self.base_price * (1 + self.grid_size / 100)
+        return self.grid_core.upper_band()
     
     def _get_lower_band(self):
-        return self.base_price * (1 - self.grid_size / 100)
-    
-    async def _check_buy_signal(self):
+        return self.grid_core.lower_band()
+
+    def _buy_signal(self):
+        """同步检查买入信号（GridCore 跟踪最低价和反弹阈值），不访问交易所"""
+        core = self.grid_core
         current_price = self.current_price
-        if current_price <= self._get_lower_band():
-            # 记录最低价
-            new_lowest = current_price if self.lowest is None else min(self.lowest, current_price)
-            # 只在最低价更新时打印日志
-            if new_lowest != self.lowest:
-                self.lowest = new_lowest
-                self.logger.info(
-                    f"买入监测 | "
-                    f"当前价: {current_price:.2f} | "
-                    f"触发价: {self._get_lower_band():.5f} | "
-                    f"最低价: {self.lowest:.2f} | "
-                    f"网格下限: {self._get_lower_band():.2f} | "
-                    f"反弹阈值: {FLIP_THRESHOLD(self.grid_size)*100:.2f}%"
-                )
-            threshold = FLIP_THRESHOLD(self.grid_size)
-            # 从最低价反弹指定比例时触发买入
-            if self.lowest and current_price >= self.lowest * (1 + threshold):
-                self.logger.info(f"触发买入信号 | 当前价: {current_price:.2f} | 已反弹: {(current_price/self.lowest-1)*100:.2f}%")
-                # 检查买入余额是否充足
-                if not await self.check_buy_balance(current_price):
-                    return False
-                return True
+        previous_lowest = core.lowest
+        triggered = core.buy_signal(current_price)
+        # 只在最低价更新时打印日志
+        if core.lowest != previous_lowest:
+            self.logger.info(
+                f"买入监测 | "
+                f"当前价: {current_price:.2f} | "
+                f"触发价: {core.lower_band():.5f} | "
+                f"最低价: {core.lowest:.2f} | "
+                f"网格下限: {core.lower_band():.2f} | "
+                f"反弹阈值: {core.threshold()*100:.2f}%"
+            )
+        if triggered:
+            self.logger.info(f"触发买入信号 | 当前价: {current_price:.2f} | 已反弹: {(current_price/core.lowest-1)*100:.2f}%")
+        return triggered
+
+    def _sell_signal(self):
+        """同步检查卖出信号（GridCore 跟踪最高价和回调阈值），不访问交易所"""
+        core = self.grid_core
+        current_price = self.current_price
+        previous_highest = core.highest
+        triggered = core.sell_signal(current_price)
+        # 只在最高价更新时打印日志
+        if core.highest != previous_highest:
+            self.logger.info(
+                f"卖出监测 | "
+                f"当前价: {current_price:.2f} | "
+                f"触发价(动态): {core.highest * (1 - core.threshold()):.5f} | "
+                f"最高价: {core.highest:.2f}"
+            )
+        if triggered:
+            self.logger.info(f"触发卖出信号 | 当前价: {current_price:.2f} | 目标价: {core.highest * (1 - core.threshold()):.5f} | 已下跌: {(1-current_price/core.highest)*100:.2f}%")
+        return triggered
+
+    async def _check_buy_signal(self):
+        # 触发买入信号后检查买入余额是否充足（可能从理财赎回）
+        if self._buy_signal():
+            return await self.check_buy_balance(self.current_price)
         return False
     
     async def _check_sell_signal(self):
-        current_price = self.current_price
-        initial_upper_band = self._get_upper_band()  # 初始上轨价格
-        
-        if current_price >= initial_upper_band:
-            # 记录最高价
-            new_highest = current_price if self.highest is None else max(self.highest, current_price)
-            threshold = FLIP_THRESHOLD(self.grid_size)
-            
-            # 计算动态触发价格 (基于最高价的回调阈值)
-            dynamic_trigger_price = new_highest * (1 - threshold) if new_highest is not None else initial_upper_band
-            
-            # 只在最高价更新时打印日志
-            if new_highest != self.highest:
-                self.highest = new_highest
-                # 重新计算动态触发价，基于更新后的最高价
-                dynamic_trigger_price = self.highest * (1 - threshold)
-                
-                self.logger.info(
-                    f"卖出监测 | "
-                    f"当前价: {current_price:.2f} | "
-                    f"触发价(动态): {dynamic_trigger_price:.5f} | "
-                    f"最高价: {self.highest:.2f}"
-                )
-                
-            # 从最高价下跌指定比例时触发卖出
-            if self.highest and current_price <= self.highest * (1 - threshold):
-                self.logger.info(f"触发卖出信号 | 当前价: {current_price:.2f} | 目标价: {self.highest * (1 - threshold):.5f} | 已下跌: {(1-current_price/self.highest)*100:.2f}%")
-                # 检查卖出余额是否充足
-                if not await self.check_sell_balance():
-                    return False
-                return True
+        # 触发卖出信号后检查卖出余额是否充足（可能从理财赎回）
+        if self._sell_signal():
+            return await self.check_sell_balance()
         return False
     
     async def _calculate_order_amount(self, order_type):
         """计算目标订单金额 (总资产的10%)\n"""
         try:
-            current_time = time.time()
+            current_time = self.clock.time()
             
             # 使用缓存避免频繁计算和日志输出
             cache_key = f'order_amount_target' # 使用不同的缓存键
@@ -295,47 +301,8 @@ class GridTrader:
     async def main_loop(self):
         while True:
             try:
-                if not self.initialized:
-                    await self.initialize()
-                    await self.position_controller_s1.update_daily_s1_levels()
-
-                # 保留S1水平更新
-                await self.position_controller_s1.update_daily_s1_levels()
-
-                # 获取当前价格
-                current_price = await self._get_latest_price()
-                if not current_price:
-                    await asyncio.sleep(self.sleep_interval_main_loop)
-                    continue
-                self.current_price = current_price
-
-                # 优先检查买入卖出信号，不执行风控检查
-                # 添加重试机制确保买入卖出检测正常运行
-                sell_signal = await self._check_signal_with_retry(self._check_sell_signal, "卖出检测")
-                if sell_signal:
-                    await self.execute_order('sell')
-                else:
-                    buy_signal = await self._check_signal_with_retry(self._check_buy_signal, "买入检测")
-                    if buy_signal:
-                        await self.execute_order('buy')
-                    else:
-                        # 只有在没有交易信号时才执行其他操作
-                        
-                        # 执行风控检查
-                        if await self.risk_manager.multi_layer_check():
-                            await asyncio.sleep(self.sleep_interval_main_loop)
-                            continue
-
-                        # 执行S1策略
-                        await self.position_controller_s1.check_and_execute()
-                        
-                        # 调整网格大小
-                        adjust_interval_hours = self.config.GRID_PARAMS.get('adjust_interval', 24) 
-                        adjust_interval_seconds = adjust_interval_hours * 3600
-                        if time.time() - self.last_grid_adjust_time > adjust_interval_seconds:
-                            self.logger.info(f"时间到了，准备调整网格大小 (间隔: {adjust_interval_hours} 小时).")
-                            await self.adjust_grid_size()
-                            self.last_grid_adjust_time = time.time()
+                # 与回测共用同一套单步逻辑
+                await self.step_once()
 
                 await asyncio.sleep(self.sleep_interval_main_loop)
 
@@ -348,8 +315,8 @@ class GridTrader:
                         balance = await self.exchange.fetch_balance()
                         funding_balance = await self.exchange.fetch_funding_balance()
                         current_price = await self._get_latest_price()
-                        usdt = float(balance['total'].get('USDT', 0)) + float(funding_balance.get('USDT', 0))
-                        bnb = float(balance['total'].get('BNB', 0)) + float(funding_balance.get('BNB', 0))
+                        usdt = float(balance['total'].get(self.quote_asset, 0)) + float(funding_balance.get(self.quote_asset, 0))
+                        bnb = float(balance['total'].get(self.base_asset, 0)) + float(funding_balance.get(self.base_asset, 0))
                         total = usdt + bnb * current_price
                         initial = self.config.INITIAL_PRINCIPAL
                         profit = total - initial if initial > 0 else 0
@@ -366,7 +333,7 @@ class GridTrader:
         """带重试机制的信号检测函数
         
         Args:
-            check_func: 要执行的检测函数 (_check_buy_signal 或 _check_sell_signal)
+            check_func: 要执行的检测函数（信号触发后的余额检查，或 _check_buy_signal / _check_sell_signal）
             check_name: 检测名称，用于日志
             max_retries: 最大重试次数
             retry_delay: 重试间隔（秒）
@@ -399,19 +366,19 @@ class GridTrader:
             required_bnb = required_usdt / current_price
             
             # 获取现货余额
-            spot_usdt = float(balance['free'].get('USDT', 0))
-            spot_bnb = float(balance['free'].get('BNB', 0))
+            spot_usdt = float(balance['free'].get(self.quote_asset, 0))
+            spot_bnb = float(balance['free'].get(self.base_asset, 0))
             
             # 一次性检查和赎回所需资金
             transfers = []
             if spot_usdt < required_usdt:
                 transfers.append({
-                    'asset': 'USDT',
+                    'asset': self.quote_asset,
                     'amount': required_usdt - spot_usdt
                 })
             if spot_bnb < required_bnb:
                 transfers.append({
-                    'asset': 'BNB',
+                    'asset': self.base_asset,
                     'amount': required_bnb - spot_bnb
                 })
             
@@ -444,7 +411,7 @@ class GridTrader:
     async def _get_position_ratio(self):
         """获取当前仓位占总资产比例"""
         try:
-            usdt_balance = await self.get_available_balance('USDT')
+            usdt_balance = await self.get_available_balance(self.quote_asset)
             position_value = await self.risk_manager._get_position_value()
             total_assets = position_value + usdt_balance
             if total_assets == 0:
@@ -528,7 +495,7 @@ class GridTrader:
                     
                     # 更新交易记录
                     trade_info = {
-                        'timestamp': time.time(),
+                        'timestamp': self.clock.time(),
                         'side': side,
                         'price': float(updated_order['price']),
                         'amount': float(updated_order['filled']),
@@ -537,7 +504,7 @@ class GridTrader:
                     self.order_tracker.add_trade(trade_info)
                     
                     # 更新最后交易时间和价格
-                    self.last_trade_time = time.time()
+                    self.last_trade_time = self.clock.time()
                     self.last_trade_price = float(updated_order['price'])
                     
                     # 更新总资产信息
@@ -586,14 +553,14 @@ class GridTrader:
                             self.base_price = float(check_order['price'])
                             self.active_orders[side] = None
                             trade_info = {
-                                'timestamp': time.time(),
+                                'timestamp': self.clock.time(),
                                 'side': side,
                                 'price': float(check_order['price']),
                                 'amount': float(check_order['filled']),
                                 'order_id': check_order['id']
                             }
                             self.order_tracker.add_trade(trade_info)
-                            self.last_trade_time = time.time()
+                            self.last_trade_time = self.clock.time()
                             self.last_trade_price = float(check_order['price'])
                             await self._update_total_assets()
                             self.logger.info(f"基准价已更新: {self.base_price}")
@@ -689,11 +656,11 @@ class GridTrader:
             balance = await self.exchange.fetch_balance()
             if side == 'buy':
                 required = amount * price
-                available = float(balance['free'].get('USDT', 0))
+                available = float(balance['free'].get(self.quote_asset, 0))
                 if available >= required:
                     return True
             else:
-                available = float(balance['free'].get('BNB', 0))
+                available = float(balance['free'].get(self.base_asset, 0))
                 if available >= amount:
                     return True
             
@@ -755,7 +722,7 @@ class GridTrader:
             
             # 只在这里添加交易记录
             self.order_tracker.add_trade({
-                'timestamp': time.time(),
+                'timestamp': self.clock.time(),
                 'side': side,
                 'price': price,
                 'amount': amount,
@@ -802,7 +769,7 @@ class GridTrader:
 
     async def _check_and_cancel_timeout_orders(self):
         """检查并取消超时订单"""
-        current_time = time.time()
+        current_time = self.clock.time()
         for order_id, timestamp in list(self.order_timestamps.items()):
             if current_time - timestamp > self.ORDER_TIMEOUT:
                 try:
@@ -853,43 +820,34 @@ class GridTrader:
                         continue
 
     async def adjust_grid_size(self):
-        """根据波动率和市场趋势调整网格大小"""
+        """根据波动率调整网格大小（分档规则见 GridCore.grid_for_volatility）"""
         try:
             volatility = await self._calculate_volatility()
             self.logger.info(f"当前波动率: {volatility:.4f}")
-            
-            # 根据波动率获取基础网格大小
-            base_grid = None
-            for range_config in self.config.GRID_PARAMS['volatility_threshold']['ranges']:
-                if range_config['range'][0] <= volatility < range_config['range'][1]:
-                    base_grid = range_config['grid']
-                    break
-            
-            # 如果没有匹配到波动率范围，使用默认网格
-            if base_grid is None:
-                base_grid = self.config.INITIAL_GRID
-            
-            # 删除趋势调整逻辑
-            new_grid = base_grid
-
-            # 确保网格在允许范围内
-            new_grid = max(min(new_grid, self.config.GRID_PARAMS['max']), self.config.GRID_PARAMS['min'])
-            
-            if new_grid != self.grid_size:
+            old_grid = self.grid_size
+            if self.grid_core.resize(volatility):
                 self.logger.info(
                     f"调整网格大小 | "
                     f"波动率: {volatility:.2%} | "
-                    f"原网格: {self.grid_size:.2f}% | "
-                    f"新网格: {new_grid:.2f}%"
+                    f"原网格: {old_grid:.2f}% | "
+                    f"新网格: {self.grid_size:.2f}%"
                 )
-                self.grid_size = new_grid
             
         except Exception as e:
             self.logger.error(f"调整网格大小失败: {str(e)}")
 
+    def _precomputed_feature(self, name, **params):
+        """回测特征库中当前K线的预计算值（MockExchangeClient 配置了 FeatureStore 时），否则返回 None"""
+        lookup = getattr(self.exchange, 'feature_value', None)
+        return lookup(name, **params) if lookup is not None else None
+
     async def _calculate_volatility(self):
         """计算价格波动率"""
         try:
+            volatility = self._precomputed_feature('volatility', window=self.config.VOLATILITY_WINDOW)
+            if volatility is not None:
+                return float(volatility)
+
             # 获取24小时K线数据
             klines = await self.exchange.fetch_ohlcv(
                 self.config.SYMBOL, 
@@ -900,13 +858,8 @@ class GridTrader:
             if not klines:
                 return 0
                 
-            # 计算收益率
-            prices = [float(k[4]) for k in klines]  # 收盘价
-            returns = np.diff(np.log(prices))
-            
-            # 计算波动率（标准差）并年化
-            volatility = np.std(returns) * np.sqrt(24 * 365)  # 年化波动率
-            return volatility
+            # 收盘价对数收益率的标准差，年化
+            return annualized_volatility([float(k[4]) for k in klines])
             
         except Exception as e:
             self.logger.error(f"计算波动率失败: {str(e)}")
@@ -914,15 +867,13 @@ class GridTrader:
 
     def _adjust_amount_precision(self, amount):
         """根据交易所精度调整数量"""
-        precision = 3  # BNB的数量精度是3位小数
-        
-        formatted_amount = f"{amount:.3f}"
+        formatted_amount = f"{amount:.{self.amount_precision}f}"
         return float(formatted_amount)
 
     async def calculate_trade_amount(self, side, order_price):
         # 获取必要参数
         balance = await self.exchange.fetch_balance()
-        total_assets = float(balance['total']['USDT']) + float(balance['total'].get('BNB', 0)) * order_price
+        total_assets = float(balance['total'][self.quote_asset]) + float(balance['total'].get(self.base_asset, 0)) * order_price
         
         # 计算波动率调整因子
         volatility = await self._calculate_volatility()
@@ -1023,6 +974,10 @@ class GridTrader:
     async def _get_price_percentile(self, period='7d'):
         """获取当前价格在历史中的分位位置"""
         try:
+            percentile = self._precomputed_feature('price_percentile', timeframe='4h', limit=42)
+            if percentile is not None:
+                return float(percentile)
+
             # 获取过去7天价格数据（使用4小时K线）
             ohlcv = await self.exchange.fetch_ohlcv(self.config.SYMBOL, '4h', limit=42)  # 42根4小时K线 ≈ 7天
             closes = [candle[4] for candle in ohlcv]
@@ -1055,7 +1010,7 @@ class GridTrader:
         """计算需要划转的资金量"""
         current_price = await self._get_latest_price()
         balance = await self.exchange.fetch_balance()
-        total_assets = float(balance['total']['USDT']) + float(balance['total'].get('BNB', 0)) * current_price
+        total_assets = float(balance['total'][self.quote_asset]) + float(balance['total'].get(self.base_asset, 0)) * current_price
         
         # 获取当前订单需要的金额
         amount_usdt = await self.calculate_trade_amount(side, current_price)
@@ -1082,8 +1037,8 @@ class GridTrader:
             target_bnb_hold_amount = target_bnb_hold_value / current_price
 
             # 获取当前现货可用余额
-            spot_usdt_balance = float(balance.get('free', {}).get('USDT', 0))
-            spot_bnb_balance = float(balance.get('free', {}).get('BNB', 0))
+            spot_usdt_balance = float(balance.get('free', {}).get(self.quote_asset, 0))
+            spot_bnb_balance = float(balance.get('free', {}).get(self.base_asset, 0))
 
             self.logger.info(
                 f"资金转移检查 | 总资产: {total_assets:.2f} USDT | "
@@ -1102,7 +1057,7 @@ class GridTrader:
                 if transfer_amount > 1.0: 
                     self.logger.info(f"转移多余USDT到理财: {transfer_amount:.2f}")
                     try:
-                        await self.exchange.transfer_to_savings('USDT', transfer_amount)
+                        await self.exchange.transfer_to_savings(self.quote_asset, transfer_amount)
                         transfer_executed = True
                     except Exception as transfer_e:
                         self.logger.error(f"转移USDT到理财失败: {str(transfer_e)}")
@@ -1116,7 +1071,7 @@ class GridTrader:
                 if transfer_amount >= 0.01:
                     self.logger.info(f"转移多余BNB到理财: {transfer_amount:.4f}")
                     try:
-                        await self.exchange.transfer_to_savings('BNB', transfer_amount)
+                        await self.exchange.transfer_to_savings(self.base_asset, transfer_amount)
                         transfer_executed = True
                     except Exception as transfer_e:
                         self.logger.error(f"转移BNB到理财失败: {str(transfer_e)}")
@@ -1162,7 +1117,7 @@ class GridTrader:
             max_single_transfer = 5000  # 假设单次最大划转5000 USDT
             while required_with_buffer > 0:
                 transfer_amount = min(required_with_buffer, max_single_transfer)
-                await self.exchange.transfer_to_spot('USDT', transfer_amount)
+                await self.exchange.transfer_to_spot(self.quote_asset, transfer_amount)
                 required_with_buffer -= transfer_amount
                 self.logger.info(f"预划转完成: {transfer_amount} USDT | 剩余需划转: {required_with_buffer}")
                 
@@ -1208,12 +1163,12 @@ class GridTrader:
             target_bnb = (total_assets * 0.16) / current_price
             
             # 获取现货余额
-            usdt_balance = float(balance['free'].get('USDT', 0))
-            bnb_balance = float(balance['free'].get('BNB', 0))
+            usdt_balance = float(balance['free'].get(self.quote_asset, 0))
+            bnb_balance = float(balance['free'].get(self.base_asset, 0))
             
             # 计算总余额（现货+理财）
-            total_usdt = usdt_balance + float(funding_balance.get('USDT', 0))
-            total_bnb = bnb_balance + float(funding_balance.get('BNB', 0))
+            total_usdt = usdt_balance + float(funding_balance.get(self.quote_asset, 0))
+            total_bnb = bnb_balance + float(funding_balance.get(self.base_asset, 0))
             
             # 调整USDT余额
             if usdt_balance > target_usdt:
@@ -1223,7 +1178,7 @@ class GridTrader:
                 # --- 添加最小申购金额检查 (>= 1 USDT) ---
                 if transfer_amount >= 1.0:
                     try:
-                        await self.exchange.transfer_to_savings('USDT', transfer_amount)
+                        await self.exchange.transfer_to_savings(self.quote_asset, transfer_amount)
                         self.logger.info(f"已将 {transfer_amount:.2f} USDT 申购到理财")
                     except Exception as e_savings_usdt:
                          self.logger.error(f"申购USDT到理财失败: {str(e_savings_usdt)}")
@@ -1235,7 +1190,7 @@ class GridTrader:
                 self.logger.info(f"从理财赎回USDT: {transfer_amount}")
                 # 同样，赎回USDT也可能需要最小金额检查，如果遇到错误需添加
                 try:
-                    await self.exchange.transfer_to_spot('USDT', transfer_amount)
+                    await self.exchange.transfer_to_spot(self.quote_asset, transfer_amount)
                     self.logger.info(f"已从理财赎回 {transfer_amount:.2f} USDT")
                 except Exception as e_spot_usdt:
                     self.logger.error(f"从理财赎回USDT失败: {str(e_spot_usdt)}")
@@ -1248,7 +1203,7 @@ class GridTrader:
                 # --- 添加最小申购金额检查 ---
                 if transfer_amount >= 0.01:
                     try:
-                        await self.exchange.transfer_to_savings('BNB', transfer_amount)
+                        await self.exchange.transfer_to_savings(self.base_asset, transfer_amount)
                         self.logger.info(f"已将 {transfer_amount:.4f} BNB 申购到理财")
                     except Exception as e_savings:
                         self.logger.error(f"申购BNB到理财失败: {str(e_savings)}")
@@ -1261,7 +1216,7 @@ class GridTrader:
                 # 赎回操作通常有不同的最低限额，或者限额较低，这里暂时不加检查
                 # 如果赎回也遇到 -6005，需要在这里也加上对应的赎回最小额检查
                 try:
-                    await self.exchange.transfer_to_spot('BNB', transfer_amount)
+                    await self.exchange.transfer_to_spot(self.base_asset, transfer_amount)
                     self.logger.info(f"已从理财赎回 {transfer_amount:.4f} BNB")
                 except Exception as e_spot:
                      self.logger.error(f"从理财赎回BNB失败: {str(e_spot)}")
@@ -1278,7 +1233,7 @@ class GridTrader:
         """获取总资产价值（USDT）"""
         try:
             # 使用缓存避免频繁请求
-            current_time = time.time()
+            current_time = self.clock.time()
             if hasattr(self, '_assets_cache') and \
                current_time - self._assets_cache['time'] < 60:  # 1分钟缓存
                 return self._assets_cache['value']
@@ -1301,19 +1256,19 @@ class GridTrader:
                 return default_total
             
             # 分别获取现货和理财账户余额（使用安全的get方法）
-            spot_bnb = float(balance.get('free', {}).get('BNB', 0) or 0)
-            spot_usdt = float(balance.get('free', {}).get('USDT', 0) or 0)
+            spot_bnb = float(balance.get('free', {}).get(self.base_asset, 0) or 0)
+            spot_usdt = float(balance.get('free', {}).get(self.quote_asset, 0) or 0)
             
             # 加上已冻结的余额
-            spot_bnb += float(balance.get('used', {}).get('BNB', 0) or 0)
-            spot_usdt += float(balance.get('used', {}).get('USDT', 0) or 0)
+            spot_bnb += float(balance.get('used', {}).get(self.base_asset, 0) or 0)
+            spot_usdt += float(balance.get('used', {}).get(self.quote_asset, 0) or 0)
             
             # 加上理财账户余额
             fund_bnb = 0
             fund_usdt = 0
             if funding_balance:
-                fund_bnb = float(funding_balance.get('BNB', 0) or 0)
-                fund_usdt = float(funding_balance.get('USDT', 0) or 0)
+                fund_bnb = float(funding_balance.get(self.base_asset, 0) or 0)
+                fund_usdt = float(funding_balance.get(self.quote_asset, 0) or 0)
             
             # 分别计算现货和理财账户总值
             spot_value = spot_usdt + (spot_bnb * current_price)
@@ -1351,8 +1306,8 @@ class GridTrader:
             funding_balance = await self.exchange.fetch_funding_balance()
             
             # 计算总资产
-            bnb_balance = float(balance['total'].get('BNB', 0))
-            usdt_balance = float(balance['total'].get('USDT', 0))
+            bnb_balance = float(balance['total'].get(self.base_asset, 0))
+            usdt_balance = float(balance['total'].get(self.quote_asset, 0))
             current_price = await self._get_latest_price()
             
             self.total_assets = usdt_balance + (bnb_balance * current_price)
@@ -1490,7 +1445,7 @@ class GridTrader:
                 self.logger.error("获取现货余额失败，返回无效数据")
                 return False
                 
-            spot_usdt = float(spot_balance.get('free', {}).get('USDT', 0) or 0)
+            spot_usdt = float(spot_balance.get('free', {}).get(self.quote_asset, 0) or 0)
             
             self.logger.info(f"买入前余额检查 | 所需USDT: {amount_usdt:.2f} | 现货USDT: {spot_usdt:.2f}")
             
@@ -1501,7 +1456,7 @@ class GridTrader:
             # 现货不足，尝试从理财赎回
             self.logger.info(f"现货USDT不足，尝试从理财赎回...")
             funding_balance = await self.exchange.fetch_funding_balance()
-            funding_usdt = float(funding_balance.get('USDT', 0) or 0)
+            funding_usdt = float(funding_balance.get(self.quote_asset, 0) or 0)
             
             # 检查总余额是否足够
             if spot_usdt + funding_usdt < amount_usdt:
@@ -1518,7 +1473,7 @@ class GridTrader:
             
             # 从理财赎回
             self.logger.info(f"从理财赎回 {needed_amount:.2f} USDT")
-            await self.exchange.transfer_to_spot('USDT', needed_amount)
+            await self.exchange.transfer_to_spot(self.quote_asset, needed_amount)
             
             # 等待资金到账
             await asyncio.sleep(self.sleep_interval_fund)
@@ -1531,7 +1486,7 @@ class GridTrader:
                 self.logger.error("赎回后获取现货余额失败，返回无效数据")
                 return False
                 
-            new_usdt = float(new_balance.get('free', {}).get('USDT', 0) or 0)
+            new_usdt = float(new_balance.get('free', {}).get(self.quote_asset, 0) or 0)
             
             self.logger.info(f"赎回后余额检查 | 现货USDT: {new_usdt:.2f}")
             
@@ -1559,7 +1514,7 @@ class GridTrader:
                 self.logger.error("获取现货余额失败，返回无效数据")
                 return False
                 
-            spot_bnb = float(spot_balance.get('free', {}).get('BNB', 0) or 0)
+            spot_bnb = float(spot_balance.get('free', {}).get(self.base_asset, 0) or 0)
             
             # 计算所需数量
             amount_usdt = await self._calculate_order_amount('sell')
@@ -1580,7 +1535,7 @@ class GridTrader:
             # 现货不足，尝试从理财赎回
             self.logger.info(f"现货BNB不足，尝试从理财赎回...")
             funding_balance = await self.exchange.fetch_funding_balance()
-            funding_bnb = float(funding_balance.get('BNB', 0) or 0)
+            funding_bnb = float(funding_balance.get(self.base_asset, 0) or 0)
             
             # 检查总余额是否足够
             if spot_bnb + funding_bnb < bnb_needed:
@@ -1597,7 +1552,7 @@ class GridTrader:
             
             # 从理财赎回
             self.logger.info(f"从理财赎回 {needed_amount:.8f} BNB")
-            await self.exchange.transfer_to_spot('BNB', needed_amount)
+            await self.exchange.transfer_to_spot(self.base_asset, needed_amount)
             
             # 等待资金到账
             await asyncio.sleep(self.sleep_interval_fund)
@@ -1610,7 +1565,7 @@ class GridTrader:
                 self.logger.error("赎回后获取现货余额失败，返回无效数据")
                 return False
                 
-            new_bnb = float(new_balance.get('free', {}).get('BNB', 0) or 0)
+            new_bnb = float(new_balance.get('free', {}).get(self.base_asset, 0) or 0)
             
             self.logger.info(f"赎回后余额检查 | 现货BNB: {new_bnb:.8f}")
             
@@ -1673,26 +1628,21 @@ class GridTrader:
             return  # 跳过本轮
         self.current_price = current_price
 
-        # 优先检查买入卖出信号，不执行风控检查
-        sell_signal = await self._check_signal_with_retry(self._check_sell_signal, "卖出检测")
-        if sell_signal:
+        # 优先检查买入卖出信号，不执行风控检查；信号由 GridCore 同步计算，只有触发时才检查余额
+        if self._sell_signal() and await self._check_signal_with_retry(self.check_sell_balance, "卖出检测"):
             await self.execute_order('sell')
+        elif self._buy_signal() and await self._check_signal_with_retry(lambda: self.check_buy_balance(current_price), "买入检测"):
+            await self.execute_order('buy')
         else:
-            buy_signal = await self._check_signal_with_retry(self._check_buy_signal, "买入检测")
-            if buy_signal:
-                await self.execute_order('buy')
-            else:
-                # 只有在没有交易信号时才执行其他操作
-                # 执行风控检查
-                if await self.risk_manager.multi_layer_check():
-                    return
-                # 执行S1策略
-                await self.position_controller_s1.check_and_execute()
-                # 调整网格大小
-                adjust_interval_hours = self.config.GRID_PARAMS.get('adjust_interval', 24)
-                adjust_interval_seconds = adjust_interval_hours * 3600
-                if time.time() - self.last_grid_adjust_time > adjust_interval_seconds:
-                    self.logger.info(f"时间到了，准备调整网格大小 (间隔: {adjust_interval_hours} 小时).")
-                    await self.adjust_grid_size()
-                    self.last_grid_adjust_time = time.time()
+            # 只有在没有交易信号时才执行其他操作
+            # 执行风控检查
+            if await self.risk_manager.multi_layer_check():
+                return
+            # 执行S1策略
+            await self.position_controller_s1.check_and_execute()
+            # 调整网格大小
+            if self.grid_core.adjust_due(self.clock.time()):
+                self.logger.info(f"时间到了，准备调整网格大小 (间隔: {self.config.GRID_PARAMS.get('adjust_interval', 24)} 小时).")
+                await self.adjust_grid_size()
+                self.last_grid_adjust_time = self.clock.time()
         # 不推进K线，不循环，由主进程控制推进
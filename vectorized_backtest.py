@@ -0,0 +1,674 @@
+import copy
+import math
+import numpy as np
+from typing import Any, Dict, List
+from config import SAFETY_MARGIN
+from kline_store import KlineSeries, open_kline_file
+from feature_store import FeatureStore
+from strategy_core import GridCore, S1Core
+
+
+def load_kline_array(kline_path: str) -> np.ndarray:
+    """读取回测K线文件（JSON或 .npy）为 (N, 5) 的 float64 数组: timestamp, open, high, low, close"""
+    data = open_kline_file(kline_path)
+    if isinstance(data, KlineSeries):
+        return np.asarray(data)[:, :5]
+    return np.asarray([k[:5] for k in data], dtype=np.float64).reshape(-1, 5)
+
+
+def _core_attribute(core, name):
+    """网格和S1状态保存在 GridCore / S1Core 中，引擎上保持原有的属性访问方式"""
+    return property(lambda self: getattr(getattr(self, core), name),
+                    lambda self, value: setattr(getattr(self, core), name, value))
+
+
+class VectorizedBacktester:
+    """
+    基于NumPy数组的极速回测引擎。
+    逐根复现 GridTrader.step_once + MockExchangeClient 的完整状态机
+    （网格上下轨、最高/最低价跟踪、FLIP_THRESHOLD 反弹/回调触发、波动率网格调整、
+    风控、S1仓位控制、现货/理财划转），输出与异步回测路径一致的成交记录和最终权益。
+    价格停留在网格区间内、且不会触发任何动作的K线通过向量化搜索整段跳过。
+    逐根处理时的上下轨、信号、网格调整和S1判断与实盘共用 GridCore / S1Core；
+    跳过空闲K线的向量化筛查按同样的规则对整段K线求保守超集。
+
+    时间相关逻辑（60秒缓存、网格调整间隔、S1日更）均按K线时间计算。
+    凯利仓位按回测成交 profit 恒为0 处理，只与盈亏全为0的交易历史一致（见 check_trade_history）。
+    波动率和S1日线高低点从 FeatureStore 按K线索引读取；传入按数据集持久化的 features 时
+    各次回测（及参数扫描的各工作进程）共享同一份预计算结果。
+    """
+    ASSETS_CACHE_TTL = 60      # 对应 GridTrader._get_total_assets 的1分钟缓存
+    ORDER_AMOUNT_CACHE_TTL = 60  # 对应 GridTrader._calculate_order_amount 的1分钟缓存
+    ORDER_MAX_RETRIES = 10     # 对应 GridTrader.execute_order 的最大重试次数
+    MAX_SINGLE_TRANSFER = 5000  # 对应 GridTrader._pre_transfer_funds 的单次划转上限
+    # 保存在 GridCore / S1Core 中、随回测推进变化的状态（get_state / set_state 一并保存和恢复）
+    CORE_STATE = ('base_price', 'grid_size', 'highest', 'lowest', 'last_grid_adjust_time', 's1_daily_high', 's1_daily_low')
+
+    base_price = _core_attribute('grid_core', 'base_price')
+    grid_size = _core_attribute('grid_core', 'grid_size')
+    highest = _core_attribute('grid_core', 'highest')
+    lowest = _core_attribute('grid_core', 'lowest')
+    last_grid_adjust_time = _core_attribute('grid_core', 'last_grid_adjust_time')
+    s1_lookback = _core_attribute('s1_core', 'lookback')
+    s1_sell_target_pct = _core_attribute('s1_core', 'sell_target_pct')
+    s1_buy_target_pct = _core_attribute('s1_core', 'buy_target_pct')
+    s1_daily_high = _core_attribute('s1_core', 'daily_high')
+    s1_daily_low = _core_attribute('s1_core', 'daily_low')
+
+    @staticmethod
+    def check_trade_history(trade_history: List[Dict[str, Any]]):
+        """
+        逐根回测的凯利仓位由交易历史（data/trade_history.json）中的成交盈亏计算，向量化引擎按盈亏恒为0处理。
+        历史中存在非零盈亏时两者结果不一致，抛出 ValueError。
+        """
+        profits = sum(1 for trade in trade_history if trade.get('profit', 0))
+        if profits:
+            raise ValueError(f"交易历史中有 {profits} 条非零盈亏的成交，会改变逐根回测的凯利仓位，"
+                             f"向量化引擎按盈亏为0计算，结果将与逐根回测不一致")
+
+    def __init__(self, klines, config, initial_balance: Dict[str, float] = None, fee_rate: float = 0.001, slippage: float = 0.0,
+                 features: FeatureStore = None):
+        if isinstance(klines, KlineSeries):
+            # 列式K线（.npy 内存映射或共享内存）按列读取，不复制整个数组
+            timestamps, highs, lows, closes = (klines.column(name) for name in ('timestamp', 'high', 'low', 'close'))
+        else:
+            data = np.asarray(klines, dtype=np.float64)
+            if data.ndim != 2 or data.shape[1] < 5:
+                raise ValueError("K线数组需为 (N, 5) 形状: timestamp, open, high, low, close")
+            timestamps, highs, lows, closes = data[:, 0], data[:, 2], data[:, 3], data[:, 4]
+        self.fee_rate = fee_rate
+        self.slippage = slippage
+        self.initial_balance = dict(initial_balance or {'USDT': 10000.0, 'BNB': 0.0})
+
+        self.timestamps = timestamps.astype(np.int64)
+        self.closes = np.ascontiguousarray(closes, dtype=np.float64)
+        self.times = self.timestamps / 1000  # 秒级K线时间，对应回测时钟
+        # 标量访问使用Python列表，保持与异步路径逐位一致的浮点运算
+        self._close_list = self.closes.tolist()
+        self._time_list = self.times.tolist()
+        self._ts_list = self.timestamps.tolist()
+        self._min_spacing = float(np.min(np.diff(self.times))) if len(self.times) > 1 else math.inf
+
+        self.daily_update_interval = 23.9 * 60 * 60
+        if features is None:
+            features = FeatureStore(self.timestamps, highs, lows, self.closes)
+        elif len(features) != len(self.closes):
+            raise ValueError(f"特征库K线数量 {len(features)} 与回测数据 {len(self.closes)} 不一致")
+        self.features = features
+        self._scan_chunk_min = 64
+        self._scan_chunk_max = 1 << 16
+        self._bind_config(config)
+        # 以上为K线预处理数据和配置绑定，之后 _reset_state 创建的属性构成可保存/恢复的回测状态
+        self._static_attributes = frozenset(vars(self)) | {'_static_attributes'}
+        self._reset_state()
+
+    def _bind_config(self, config):
+        self.config = config
+        # 网格和S1的判断规则（含反弹/回调阈值函数、S1参数），状态由 _reset_state 重置
+        self.grid_core = GridCore(config)
+        self.s1_core = S1Core(config)
+        self.adjust_interval_seconds = config.GRID_PARAMS.get('adjust_interval', 24) * 3600
+        # 波动率数组（按 VOLATILITY_WINDOW，FeatureStore 内按参数缓存）
+        self._volatility = self.features.volatility(config.VOLATILITY_WINDOW)
+
+    def get_state(self) -> Dict[str, Any]:
+        """当前回测状态（账户、策略、S1、回撤统计和继续位置），不含K线数据和配置，可跨进程传递"""
+        state = {name: value for name, value in vars(self).items() if name not in self._static_attributes}
+        state.update((name, getattr(self, name)) for name in self.CORE_STATE)
+        return state
+
+    def set_state(self, state: Dict[str, Any]):
+        state = dict(state)
+        for name in self.CORE_STATE:
+            setattr(self, name, state.pop(name))
+        vars(self).update(state)
+
+    def with_config(self, config) -> 'VectorizedBacktester':
+        """返回使用另一组配置、状态已重置的引擎，与本引擎共享K线及其预处理数据（浅拷贝，开销与K线数量无关）"""
+        engine = copy.copy(self)
+        engine._bind_config(config)
+        engine._reset_state()
+        return engine
+
+    def _reset_state(self):
+        # 账户（MockExchangeClient）
+        self.usdt = float(self.initial_balance.get('USDT', 0.0))
+        self.bnb = float(self.initial_balance.get('BNB', 0.0))
+        self.fund_usdt = 0.0
+        self.fund_bnb = 0.0
+        self.order_id_counter = 1
+        self.trades: List[Dict[str, Any]] = []
+        # 策略（GridTrader / GridCore）
+        self.initialized = False
+        self.base_price = self.config.INITIAL_BASE_PRICE
+        self.grid_size = self.config.INITIAL_GRID
+        self.highest = None
+        self.lowest = None
+        self.current_price = None
+        self.last_grid_adjust_time = self._time_list[0] if self._time_list else 0
+        self._assets_cache = None        # (time, value)
+        self._order_amount_cache = None  # (time, value)
+        # S1（PositionControllerS1 / S1Core）
+        self.s1_daily_high = None
+        self.s1_daily_low = None
+        self.s1_last_data_update_ts = 0
+        self._s1_retry_index = 0
+        self.index = 0
+        self.steps = 0
+        self._resume_index = 0  # run_until 下次继续执行的K线
+        # 权益曲线统计（含理财余额，按收盘价计）
+        self.equity_peak = None
+        self.max_drawdown = 0.0
+
+    # ---------------- 账户（MockExchangeClient） ----------------
+
+    def _create_order(self, side, amount, price):
+        """对应 MockExchangeClient.create_order，余额不足返回None"""
+        exec_price = price
+        if self.slippage > 0:
+            exec_price *= (1 + self.slippage) if side == 'buy' else (1 - self.slippage)
+        fee = amount * exec_price * self.fee_rate
+        order_id = str(self.order_id_counter)
+        self.order_id_counter += 1
+        if side == 'buy':
+            cost = amount * exec_price + fee
+            if self.usdt < cost:
+                return None
+            self.usdt -= cost
+            self.bnb += amount
+        else:
+            if self.bnb < amount:
+                return None
+            self.bnb -= amount
+            self.usdt += amount * exec_price - fee
+        trade = {
+            'timestamp': self._ts_list[self.index],
+            'side': side,
+            'price': exec_price,
+            'amount': amount,
+            'cost': amount * exec_price,
+            'fee': fee,
+            'order_id': order_id,
+            'profit': 0
+        }
+        self.trades.append(trade)
+        return trade
+
+    def _transfer_to_savings(self, asset, amount):
+        if asset == 'USDT':
+            if self.usdt < amount:
+                return False
+            self.usdt -= amount
+            self.fund_usdt += amount
+        else:
+            if self.bnb < amount:
+                return False
+            self.bnb -= amount
+            self.fund_bnb += amount
+        return True
+
+    def _transfer_to_spot(self, asset, amount):
+        if asset == 'USDT':
+            if self.fund_usdt < amount:
+                return False
+            self.fund_usdt -= amount
+            self.usdt += amount
+        else:
+            if self.fund_bnb < amount:
+                return False
+            self.fund_bnb -= amount
+            self.bnb += amount
+        return True
+
+    # ---------------- 资产计算（GridTrader / AdvancedRiskManager） ----------------
+
+    def _total_assets_at(self, price):
+        spot_value = self.usdt + (self.bnb * price)
+        fund_value = self.fund_usdt + (self.fund_bnb * price)
+        return spot_value + fund_value
+
+    def _get_total_assets(self):
+        now = self._time_list[self.index]
+        if self._assets_cache is not None and now - self._assets_cache[0] < self.ASSETS_CACHE_TTL:
+            return self._assets_cache[1]
+        total_assets = self._total_assets_at(self._close_list[self.index])
+        self._assets_cache = (now, total_assets)
+        return total_assets
+
+    def _calculate_order_amount(self):
+        now = self._time_list[self.index]
+        if self._order_amount_cache is not None and now - self._order_amount_cache[0] < self.ORDER_AMOUNT_CACHE_TTL:
+            return self._order_amount_cache[1]
+        amount = self._get_total_assets() * 0.1
+        self._order_amount_cache = (now, amount)
+        return amount
+
+    def _get_position_value(self, price):
+        return (self.bnb + self.fund_bnb) * price
+
+    def _get_position_ratio(self, price):
+        position_value = self._get_position_value(price)
+        total_assets = position_value + (self.usdt + self.fund_usdt)
+        if total_assets == 0:
+            return 0
+        return position_value / total_assets
+
+    def _position_ratio_array(self, closes):
+        position_value = (self.bnb + self.fund_bnb) * closes
+        total_assets = position_value + (self.usdt + self.fund_usdt)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = position_value / total_assets
+        return np.where(total_assets == 0, 0.0, ratio)
+
+    def _calculate_volatility(self, i):
+        return float(self._volatility[i])
+
+    # ---------------- 策略状态机（GridTrader） ----------------
+
+    def _initialize(self):
+        price = self._close_list[self.index]
+        # _check_and_transfer_initial_funds
+        total_assets = self._get_total_assets()
+        target_usdt = total_assets * 0.16
+        target_bnb = (total_assets * 0.16) / price
+        usdt_balance = self.usdt
+        bnb_balance = self.bnb
+        if usdt_balance > target_usdt:
+            transfer_amount = usdt_balance - target_usdt
+            if transfer_amount >= 1.0:
+                self._transfer_to_savings('USDT', transfer_amount)
+        elif usdt_balance < target_usdt:
+            self._transfer_to_spot('USDT', target_usdt - usdt_balance)
+        if bnb_balance > target_bnb:
+            transfer_amount = bnb_balance - target_bnb
+            if transfer_amount >= 0.01:
+                self._transfer_to_savings('BNB', transfer_amount)
+        elif bnb_balance < target_bnb:
+            self._transfer_to_spot('BNB', target_bnb - bnb_balance)
+
+        if self.config.INITIAL_BASE_PRICE > 0:
+            self.base_price = self.config.INITIAL_BASE_PRICE
+        else:
+            self.base_price = price
+        self.initialized = True
+
+    def _check_buy_balance(self):
+        amount_usdt = self._calculate_order_amount()
+        spot_usdt = self.usdt
+        if spot_usdt >= amount_usdt:
+            return True
+        if spot_usdt + self.fund_usdt < amount_usdt:
+            return False
+        needed_amount = (amount_usdt - spot_usdt) * 1.05
+        if not self._transfer_to_spot('USDT', needed_amount):
+            return False
+        return self.usdt >= amount_usdt
+
+    def _check_sell_balance(self):
+        spot_bnb = self.bnb
+        amount_usdt = self._calculate_order_amount()
+        if not self.current_price or self.current_price <= 0:
+            return False
+        bnb_needed = amount_usdt / self.current_price
+        if spot_bnb >= bnb_needed:
+            return True
+        if spot_bnb + self.fund_bnb < bnb_needed:
+            return False
+        needed_amount = (bnb_needed - spot_bnb) * 1.05
+        if not self._transfer_to_spot('BNB', needed_amount):
+            return False
+        return self.bnb >= bnb_needed
+
+    def _check_buy_signal(self):
+        # 与 GridTrader 一致：信号触发后才检查余额（可能从理财赎回）
+        return self.grid_core.buy_signal(self.current_price) and self._check_buy_balance()
+
+    def _check_sell_signal(self):
+        return self.grid_core.sell_signal(self.current_price) and self._check_sell_balance()
+
+    def _execute_order(self, side):
+        price = self._close_list[self.index]
+        for _ in range(self.ORDER_MAX_RETRIES):
+            # 回测盘口：卖1 = close*1.001，买1 = close*0.999
+            order_price = price * 1.001 if side == 'buy' else price * 0.999
+            amount_usdt = self._calculate_order_amount()
+            amount = float(f"{amount_usdt / order_price:.3f}")
+            if side == 'buy':
+                if not self._check_buy_balance():
+                    return False
+            else:
+                if not self._check_sell_balance():
+                    return False
+            trade = self._create_order(side, amount, order_price)
+            if trade is None:
+                continue
+            self.base_price = float(trade['price'])
+            self._transfer_excess_funds()
+            return True
+        return False
+
+    def _transfer_excess_funds(self):
+        spot_usdt_balance = self.usdt
+        spot_bnb_balance = self.bnb
+        current_price = self._close_list[self.index]
+        total_assets = self._get_total_assets()
+        if not current_price or current_price <= 0 or total_assets <= 0:
+            return
+        target_usdt_hold = total_assets * 0.16
+        target_bnb_hold_value = total_assets * 0.16
+        target_bnb_hold_amount = target_bnb_hold_value / current_price
+        if spot_usdt_balance > target_usdt_hold:
+            transfer_amount = spot_usdt_balance - target_usdt_hold
+            if transfer_amount > 1.0:
+                self._transfer_to_savings('USDT', transfer_amount)
+        if spot_bnb_balance > target_bnb_hold_amount:
+            transfer_amount = spot_bnb_balance - target_bnb_hold_amount
+            if transfer_amount >= 0.01:
+                self._transfer_to_savings('BNB', transfer_amount)
+
+    def _adjust_grid_size(self):
+        self.grid_core.resize(self._calculate_volatility(self.index))
+
+    def _risk_blocked(self, price):
+        position_ratio = self._get_position_ratio(price)
+        return position_ratio < self.config.MIN_POSITION_RATIO or position_ratio > self.config.MAX_POSITION_RATIO
+
+    # ---------------- S1（PositionControllerS1） ----------------
+
+    def _s1_levels(self, lookback=None):
+        """返回当前K线之前 lookback（默认 s1_lookback）根已完成日线的 (high, low)，数据不足返回None"""
+        high, low = self.features.s1_levels(self.s1_lookback if lookback is None else lookback)[self.index].tolist()
+        return None if math.isnan(high) else (high, low)
+
+    def _update_daily_s1_levels(self):
+        now = self._time_list[self.index]
+        if now - self.s1_last_data_update_ts >= self.daily_update_interval:
+            levels = self._s1_levels()
+            if levels is None:
+                self._s1_retry_index = self._next_day_index(self.index)
+                return
+            self.s1_daily_high, self.s1_daily_low = levels
+            self.s1_last_data_update_ts = now
+            self._s1_retry_index = 0
+
+    def _next_day_index(self, i):
+        """返回i之后第一根属于新UTC日的K线索引（日线数量只会在此处变化）"""
+        day = self._ts_list[i] // 1000 // 86400
+        next_day_ms = (day + 1) * 86400 * 1000
+        return int(np.searchsorted(self.timestamps, next_day_ms, side='left'))
+
+    def _calculate_trade_amount(self):
+        # 回测成交profit恒为0 => 胜率0、凯利系数0，交易金额取下限；波动率无效(nan)时结果为nan
+        volatility = self._calculate_volatility(self.index)
+        risk_adjusted_amount = 0.0 if volatility == volatility else float('nan')
+        return max(min(risk_adjusted_amount, self.config.BASE_AMOUNT), self.config.MIN_TRADE_AMOUNT)
+
+    def _pre_transfer_funds(self, current_price):
+        total_assets = self.usdt + self.bnb * current_price
+        required = min(self._calculate_trade_amount() * 1.05, self.config.MAX_POSITION_RATIO * total_assets)
+        required_with_buffer = required * 1.2
+        while required_with_buffer > 0:
+            transfer_amount = min(required_with_buffer, self.MAX_SINGLE_TRANSFER)
+            if not self._transfer_to_spot('USDT', transfer_amount):
+                return False
+            required_with_buffer -= transfer_amount
+        return True
+
+    def _execute_s1_adjustment(self, side, amount_bnb):
+        adjusted_amount = float(f"{amount_bnb:.3f}")
+        if adjusted_amount <= 0:
+            return False
+        current_price = self.current_price
+        if not current_price or current_price <= 0:
+            return False
+        if adjusted_amount < 0.0001 or adjusted_amount * current_price < 10:
+            return False
+        if side == 'BUY':
+            usdt_needed = adjusted_amount * current_price
+            if self.usdt * SAFETY_MARGIN < usdt_needed:
+                if not self._pre_transfer_funds(current_price):
+                    return False
+                if self.usdt * SAFETY_MARGIN < usdt_needed:
+                    return False
+        elif adjusted_amount > self.bnb * SAFETY_MARGIN:
+            return False
+        if self._create_order(side.lower(), adjusted_amount, self._close_list[self.index]) is None:
+            return False
+        if side == 'BUY':
+            self._transfer_excess_funds()
+        return True
+
+    def _s1_check_and_execute(self):
+        if self.s1_daily_high is None or self.s1_daily_low is None:
+            return
+        current_price = self.current_price
+        if not current_price or current_price <= 0:
+            return
+        position_pct = self._get_position_ratio(current_price)
+        position_value = self._get_position_value(current_price)
+        total_assets = self._get_total_assets()
+        bnb_balance = self.bnb * SAFETY_MARGIN
+        if total_assets <= 0:
+            return
+        if not self.s1_core.may_act(current_price):
+            return
+        action = self.s1_core.decide(current_price, position_pct, position_value, total_assets, bnb_balance)
+        if action is not None:
+            self._execute_s1_adjustment(*action)
+
+    # ---------------- 主循环 ----------------
+
+    def step(self, i):
+        """对第i根K线执行一次与 GridTrader.step_once 等价的处理"""
+        self.index = i
+        self.steps += 1
+        if not self.initialized:
+            self._initialize()
+            self._update_daily_s1_levels()
+        self._update_daily_s1_levels()
+        current_price = self._close_list[i]
+        if not current_price:
+            return
+        self.current_price = current_price
+        if self._check_sell_signal():
+            self._execute_order('sell')
+        elif self._check_buy_signal():
+            self._execute_order('buy')
+        else:
+            if self._risk_blocked(current_price):
+                return
+            self._s1_check_and_execute()
+            now = self._time_list[i]
+            if self.grid_core.adjust_due(now):
+                self._adjust_grid_size()
+                self.last_grid_adjust_time = now
+
+    def _s1_candidates(self, closes, ratio):
+        """S1可能产生动作的K线（保守超集，精确判断交由逐根处理）"""
+        if self.s1_daily_high is None or self.s1_daily_low is None:
+            return np.zeros(len(closes), dtype=bool)
+        sell = (closes > self.s1_daily_high) & (ratio > self.s1_sell_target_pct)
+        buy = (closes < self.s1_daily_low) & (ratio < self.s1_buy_target_pct)
+        if self._min_spacing < self.ASSETS_CACHE_TTL:
+            return sell | buy
+        # K线间隔不小于缓存有效期时，S1使用的总资产即为当根K线的总资产，可进一步排除不会下单的K线
+        position_value = (self.bnb + self.fund_bnb) * closes
+        total_assets = (self.usdt + self.bnb * closes) + (self.fund_usdt + self.fund_bnb * closes)
+        tol = 1e-9
+        sell_amount = np.minimum((position_value - total_assets * self.s1_sell_target_pct) / closes, self.bnb * SAFETY_MARGIN)
+        sell &= (sell_amount >= 0.0005 - tol) & ((sell_amount + 0.0005) * closes >= 10 - tol)
+        buy_amount = (total_assets * self.s1_buy_target_pct - position_value) / closes
+        buy &= (buy_amount >= 0.0005 - tol) & ((buy_amount + 0.0005) * closes >= 10 - tol)
+        # 现货不足且理财无法补足首笔预划转时，S1买入不会改变任何状态
+        spot_total = self.usdt + self.bnb * closes
+        first_transfer = np.minimum(np.minimum(self.config.MIN_TRADE_AMOUNT * 1.05, self.config.MAX_POSITION_RATIO * spot_total) * 1.2, self.MAX_SINGLE_TRANSFER)
+        cannot_afford = self.usdt * SAFETY_MARGIN < (buy_amount - 0.0005) * closes - tol
+        transfer_fails = self.fund_usdt < first_transfer * (1 - tol) - tol
+        buy &= ~(cannot_afford & transfer_fails)
+        return sell | buy
+
+    def _signal_masks(self, closes):
+        """
+        买卖信号检测的向量化结果：返回 (需逐根处理, 触发但余额检查失败)。
+        区间外但未刷新最高/最低价、未触发或触发后余额不足且无法赎回的K线不会改变状态。
+        """
+        upper, lower = self.grid_core.upper_band(), self.grid_core.lower_band()
+        above = closes >= upper
+        below = closes <= lower
+        events = np.zeros(len(closes), dtype=bool)
+        triggered = np.zeros(len(closes), dtype=bool)
+        threshold = self.grid_core.threshold()
+        if self.highest is None:
+            events |= above
+        else:
+            events |= above & (closes > self.highest)
+            triggered |= above & (closes <= self.highest) & (closes <= self.highest * (1 - threshold))
+        if self.lowest is None:
+            events |= below
+        else:
+            events |= below & (closes < self.lowest)
+            triggered |= below & (closes >= self.lowest) & (closes >= self.lowest * (1 + threshold))
+        if not triggered.any():
+            return events, triggered
+        if self._min_spacing < self.ORDER_AMOUNT_CACHE_TTL:
+            # 下单金额可能来自之前K线的缓存，无法向量化判断
+            return events | triggered, np.zeros(len(closes), dtype=bool)
+        tol = 1e-9
+        amount_usdt = ((self.usdt + self.bnb * closes) + (self.fund_usdt + self.fund_bnb * closes)) * 0.1
+        bnb_needed = amount_usdt / closes
+        sell_fails = (self.bnb < bnb_needed * (1 - tol)) & (self.fund_bnb < (bnb_needed - self.bnb) * 1.05 * (1 - tol))
+        buy_fails = (self.usdt < amount_usdt * (1 - tol)) & (self.fund_usdt < (amount_usdt - self.usdt) * 1.05 * (1 - tol))
+        fails = np.where(above, sell_fails, buy_fails)
+        events |= triggered & ~fails
+        return events, triggered & fails
+
+    def _next_event(self, a, b):
+        """在[a, b)内向量化查找第一根需要逐根处理的K线；返回 (索引, 风控放行掩码, 信号触发失败掩码)"""
+        closes = self.closes[a:b]
+        events, failed_signals = self._signal_masks(closes)
+        if b > self._s1_retry_index:
+            due = (self.times[a:b] - self.s1_last_data_update_ts) >= self.daily_update_interval
+            due &= np.arange(a, b) >= self._s1_retry_index
+            events |= due
+        ratio = self._position_ratio_array(closes)
+        risk_pass = ~((ratio < self.config.MIN_POSITION_RATIO) | (ratio > self.config.MAX_POSITION_RATIO))
+        events |= risk_pass & self._s1_candidates(closes, ratio)
+        hits = np.flatnonzero(events)
+        return (a + int(hits[0]) if len(hits) else b), risk_pass, failed_signals
+
+    def _replay_idle(self, a, e, risk_pass, failed_signals):
+        """
+        复现[a, e)内空闲K线的副作用：按间隔触发但网格不变的网格调整，
+        以及余额检查和S1读取总资产时的缓存刷新。
+        若某次网格调整会改变网格大小，返回该K线索引交由逐根处理。
+        """
+        eligible = a + np.flatnonzero(risk_pass[:e - a])
+        if len(eligible):
+            eligible_times = self.times[eligible]
+            pos = 0
+            while pos < len(eligible):
+                # 与 step 中 now - last > interval 的判断逐位一致
+                last = self.last_grid_adjust_time
+                pos += int(np.searchsorted(eligible_times[pos:], last + self.adjust_interval_seconds, side='left'))
+                while pos > 0 and eligible_times[pos - 1] - last > self.adjust_interval_seconds:
+                    pos -= 1
+                while pos < len(eligible) and not eligible_times[pos] - last > self.adjust_interval_seconds:
+                    pos += 1
+                if pos >= len(eligible):
+                    break
+                j = int(eligible[pos])
+                if self.grid_core.grid_for_volatility(self._calculate_volatility(j)) != self.grid_size:
+                    e = j
+                    eligible = eligible[:pos]
+                    break
+                self.last_grid_adjust_time = self._time_list[j]
+                pos += 1
+        # 触发失败的信号只在K线间隔不小于缓存有效期时被跳过，此时每次读取都会刷新缓存
+        failed = a + np.flatnonzero(failed_signals[:e - a])
+        if len(failed):
+            k = int(failed[-1])
+            self._order_amount_cache = (self._time_list[k], self._total_assets_at(self._close_list[k]) * 0.1)
+            self._assets_cache = (self._time_list[k], self._total_assets_at(self._close_list[k]))
+        if len(eligible) and self.s1_daily_high is not None and self.s1_daily_low is not None:
+            if self._min_spacing >= self.ASSETS_CACHE_TTL:
+                calls = eligible[-1:]
+            else:
+                calls = eligible
+            for j in calls.tolist():
+                now = self._time_list[j]
+                if self._assets_cache is None or now - self._assets_cache[0] >= self.ASSETS_CACHE_TTL:
+                    self._assets_cache = (now, self._total_assets_at(self._close_list[j]))
+        return e
+
+    def _skip_idle(self, a, end):
+        chunk = self._scan_chunk_min
+        while a < end:
+            b = min(end, a + chunk)
+            e, risk_pass, failed_signals = self._next_event(a, b)
+            e = self._replay_idle(a, e, risk_pass, failed_signals)
+            if e < b:
+                return e
+            a = b
+            chunk = min(chunk * 2, self._scan_chunk_max)
+        return end
+
+    def _track_equity(self, a, b):
+        """[a, b)内账户余额不变，按收盘价向量化更新权益峰值和最大回撤"""
+        if a >= b:
+            return
+        equity = (self.usdt + self.fund_usdt) + (self.bnb + self.fund_bnb) * self.closes[a:b]
+        peak = np.maximum.accumulate(equity)
+        if self.equity_peak is not None:
+            peak = np.maximum(peak, self.equity_peak)
+        self.equity_peak = float(peak[-1])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            drawdown = np.where(peak > 0, equity / peak - 1, 0.0)
+        self.max_drawdown = min(self.max_drawdown, float(drawdown.min()))
+
+    def run(self) -> Dict[str, Any]:
+        """运行回测（与 main.py 极速回测一致：处理前N-1根K线，按最后一根收盘价结算）"""
+        self._reset_state()
+        return self.run_until(len(self._close_list))
+
+    def run_until(self, stop: int) -> Dict[str, Any]:
+        """
+        从当前状态继续回测到前stop根K线，结果与只用前stop根K线回测一致。
+        可用更大的stop再次调用，从上次停下的位置继续（逐段延长回测区间）。
+        """
+        stop = min(int(stop), len(self._close_list))
+        end = stop - 1
+        i = self._resume_index
+        while i < end:
+            self.step(i)
+            nxt = self._skip_idle(i + 1, end)
+            self._track_equity(i, nxt)
+            i = nxt
+        self._resume_index = max(i, self._resume_index)
+        # 最后一根K线只参与结算，不执行策略；延长区间后它会被正常处理，因此不计入持久的回撤统计
+        peak, drawdown = self.equity_peak, self.max_drawdown
+        self._track_equity(max(end, 0), stop)
+        result = self.result(stop)
+        self.equity_peak, self.max_drawdown = peak, drawdown
+        return result
+
+    def result(self, stop: int = None) -> Dict[str, Any]:
+        stop = len(self._close_list) if stop is None else stop
+        final_price = self._close_list[stop - 1] if stop > 0 else 0
+        usdt = self.usdt + self.fund_usdt
+        bnb = self.bnb + self.fund_bnb
+        total = usdt + bnb * final_price
+        initial = self.config.INITIAL_PRINCIPAL
+        first_price = self._close_list[0] if self._close_list else 0
+        initial_equity = float(self.initial_balance.get('USDT', 0.0)) + float(self.initial_balance.get('BNB', 0.0)) * first_price
+        return {
+            'trades': self.trades,
+            'final_equity': total,
+            'initial_equity': initial_equity,
+            'initial_principal': initial,
+            'profit': total - initial if initial > 0 else 0,
+            'max_drawdown': self.max_drawdown,
+            'balance': {'USDT': self.usdt, 'BNB': self.bnb},
+            'savings_balance': {'USDT': self.fund_usdt, 'BNB': self.fund_bnb},
+            'steps': self.steps,
+            'bars': stop,
+        }
@@ -0,0 +1,133 @@
+import csv
+import json
+import logging
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Tuple
+from kline_store import SharedKlineArray
+from batch_backtest import BatchBacktester
+from backtest_metrics import compute_metrics
+from parameter_sweep import OPTIMIZATION_OBJECTIVES, build_config, expand_param_grid
+
+# 工作进程映射的共享内存K线
+_worker_shared = None
+_worker_klines = None
+
+
+def walk_forward_windows(n_bars: int, in_sample: int, out_of_sample: int) -> List[Tuple[int, int, int]]:
+    """
+    滚动切分 (样本内起点, 样本外起点, 样本外终点)，每次向前滚动一个样本外长度，
+    各样本外区间首尾相接；末尾不足2根K线的样本外区间丢弃。
+    """
+    if in_sample < 2 or out_of_sample < 2:
+        raise ValueError("样本内/样本外窗口至少需要2根K线")
+    windows = []
+    start = 0
+    while start + in_sample + 2 <= n_bars:
+        split = start + in_sample
+        windows.append((start, split, min(split + out_of_sample, n_bars)))
+        start += out_of_sample
+    return windows
+
+
+def _init_worker(descriptor: Dict[str, Any]):
+    global _worker_shared, _worker_klines
+    logging.getLogger().setLevel(logging.ERROR)
+    _worker_shared = SharedKlineArray.attach(descriptor)
+    _worker_klines = _worker_shared.series()
+
+
+def _run_window(args):
+    """在样本内区间批量回测全部参数组合选出最优，再在随后的样本外区间回测最优参数"""
+    (start, split, end), points, initial_balance, objective, batch_size = args
+    score = OPTIMIZATION_OBJECTIVES[objective]
+    in_sample = _worker_klines[start:split]
+    scores = []
+    for i in range(0, len(points), batch_size):
+        batch = points[i:i + batch_size]
+        result = BatchBacktester(in_sample, [build_config(params) for params in batch],
+                                 initial_balance=initial_balance, record_equity=False).run()
+        scores.extend(score(float(result['final_equity'][j]) - result['initial_equity'], float(result['max_drawdown'][j]))
+                      for j in range(len(batch)))
+    best = int(np.argmax(scores))
+    out_of_sample = _worker_klines[split:end]
+    result = BatchBacktester(out_of_sample, [build_config(points[best])], initial_balance=initial_balance).run()
+    timestamps = out_of_sample.column('timestamp')
+    return {
+        'in_sample': (int(_worker_klines[start][0]), int(_worker_klines[split - 1][0])),
+        'out_of_sample': (int(timestamps[0]), int(timestamps[-1])),
+        'params': points[best],
+        'in_sample_score': scores[best],
+        'out_of_sample_pnl': float(result['final_equity'][0]) - result['initial_equity'],
+        'out_of_sample_max_drawdown': float(result['max_drawdown'][0]),
+        'initial_equity': result['initial_equity'],
+        'trades': result['trades'][0],
+        'timestamps': np.array(timestamps),
+        'equity_curve': result['equity_curve'][0],
+    }
+
+
+def stitch_equity_curves(windows: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    拼接各样本外资金曲线：每段都从相同初始资金独立回测，按收益率复利衔接
+    （每段按上一段末尾权益与本段初始权益之比缩放）。
+    """
+    timestamps, curves = [], []
+    level = windows[0]['initial_equity'] if windows else 0.0
+    for window in windows:
+        scale = level / window['initial_equity'] if window['initial_equity'] > 0 else 1.0
+        curve = window['equity_curve'] * scale
+        timestamps.append(window['timestamps'])
+        curves.append(curve)
+        level = float(curve[-1])
+    if not curves:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    return np.concatenate(timestamps), np.concatenate(curves)
+
+
+def run_walk_forward(kline_path: str, grid: Dict[str, List[Any]], in_sample: int, out_of_sample: int,
+                     initial_balance: Dict[str, float] = None, workers: int = None, batch_size: int = 64,
+                     objective: str = 'total_pnl') -> Dict[str, Any]:
+    """
+    滚动前推优化：K线（单位：根）切分为滚动的样本内/样本外窗口，各窗口在进程池中并行处理，
+    每个窗口在样本内用 BatchBacktester 评估全部参数组合并按 objective 选优，在样本外回测最优参数。
+    K线只读取一次并放入共享内存。返回各窗口结果、拼接后的样本外资金曲线及其绩效指标。
+    """
+    if objective not in OPTIMIZATION_OBJECTIVES:
+        raise ValueError(f"未知的优化目标: {objective}，可选: {sorted(OPTIMIZATION_OBJECTIVES)}")
+    points = expand_param_grid(grid)
+    workers = workers or os.cpu_count() or 1
+    with SharedKlineArray.from_file(kline_path) as shared:
+        windows = walk_forward_windows(shared.length, in_sample, out_of_sample)
+        if not windows:
+            raise ValueError(f"K线数量 {shared.length} 不足一个滚动窗口")
+        tasks = [(window, points, initial_balance, objective, max(1, batch_size)) for window in windows]
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), initializer=_init_worker,
+                                 initargs=(shared.descriptor,)) as executor:
+            results = list(executor.map(_run_window, tasks))
+    timestamps, equity = stitch_equity_curves(results)
+    trades = [trade for window in results for trade in window['trades']]
+    return {
+        'windows': results,
+        'timestamps': timestamps,
+        'equity_curve': equity,
+        'metrics': compute_metrics(timestamps, equity, trades, results[0]['initial_equity']),
+    }
+
+
+def write_walk_forward_results(result: Dict[str, Any], output_path: str, equity_path: str = None):
+    """各窗口结果写入CSV（时间范围、最优参数、样本内得分、样本外盈亏/回撤/成交数），可选导出拼接资金曲线"""
+    with open(output_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['in_sample_start', 'in_sample_end', 'out_of_sample_start', 'out_of_sample_end', 'params',
+                         'in_sample_score', 'out_of_sample_pnl', 'out_of_sample_max_drawdown', 'trade_count'])
+        for window in result['windows']:
+            writer.writerow(list(window['in_sample']) + list(window['out_of_sample']) + [
+                json.dumps(window['params']), f"{window['in_sample_score']:.6f}", f"{window['out_of_sample_pnl']:.6f}",
+                f"{window['out_of_sample_max_drawdown']:.6f}", len(window['trades'])])
+    if equity_path:
+        with open(equity_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['timestamp', 'equity'])
+            writer.writerows(zip(result['timestamps'].tolist(), result['equity_curve'].tolist()))
@@ -5,7 +5,10 @@ import aiofiles
 import logging
 from datetime import datetime
 import psutil
-import csv
+import json
+import asyncio
+from backtest_view import BacktestResultView
+from backtest_jobs import BacktestJobManager, JobQueueFull
 
 class IPLogger:
     def __init__(self):
@@ -394,14 +397,14 @@ async def handle_log(request):
 
                 // 回测结果加载
                 async function loadBacktestResult() {{
-                    const resp = await fetch('/api/backtest_result');
+                    const resp = await fetch('/api/backtest_result?points=500&page_size=10&order=desc');
                     const data = await resp.json();
                     // 填充表格
                     const tbody = document.getElementById('backtest-trades');
                     tbody.innerHTML = '';
-                    (data.trades || []).slice(-10).forEach(trade => {{
+                    (data.trades || []).slice().reverse().forEach(trade => {{
                         const tr = document.createElement('tr');
-                        tr.innerHTML = `<td>{{trade.timestamp}}</td><td>{{trade.side}}</td><td>{{parseFloat(trade.price).toFixed(2)}}</td><td>{{trade.amount}}</td><td>{{parseFloat(trade.cost).toFixed(2)}}</td>`;
+                        tr.innerHTML = `<td>${{trade.timestamp}}</td><td>${{trade.side}}</td><td>${{parseFloat(trade.price).toFixed(2)}}</td><td>${{trade.amount}}</td><td>${{parseFloat(trade.cost).toFixed(2)}}</td>`;
                         tbody.appendChild(tr);
                     }});
                     // 资金曲线
@@ -417,11 +420,14 @@ async def handle_log(request):
                     }}
                     // 简要统计
                     const summary = document.getElementById('backtest-summary');
-                    if (data.trades && data.trades.length > 0) {{
-                        const first = data.trades[0];
-                        const last = data.trades[data.trades.length-1];
+                    const m = data.metrics || {{}};
+                    if (m.bars) {{
+                        summary.textContent = `总成交: ${{m.trade_count}} | 总收益率: ${{(m.total_return*100).toFixed(2)}}% | 年化: ${{(m.cagr*100).toFixed(2)}}% | 夏普: ${{m.sharpe.toFixed(2)}} | 最大回撤: ${{(m.max_drawdown*100).toFixed(2)}}% | 手续费拖累: ${{(m.fee_drag*100).toFixed(2)}}%`;
+                    }} else if (data.trades && data.trades.length > 0) {{
+                        const first = data.trades[data.trades.length-1];
+                        const last = data.trades[0];
                         const profit = (parseFloat(last.price) - parseFloat(first.price)) * (parseFloat(last.amount) || 1);
-                        summary.textContent = `总成交: {{data.trades.length}} | 简单收益: {{profit.toFixed(2)}} USDT`;
+                        summary.textContent = `总成交: ${{data.trade_page.total}} | 简单收益: ${{profit.toFixed(2)}} USDT`;
                     }} else {{
                         summary.textContent = '无回测数据';
                     }}
@@ -540,22 +546,71 @@ async def handle_status(request):
         return web.json_response({"error": str(e)}, status=500)
 
 async def handle_backtest_result(request):
-    # 假定回测结果文件路径固定，可后续参数化
-    trades_path = 'backtest_trades.csv'
-    equity_path = 'backtest_equity_curve.csv'
-    result = {'trades': [], 'equity_curve': []}
-    # 读取成交记录
-    if os.path.exists(trades_path):
-        with open(trades_path, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            result['trades'] = list(reader)
-    # 读取资金曲线
-    if os.path.exists(equity_path):
-        with open(equity_path, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            result['equity_curve'] = list(reader)
+    """
+    回测结果查询，支持参数: start、end（毫秒时间戳范围）、points（资金曲线目标点数）、method（lttb/minmax）、
+    page、page_size、order（成交记录分页，asc/desc）。文件解析结果按修改时间缓存，解析在线程池中进行。
+    """
+    query = request.query
+    try:
+        start = int(query['start']) if 'start' in query else None
+        end = int(query['end']) if 'end' in query else None
+        points = int(query.get('points', 500))
+        page = int(query.get('page', 1))
+        page_size = int(query.get('page_size', 100))
+    except ValueError:
+        return web.json_response({"error": "start、end、points、page、page_size 需为整数"}, status=400)
+    method = query.get('method', 'lttb')
+    order = query.get('order', 'asc')
+    loop = asyncio.get_running_loop()
+    try:
+        result = await loop.run_in_executor(None, request.app['backtest_view'].query,
+                                            start, end, points, method, page, page_size, order)
+    except ValueError as e:
+        return web.json_response({"error": str(e)}, status=400)
     return web.json_response(result)
 
+async def handle_backtest_job_submit(request):
+    """提交回测任务，请求体: {"kline": "bnbusdt_1h.json", "params": {...}, "initial_balance": {...}, "options": {...}}"""
+    try:
+        body = await request.json()
+    except json.JSONDecodeError:
+        return web.json_response({"error": "请求体不是有效的JSON"}, status=400)
+    try:
+        status = request.app['backtest_jobs'].submit(body)
+    except ValueError as e:
+        return web.json_response({"error": str(e)}, status=400)
+    except JobQueueFull as e:
+        return web.json_response({"error": str(e)}, status=429)
+    return web.json_response(status, status=202)
+
+async def handle_backtest_job_list(request):
+    return web.json_response({"jobs": request.app['backtest_jobs'].list_jobs()})
+
+async def handle_backtest_job_status(request):
+    status = request.app['backtest_jobs'].status(request.match_info['job_id'])
+    if status is None:
+        return web.json_response({"error": "任务不存在"}, status=404)
+    return web.json_response(status)
+
+async def handle_backtest_job_result(request):
+    manager = request.app['backtest_jobs']
+    job_id = request.match_info['job_id']
+    status = manager.status(job_id)
+    if status is None:
+        return web.json_response({"error": "任务不存在"}, status=404)
+    if status['status'] != 'done':
+        return web.json_response({"error": f"任务尚未完成: {status['status']}", "status": status['status']}, status=409)
+    return web.json_response(manager.result(job_id))
+
+async def handle_backtest_job_cancel(request):
+    status = request.app['backtest_jobs'].cancel(request.match_info['job_id'])
+    if status is None:
+        return web.json_response({"error": "任务不存在"}, status=404)
+    return web.json_response(status)
+
+async def _shutdown_backtest_jobs(app):
+    await app['backtest_jobs'].shutdown()
+
 async def start_web_server(trader):
     app = web.Application()
     # 添加中间件处理无效请求
@@ -579,6 +634,9 @@ async def start_web_server(trader):
     app.middlewares.append(error_middleware)
     app['trader'] = trader
     app['ip_logger'] = IPLogger()
+    app['backtest_view'] = BacktestResultView()
+    app['backtest_jobs'] = BacktestJobManager()
+    app.on_cleanup.append(_shutdown_backtest_jobs)
     
     # 禁用访问日志
     logging.getLogger('aiohttp.access').setLevel(logging.WARNING)
@@ -587,6 +645,11 @@ async def start_web_server(trader):
     app.router.add_get('/api/logs', handle_log_content)
     app.router.add_get('/api/status', handle_status)
     app.router.add_get('/api/backtest_result', handle_backtest_result)
+    app.router.add_post('/api/backtest/jobs', handle_backtest_job_submit)
+    app.router.add_get('/api/backtest/jobs', handle_backtest_job_list)
+    app.router.add_get('/api/backtest/jobs/{job_id}', handle_backtest_job_status)
+    app.router.add_get('/api/backtest/jobs/{job_id}/result', handle_backtest_job_result)
+    app.router.add_delete('/api/backtest/jobs/{job_id}', handle_backtest_job_cancel)
     runner = web.AppRunner(app)
     await runner.setup()
     site = web.TCPSite(runner, '0.0.0.0', 58181)